@@ -1,23 +1,48 @@
 """Assessment functions."""
 
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Any, Dict, List, MutableSet, Sequence
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    MutableSet,
+    Sequence,
+    Tuple,
+)
 
+from .cache import build_cache, feature_cache
 from .cli_lib import check_empty_args
+from .diff import diff_assessed_students, print_student_deltas
+from .events import emit, timed
+from .fetch import load_students_git
 from .paths import (
     check_required_fp_exists,
     get_assessed_students_fp,
+    get_builds_cache_fp,
+    get_features_cache_fp,
     get_student_repos_fp,
     get_valid_students_git_fp,
 )
-from .plugin import (
-    get_short_plugin_desc,
-    load_inter_repo_plugin_functions,
-    load_repo_plugin_functions,
+from .plugin import MapReducePlugin, get_plugin_capabilities
+from .results import (
+    iter_assessed_students,
+    load_assessed_student,
+    save_assessed_students,
+)
+from .rules import AssessmentPlan, RepoPlan, RulesPlan, load_rules
+from .types import (
+    AssessedRepo,
+    AssessedStudent,
+    Assessment,
+    StudentGit,
+    assessment_key,
 )
-from .types import AssessedRepo, AssessedStudent, Assessment
-from .yaml import load_yaml, save_yaml
 
 
 def assess(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
@@ -40,141 +65,329 @@ def assess(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
     # Check if valid students Git URL yaml file exists, and if not, quit
     check_required_fp_exists(students_git_fp)
 
-    # Load rules
-    rules = load_yaml(rules_fp)
+    # Load and validate rules, before doing any actual work
+    rules: RulesPlan = load_rules(rules_fp)
 
     # Load student list and their URLs
-    students_git = load_yaml(students_git_fp, safe=False)
-
-    # Obtained all the repository assessments defined by the rules
-    required_assessments: MutableSet[str] = {
-        assess_rule["name"]
-        for rule in rules
-        if "assessments" in rule
-        for assess_rule in rule["assessments"]
-    }
+    students_git: List[StudentGit] = load_students_git(students_git_fp)
+
+    # A dry run reuses the previous results, which must exist
+    if args.dry_run:
+        check_required_fp_exists(get_assessed_students_fp(assess_fp))
+
+    # Plugins which are not parallel safe must not run concurrently
+    plugin_locks: Dict[str, Lock] = make_plugin_locks(rules.assess_functions)
+
+    # Let event consumers know how much work there is, e.g. to estimate an ETA
+    emit("assess_started", students=len(students_git))
+
+    # Reuse repository features and builds from previous assessments
+    with (
+        feature_cache(get_features_cache_fp(assess_fp)),
+        build_cache(get_builds_cache_fp(assess_fp), args.build_cache_size),
+    ):
+        # Apply rules and assessments to each student, possibly in parallel
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            assessed_students: List[AssessedStudent] = list(
+                executor.map(
+                    lambda sg: assess_student(
+                        sg,
+                        rules,
+                        plugin_locks,
+                        (
+                            load_assessed_student(assess_fp, sg.sid)
+                            if args.dry_run
+                            else None
+                        ),
+                    ),
+                    students_git,
+                )
+            )
+
+        # Apply inter-repository assessments
+        assess_inter_repos(rules, assessed_students, args.jobs)
 
-    # Load required assessment plugins as specified by the rules
-    assess_functions: Dict[str, Any] = load_repo_plugin_functions(required_assessments)
+    # Determine file path where to save assessment information
+    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
 
-    # Initialize student grades list
-    assessed_students: List[AssessedStudent] = []
+    # In a dry run, show how grades would change instead of saving them
+    if args.dry_run:
+        print_student_deltas(
+            diff_assessed_students(
+                iter_assessed_students(assess_fp),
+                sorted(assessed_students, key=lambda s: s.sid),
+            )
+        )
+        print(f"- Dry run, {assessed_students_fp} not updated.")
+        return
 
-    # Initialize dictionary of assessed repositories by name, which will be
-    # required later for inter-repository assessments
-    repos_by_name: Dict[str, List[AssessedRepo]] = {rule["repo"]: [] for rule in rules}
+    # Save list of assessed students to yaml file
+    save_assessed_students(assess_fp, assessed_students)
 
-    # Apply rules and assessments to each student
-    for student_git in students_git:
-        # Create instance of current student's assessment
-        assessed_student: AssessedStudent = AssessedStudent(student_git.sid)
+    # Number of assessments performed and skipped
+    n_assessments = sum([s.assessment_count for s in assessed_students])
+    n_skipped = sum([s.skipped_count for s in assessed_students])
 
+    # Provide feedback to the user
+    print(f"- Absolute assessment path: {assess_fp.absolute()}.")
+    print(f"- Fetched student repository information from {students_git_fp}")
+    print(
+        f"- Performed {n_assessments} assessments ({n_skipped} skipped) on "
+        f"{len(assessed_students)} student repositories at "
+        f"{get_student_repos_fp(assess_fp)}."
+    )
+    print(f"- Updated {assessed_students_fp}.")
+
+
+def make_plugin_locks(plugin_functions: Dict[str, Any]) -> Dict[str, Lock]:
+    """Create a lock for each plugin which is not safe to run in parallel."""
+    return {
+        name: Lock()
+        for name, fun in plugin_functions.items()
+        if not get_plugin_capabilities(fun).parallel_safe
+    }
+
+
+def assess_student(
+    student_git: StudentGit,
+    rules: RulesPlan,
+    plugin_locks: Dict[str, Lock] | None = None,
+    previous: AssessedStudent | None = None,
+) -> AssessedStudent:
+    """Apply the rules and respective assessments to a single student.
+
+    If the `previous` assessment of the student is given, grades of assessments
+    with the same plugin and parameters are reused instead of being computed
+    again, so that only the assessments affected by rule changes are performed.
+    """
+    # Locks for plugins which must not run concurrently, if any
+    if plugin_locks is None:
+        plugin_locks = {}
+
+    # Previously performed assessments of each repository, if any
+    previous_grades: Dict[str, Dict[Tuple[str, str], float]] = {}
+    if previous is not None:
+        for previous_repo in previous.assessed_repos:
+            previous_grades[previous_repo.name] = {
+                a.key: a.grade_raw
+                for a in previous_repo.assessments
+                if a.skipped is None
+            }
+
+    # Create instance of current student's assessment
+    assessed_student: AssessedStudent = AssessedStudent(student_git.sid)
+
+    with timed("student_assessed", sid=student_git.sid) as event:
         # Loop through rules
-        for rule in rules:
+        for repo_plan in rules.repos:
             # Create an instance of the repository being assessed
-            assessed_repo: AssessedRepo = AssessedRepo(rule["repo"], rule["weight"])
+            assessed_repo = AssessedRepo(repo_plan.name, repo_plan.weight)
 
             # If student has the repository specified in the current rule, apply
             # the specified assessments
-            if rule["repo"] in student_git.repos:
+            if repo_plan.name in student_git.repos:
                 # Get the student's repository local path
-                assessed_repo.local_path = student_git.repos[rule["repo"]]
-
-                # Append repository being assessed to dictionary of repositories
-                # by name (will be required later for inter-repository assessments)
-                repos_by_name[rule["repo"]].append(assessed_repo)
-
-                # Loop through the assessments to be made for the current rule's
-                # repository, if any
-                if "assessments" in rule:
-                    for assess_rule in rule["assessments"]:
-                        # Get the plugin function which will perform the assessment
-                        # and the respective parameters
-                        assess_fun = assess_functions[assess_rule["name"]]
-                        assess_params = assess_rule.get("params", {})
-
-                        # Perform assessment and obtain the assessment's grade
-                        # between 0 and 1
-                        assess_grade = assess_fun(
-                            student_git, assessed_repo.local_path, **assess_params
-                        )
-
-                        # Create assessment object
-                        assessment = Assessment(
-                            assess_rule["name"],
-                            get_short_plugin_desc(assess_fun),
-                            assess_params,
-                            assess_rule["weight"],
-                            assess_grade,
-                        )
-
-                        # Add it to the repository currently being assessed
-                        assessed_repo.add_assessment(assessment)
+                assessed_repo.local_path = student_git.repos[repo_plan.name]
+
+                # Perform the assessments for the current rule's repository
+                _assess_repo(
+                    student_git,
+                    assessed_repo,
+                    repo_plan,
+                    plugin_locks,
+                    previous_grades.get(repo_plan.name, {}),
+                )
 
             # Add assessed repo to student being assessed
             assessed_student.add_assessed_repo(assessed_repo)
 
-        # Add assessed student to list of assessed students
-        assessed_students.append(assessed_student)
-
-    # Obtained all the repository assessments defined by the rules
-    required_inter_assessments: MutableSet[str] = {
-        inter_assess_rule["name"]
-        for rule in rules
-        if "inter_assessments" in rule
-        for inter_assess_rule in rule["inter_assessments"]
-    }
-
-    # Load required inter-assessment plugins as specified by the rules
-    inter_assess_functions: Dict[str, Any] = load_inter_repo_plugin_functions(
-        required_inter_assessments
-    )
-
-    # Apply intra-repository assessments
-    for rule in rules:
-        if "inter_assessments" in rule:
-            for inter_assess_rule in rule["inter_assessments"]:
-                repos_with_name: List[AssessedRepo] = repos_by_name[rule["repo"]]
-
-                inter_assess_fun = inter_assess_functions[inter_assess_rule["name"]]
-                inter_assess_params = inter_assess_rule.get("params", {})
-
-                # Perform inter-repo assessment and obtain the assessment's
-                # grade between 0 and 1
-                inter_assess_grades = inter_assess_fun(
-                    [sr.local_path for sr in repos_with_name], **inter_assess_params
+        event["grade"] = assessed_student.grade
+
+    return assessed_student
+
+
+def _assess_repo(
+    student_git: StudentGit,
+    assessed_repo: AssessedRepo,
+    repo_plan: RepoPlan,
+    plugin_locks: Dict[str, Lock],
+    previous_grades: Dict[Tuple[str, str], float],
+) -> None:
+    """Perform the assessments of a student repository, skipping needless ones.
+
+    Grades in `previous_grades`, keyed by `assessment_key()`, are reused.
+    """
+    # Ids of assessments performed with a non-zero grade
+    passed_ids: MutableSet[str] = set()
+
+    # Index of the first failed assessment which stops the following ones
+    stop_idx: int | None = None
+
+    # Assessments by index, to be added to the repository in rule order
+    assessments: Dict[int, Assessment] = {}
+
+    for i in repo_plan.exec_order:
+        assess_plan: AssessmentPlan = repo_plan.assessments[i]
+
+        # Determine if the assessment should be skipped, and why
+        failed_ids = [rid for rid in assess_plan.requires if rid not in passed_ids]
+        skipped: str | None = None
+        if repo_plan.weight == 0:
+            skipped = "Repository has zero weight"
+        elif stop_idx is not None and i > stop_idx:
+            skipped = f"Stopped after {repo_plan.assessments[stop_idx].name!r} failed"
+        elif len(failed_ids) > 0:
+            skipped = f"Required assessments {failed_ids} not passed"
+        elif assess_plan.weight == 0 and not assess_plan.is_gate:
+            skipped = "Assessment has zero weight"
+
+        # Perform assessment and obtain the assessment's grade between 0 and 1,
+        # unless it was already performed before
+        assess_grade: float = 0
+        previous_grade: float | None = previous_grades.get(
+            assessment_key(assess_plan.name, assess_plan.params)
+        )
+        if skipped is None and previous_grade is not None:
+            assess_grade = previous_grade
+            emit(
+                "assessment_reused",
+                sid=student_git.sid,
+                repo=assessed_repo.name,
+                name=assess_plan.name,
+            )
+        elif skipped is None:
+            plugin_lock: ContextManager[Any] = plugin_locks.get(
+                assess_plan.name, nullcontext()
+            )
+            with (
+                plugin_lock,
+                timed(
+                    "assessment",
+                    sid=student_git.sid,
+                    repo=assessed_repo.name,
+                    name=assess_plan.name,
+                ) as event,
+            ):
+                assess_grade = assess_plan.function(
+                    student_git, assessed_repo.local_path, **assess_plan.params
                 )
-
-                # Create assessments (one per repos with the current name)
-                assessments = [
-                    Assessment(
-                        inter_assess_rule["name"],
-                        get_short_plugin_desc(inter_assess_fun),
-                        inter_assess_params,
-                        inter_assess_rule["weight"],
-                        iag,
+                event["grade"] = assess_grade
+        else:
+            emit(
+                "assessment_skipped",
+                sid=student_git.sid,
+                repo=assessed_repo.name,
+                name=assess_plan.name,
+                reason=skipped,
+            )
+
+        # Keep track of passed and failed assessments
+        if skipped is None and assess_grade > 0:
+            if assess_plan.id is not None:
+                passed_ids.add(assess_plan.id)
+        elif assess_plan.stop_on_fail and (stop_idx is None or i < stop_idx):
+            stop_idx = i
+
+        # Create assessment object
+        assessments[i] = Assessment(
+            assess_plan.name,
+            assess_plan.description,
+            assess_plan.params,
+            assess_plan.weight,
+            assess_grade,
+            skipped,
+        )
+
+    # Add assessments to the repository in rule order
+    for i in range(len(repo_plan.assessments)):
+        assessed_repo.add_assessment(assessments[i])
+
+
+def assess_inter_repos(
+    rules: RulesPlan, assessed_students: Sequence[AssessedStudent], jobs: int = 1
+) -> None:
+    """Apply inter-repository assessments to already assessed students.
+
+    The features of map/reduce plugins are extracted from up to `jobs`
+    repositories in parallel, and only once per repository and plugin.
+    """
+    # Initialize dictionary of assessed repositories by name, considering only
+    # the repositories which actually exist locally
+    repos_by_name: Dict[str, List[AssessedRepo]] = {
+        name: [] for name in rules.repo_names
+    }
+    for assessed_student in assessed_students:
+        for assessed_repo in assessed_student.assessed_repos:
+            # Previous inter-repository assessments, if any, are no longer valid
+            assessed_repo.clear_inter_assessments()
+            if assessed_repo.local_path is not None:
+                repos_by_name[assessed_repo.name].append(assessed_repo)
+
+    # Features already extracted by map/reduce plugins, by extract function and
+    # repository path
+    features: Dict[Tuple[Callable[[str], Any], str], Any] = {}
+
+    # Apply inter-repository assessments
+    for repo_plan in rules.repos:
+        for inter_plan in repo_plan.inter_assessments:
+            repos_with_name: List[AssessedRepo] = repos_by_name[repo_plan.name]
+            repo_paths: List[str] = [str(sr.local_path) for sr in repos_with_name]
+
+            # Perform inter-repo assessment and obtain the assessment's
+            # grade between 0 and 1
+            with timed(
+                "inter_assessment",
+                repo=repo_plan.name,
+                name=inter_plan.name,
+                repos=len(repos_with_name),
+            ):
+                if isinstance(inter_plan.function, MapReducePlugin):
+                    inter_assess_grades = inter_plan.function.reduce(
+                        _extract_features(
+                            inter_plan.function,
+                            repo_paths,
+                            features,
+                            jobs if inter_plan.capabilities.parallel_safe else 1,
+                        ),
+                        **inter_plan.params,
+                    )
+                else:
+                    inter_assess_grades = inter_plan.function(
+                        repo_paths, **inter_plan.params
                     )
-                    for iag in inter_assess_grades
-                ]
-
-                # Add assessments to each repo with the current name
-                for ar, a in zip(repos_with_name, assessments, strict=True):
-                    ar.add_inter_assessment(a)
-
-    # Determine file path where to save assessment information
-    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
-
-    # Save list of assessed students to yaml file
-    save_yaml(assessed_students_fp, assessed_students)
-
-    # Number of assessments performed
-    n_assessments = sum([s.assessment_count for s in assessed_students])
 
-    # Provide feedback to the user
-    print(f"- Absolute assessment path: {assess_fp.absolute()}.")
-    print(f"- Fetched student repository information from {students_git_fp}")
-    print(
-        f"- Performed {n_assessments} assessments on {len(assessed_students)} "
-        f"student repositories at {get_student_repos_fp(assess_fp)}."
-    )
-    print(f"- Updated {assessed_students_fp}.")
+            # Create assessments (one per repos with the current name)
+            assessments = [
+                Assessment(
+                    inter_plan.name,
+                    inter_plan.description,
+                    inter_plan.params,
+                    inter_plan.weight,
+                    iag,
+                )
+                for iag in inter_assess_grades
+            ]
+
+            # Add assessments to each repo with the current name
+            for ar, a in zip(repos_with_name, assessments, strict=True):
+                ar.add_inter_assessment(a)
+
+
+def _extract_features(
+    plugin: MapReducePlugin,
+    repo_paths: Sequence[str],
+    features: Dict[Tuple[Callable[[str], Any], str], Any],
+    jobs: int,
+) -> List[Any]:
+    """Extract the features of a map/reduce plugin, reusing known ones."""
+    # Only extract features not extracted before, possibly in parallel
+    missing: List[str] = [
+        rp for rp in repo_paths if (plugin.extract, rp) not in features
+    ]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for rp, feature in zip(
+            missing, executor.map(plugin.extract, missing), strict=True
+        ):
+            features[(plugin.extract, rp)] = feature
+
+    return [features[(plugin.extract, rp)] for rp in repo_paths]
@@ -0,0 +1,212 @@
+"""Batch mode: fetch and assess several assessments in a single process."""
+
+from argparse import Namespace
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from threading import Lock
+from typing import AbstractSet, Any, Dict, Final, List, MutableSet, Sequence
+
+from .assess import assess_inter_repos, assess_student, make_plugin_locks
+from .cache import build_cache, feature_cache
+from .cli_lib import OPT_E_LONG, check_empty_args
+from .events import emit
+from .fetch import (
+    FetchScheduler,
+    iter_fetch_repos,
+    open_students_git,
+    prepare_assess_folder,
+)
+from .files import LOCK_EXCLUSIVE, assessment_lock
+from .paths import (
+    check_required_fp_exists,
+    get_assessed_students_fp,
+    get_builds_cache_fp,
+    get_features_cache_fp,
+    get_valid_students_git_fp,
+)
+from .results import save_assessed_students
+from .rules import RulesPlan, load_rules
+from .types import STUDENTS_GIT_SCHEMA, AssessedStudent, StudentGit
+from .yaml import load_yaml, yaml_list_writer
+
+_BATCH_JOB_KEYS: Final[AbstractSet[str]] = frozenset({"urls", "rules", "folder"})
+
+
+class BatchJob:
+    """An assessment in a batch: student URLs, rules and assessment folder."""
+
+    def __init__(self, urls_fp: Path, rules_fp: Path, assess_fp: Path) -> None:
+        """Initialize an instance of this class."""
+        self.urls_fp: Path = urls_fp
+        self.rules_fp: Path = rules_fp
+        self.assess_fp: Path = assess_fp
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(urls_fp=%r, rules_fp=%r, assess_fp=%r)" % (
+            self.__class__.__name__,
+            self.urls_fp,
+            self.rules_fp,
+            self.assess_fp,
+        )
+
+
+def load_batch_manifest(manifest_fp: Path) -> List[BatchJob]:
+    """Load a batch manifest, a yaml list of jobs with `urls`, `rules` and `folder`.
+
+    Paths are relative to the folder containing the manifest.
+
+    Raises:
+      SyntaxError: If the manifest is invalid, or has repeated folders.
+    """
+    jobs_data: Any = load_yaml(manifest_fp)
+    if not isinstance(jobs_data, list) or len(jobs_data) == 0:
+        raise SyntaxError(f"Batch manifest {str(manifest_fp)!r} must be a job list")
+
+    jobs: List[BatchJob] = []
+    folders: MutableSet[Path] = set()
+    for i, job_data in enumerate(jobs_data):
+        where: str = f"job {i} of batch manifest {str(manifest_fp)!r}"
+        if not isinstance(job_data, dict) or set(job_data) != _BATCH_JOB_KEYS:
+            raise SyntaxError(
+                f"Invalid {where}, it must have exactly the "
+                f"{sorted(_BATCH_JOB_KEYS)} keys"
+            )
+
+        job = BatchJob(
+            manifest_fp.parent.joinpath(str(job_data["urls"])),
+            manifest_fp.parent.joinpath(str(job_data["rules"])),
+            manifest_fp.parent.joinpath(str(job_data["folder"])),
+        )
+        if job.assess_fp.resolve() in folders:
+            raise SyntaxError(f"Folder of {where} is used by a previous job")
+        folders.add(job.assess_fp.resolve())
+        jobs.append(job)
+
+    return jobs
+
+
+def batch(assess_fp: Path | None, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Fetch and assess the jobs in a batch manifest, sharing work between them.
+
+    Plugins are loaded once, repositories requested by several jobs are only
+    fetched once, and all students are assessed in a single worker pool.
+    Repository features and builds are cached beside the manifest, so they're
+    shared too.
+    """
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Check if the manifest exists, and if not, quit
+    manifest_fp: Path = Path(args.manifest)
+    check_required_fp_exists(manifest_fp)
+
+    # Load the manifest, and check if the files of each job exist
+    jobs: List[BatchJob] = load_batch_manifest(manifest_fp)
+    for job in jobs:
+        check_required_fp_exists(job.urls_fp)
+        check_required_fp_exists(job.rules_fp)
+
+    # Load and validate the rules of every job, before doing any actual work
+    rules: List[RulesPlan] = [load_rules(job.rules_fp) for job in jobs]
+
+    # Data needed from each repository, considering every job, so that a
+    # repository fetched for one job is also suitable for the others
+    repo_needs: Dict[str, AbstractSet[str]] = {}
+    for rules_plan in rules:
+        for repo_name, needs in rules_plan.repo_needs.items():
+            repo_needs[repo_name] = repo_needs.get(repo_name, frozenset()) | needs
+
+    # Plugins which are not parallel safe must not run concurrently, in any job
+    plugin_locks: Dict[str, Lock] = {}
+    for rules_plan in rules:
+        for name, lock in make_plugin_locks(rules_plan.assess_functions).items():
+            plugin_locks.setdefault(name, lock)
+
+    with ExitStack() as stack:
+        # Lock every assessment folder, always in the same order, so that
+        # concurrent batches don't deadlock
+        for job in sorted(jobs, key=lambda j: j.assess_fp.resolve()):
+            stack.enter_context(assessment_lock(job.assess_fp, LOCK_EXCLUSIVE))
+
+        # Fetch repositories of each job, sharing a single fetch scheduler
+        scheduler = FetchScheduler(
+            args.retries,
+            args.backoff,
+            wait_time=args.wait,
+            skip_lfs=args.skip_lfs,
+            blob_limit=args.blob_limit,
+        )
+        students_git: List[List[StudentGit]] = [
+            _fetch_job(job, rules_plan, repo_needs, scheduler, args)
+            for job, rules_plan in zip(jobs, rules, strict=True)
+        ]
+
+        # Assess the students of every job in a single worker pool
+        emit("assess_started", students=sum(len(sgs) for sgs in students_git))
+        with (
+            feature_cache(get_features_cache_fp(manifest_fp.parent)),
+            build_cache(get_builds_cache_fp(manifest_fp.parent), args.build_cache_size),
+        ):
+            with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                futures: List[List[Future[AssessedStudent]]] = [
+                    [
+                        executor.submit(assess_student, sg, rules_plan, plugin_locks)
+                        for sg in job_students_git
+                    ]
+                    for job_students_git, rules_plan in zip(
+                        students_git, rules, strict=True
+                    )
+                ]
+                assessed_students: List[List[AssessedStudent]] = [
+                    [future.result() for future in job_futures]
+                    for job_futures in futures
+                ]
+
+            # Apply inter-repository assessments and save each job's assessment
+            for job, rules_plan, job_assessed_students in zip(
+                jobs, rules, assessed_students, strict=True
+            ):
+                assess_inter_repos(rules_plan, job_assessed_students, args.jobs)
+                save_assessed_students(job.assess_fp, job_assessed_students)
+
+    # Provide feedback to the user
+    for job, job_students_git, job_assessed_students in zip(
+        jobs, students_git, assessed_students, strict=True
+    ):
+        print(
+            f"- {job.assess_fp}: fetched "
+            f"{sum(sg.repo_count for sg in job_students_git)} repositories from "
+            f"{len(job_students_git)} students, performed "
+            f"{sum(s.assessment_count for s in job_assessed_students)} assessments, "
+            f"updated {get_assessed_students_fp(job.assess_fp)}."
+        )
+
+
+def _fetch_job(
+    job: BatchJob,
+    rules_plan: RulesPlan,
+    repo_needs: Dict[str, AbstractSet[str]],
+    scheduler: FetchScheduler,
+    args: Namespace,
+) -> List[StudentGit]:
+    """Fetch the repositories of a job, saving its validated URLs file."""
+    # Prepare the assessment folder, according to the -e command line option
+    prepare_assess_folder(job.assess_fp, getattr(args, OPT_E_LONG))
+
+    # Clone or update student repositories, saving validated URLs and repositories
+    students_git_fp: Path = get_valid_students_git_fp(job.assess_fp)
+    students_git: List[StudentGit] = []
+    with yaml_list_writer(students_git_fp, STUDENTS_GIT_SCHEMA) as save_student_git:
+        for student_git in iter_fetch_repos(
+            job.assess_fp,
+            open_students_git(students_git_fp, job.urls_fp),
+            rules_plan.repo_names,
+            repo_needs,
+            scheduler,
+        ):
+            save_student_git(student_git.to_dict())
+            students_git.append(student_git)
+
+    return students_git
@@ -0,0 +1,348 @@
+"""Export and import assessment snapshots as Git bundles."""
+
+import tarfile
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Final, List, Sequence, Tuple
+
+from .cli_lib import check_empty_args
+from .fetch import GIT_CONFIG_NO_CHECKOUT, load_students_git, save_students_git
+from .git import GitError, git, git_at, git_head
+from .paths import (
+    check_required_fp_exists,
+    get_assessed_students_fp,
+    get_student_repo_fp,
+    get_valid_students_git_fp,
+)
+from .results import load_assessed_students, save_assessed_students
+from .types import StudentGit
+from .yaml import Schema, load_yaml_list, yaml_list_writer
+
+BUNDLE_FORMAT_BUNDLE: Final[str] = "bundle"
+BUNDLE_FORMAT_TAR: Final[str] = "tar"
+
+BUNDLES_SCHEMA: Final[Schema] = ("egrader.bundles", 1)
+
+_FILE_BUNDLES_MANIFEST: Final[str] = "bundles.yml"
+_FOLDER_BUNDLES: Final[str] = "bundles"
+
+# Parts of an archived .git folder which are restored, i.e., objects and
+# references, but never its configuration, hooks, alternates or other files
+_GIT_DATA_FILES: Final[Tuple[str, ...]] = ("HEAD", "packed-refs", "shallow")
+_GIT_DATA_FOLDERS: Final[Tuple[str, ...]] = ("objects", "refs")
+_GIT_DATA_EXCLUDED: Final[Tuple[str, ...]] = ("objects/info",)
+
+
+class RepoBundle:
+    """A student repository saved in a single file of an archive.
+
+    Repositories are saved as Git bundles. Shallow and empty repositories can't
+    be bundled, so their `.git` folder is saved as a tar file instead.
+    """
+
+    def __init__(
+        self, sid: str, repo_name: str, file: str, fmt: str, checkout: bool
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          sid: Student ID.
+          repo_name: Repository name.
+          file: Path of the bundle, relative to the archive, in POSIX format.
+          fmt: Either `bundle` or `tar`.
+          checkout: Whether the repository has a working tree.
+        """
+        self.sid: str = sid
+        self.repo_name: str = repo_name
+        self.file: str = file
+        self.fmt: str = fmt
+        self.checkout: bool = checkout
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(sid=%r, repo_name=%r, file=%r, fmt=%r, checkout=%r)" % (
+            self.__class__.__name__,
+            self.sid,
+            self.repo_name,
+            self.file,
+            self.fmt,
+            self.checkout,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for saving it."""
+        return {
+            "sid": self.sid,
+            "repo_name": self.repo_name,
+            "file": self.file,
+            "format": self.fmt,
+            "checkout": self.checkout,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RepoBundle":
+        """Create an instance from plain data, as saved by `to_dict()`."""
+        if data["format"] not in (BUNDLE_FORMAT_BUNDLE, BUNDLE_FORMAT_TAR):
+            raise ValueError(f"Unknown bundle format {data['format']!r}")
+
+        # Files must stay inside the archive, and repositories inside the
+        # assessment folder
+        for key in ("sid", "repo_name"):
+            if (
+                not isinstance(data[key], str)
+                or data[key] in ("", ".", "..")
+                or any(sep in data[key] for sep in ("/", "\\"))
+            ):
+                raise ValueError(f"Invalid {key} {data[key]!r}")
+        file = PurePosixPath(data["file"])
+        if (
+            file.is_absolute()
+            or ".." in file.parts
+            or file.parts[:1] != (_FOLDER_BUNDLES,)
+        ):
+            raise ValueError(f"Invalid bundle file {data['file']!r}")
+
+        return cls(
+            data["sid"],
+            data["repo_name"],
+            data["file"],
+            data["format"],
+            data["checkout"],
+        )
+
+
+def export_bundles(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Export an assessment as an archive of repository bundles and results."""
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Check if assessment folder and validated students file exist, and if not, quit
+    check_required_fp_exists(assess_fp)
+    students_git_fp: Path = get_valid_students_git_fp(assess_fp)
+    check_required_fp_exists(students_git_fp)
+
+    # Never overwrite an existing archive
+    archive_fp: Path = Path(args.archive)
+    if archive_fp.exists():
+        raise FileExistsError(f"Archive {str(archive_fp)!r} already exists")
+
+    # Load students and their repositories
+    students_git: List[StudentGit] = load_students_git(students_git_fp)
+    student_repos: List[Tuple[str, str]] = [
+        (student_git.sid, repo_name)
+        for student_git in students_git
+        for repo_name in student_git.repos
+    ]
+
+    # Save each repository in a single file, possibly in parallel
+    archive_fp.mkdir(parents=True)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        bundles: List[RepoBundle] = list(
+            executor.map(
+                lambda sr: _export_repo(assess_fp, archive_fp, *sr), student_repos
+            )
+        )
+
+    # Save the list of bundles
+    with yaml_list_writer(
+        archive_fp.joinpath(_FILE_BUNDLES_MANIFEST), BUNDLES_SCHEMA
+    ) as save_bundle:
+        for bundle in bundles:
+            save_bundle(bundle.to_dict())
+
+    # Save students and, if available, their assessments
+    save_students_git(get_valid_students_git_fp(archive_fp), students_git)
+    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
+    if assessed_students_fp.exists():
+        save_assessed_students(archive_fp, load_assessed_students(assess_fp))
+
+    # Provide feedback to the user
+    n_tar = sum(bundle.fmt == BUNDLE_FORMAT_TAR for bundle in bundles)
+    print(f"- Absolute assessment path: {assess_fp.absolute()}.")
+    print(
+        f"- Exported {len(bundles)} repositories of {len(students_git)} students "
+        f"({n_tar} shallow or empty ones as tar files) to {archive_fp}."
+    )
+
+
+def import_bundles(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Import an assessment from an archive created with `export_bundles()`."""
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Check if the archive exists, and if not, quit
+    archive_fp: Path = Path(args.archive)
+    manifest_fp: Path = archive_fp.joinpath(_FILE_BUNDLES_MANIFEST)
+    check_required_fp_exists(manifest_fp)
+
+    # Never overwrite an existing assessment
+    if assess_fp.exists() and any(assess_fp.iterdir()):
+        raise FileExistsError(f"Assessment folder {str(assess_fp)!r} is not empty")
+
+    # Load bundles and students
+    bundles: List[RepoBundle] = load_yaml_list(
+        manifest_fp, BUNDLES_SCHEMA, RepoBundle.from_dict
+    )
+    students_git: List[StudentGit] = load_students_git(
+        get_valid_students_git_fp(archive_fp)
+    )
+    students_by_sid: Dict[str, StudentGit] = {sg.sid: sg for sg in students_git}
+    for bundle in bundles:
+        if bundle.sid not in students_by_sid:
+            raise SyntaxError(
+                f"Bundle {bundle.file!r} is of student {bundle.sid!r}, who is not in "
+                f"{str(get_valid_students_git_fp(archive_fp))!r}"
+            )
+
+    # Restore each repository, possibly in parallel
+    assess_fp.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        list(
+            executor.map(
+                lambda b: _import_repo(
+                    archive_fp, assess_fp, b, students_by_sid[b.sid]
+                ),
+                bundles,
+            )
+        )
+
+    # Repositories are now in the assessment folder, update their location
+    for bundle in bundles:
+        students_by_sid[bundle.sid].repos[bundle.repo_name] = str(
+            get_student_repo_fp(assess_fp, bundle.sid, bundle.repo_name)
+        )
+    save_students_git(get_valid_students_git_fp(assess_fp), students_git)
+
+    # Same for assessments, if any
+    if get_assessed_students_fp(archive_fp).exists():
+        assessed_students = load_assessed_students(archive_fp)
+        for assessed_student in assessed_students:
+            for assessed_repo in assessed_student.assessed_repos:
+                if assessed_repo.local_path is not None:
+                    assessed_repo.local_path = str(
+                        get_student_repo_fp(
+                            assess_fp, assessed_student.sid, assessed_repo.name
+                        )
+                    )
+        save_assessed_students(assess_fp, assessed_students)
+
+    # Provide feedback to the user
+    print(f"- Absolute assessment path: {assess_fp.absolute()}.")
+    print(
+        f"- Imported {len(bundles)} repositories of {len(students_git)} students "
+        f"from {archive_fp}."
+    )
+
+
+def _export_repo(
+    assess_fp: Path, archive_fp: Path, sid: str, repo_name: str
+) -> RepoBundle:
+    """Save a student repository in a single file of the archive."""
+    repo_fp: Path = get_student_repo_fp(assess_fp, sid, repo_name)
+    checkout: bool = _has_checkout(repo_fp)
+
+    # Bundles can't have missing history nor be empty, use tar files for those
+    fmt: str = BUNDLE_FORMAT_BUNDLE
+    if (
+        str(git_at(repo_fp, "rev-parse", "--is-shallow-repository")).strip() == "true"
+        or git_head(repo_fp) is None
+    ):
+        fmt = BUNDLE_FORMAT_TAR
+
+    # Determine where to save the repository
+    file = PurePosixPath(_FOLDER_BUNDLES, sid, f"{repo_name}.{fmt}")
+    file_fp: Path = archive_fp.joinpath(file)
+    file_fp.parent.mkdir(parents=True, exist_ok=True)
+
+    # Save the repository, all of its references in the case of bundles
+    if fmt == BUNDLE_FORMAT_BUNDLE:
+        git_at(repo_fp, "bundle", "create", file_fp.absolute(), "--all")
+    else:
+        with tarfile.open(file_fp, "w") as tar_file:
+            tar_file.add(repo_fp.joinpath(".git"), arcname=".git")
+
+    return RepoBundle(sid, repo_name, str(file), fmt, checkout)
+
+
+def _import_repo(
+    archive_fp: Path, assess_fp: Path, bundle: RepoBundle, student_git: StudentGit
+) -> None:
+    """Restore a student repository from its file in the archive."""
+    repo_fp: Path = get_student_repo_fp(assess_fp, bundle.sid, bundle.repo_name)
+    file_fp: Path = archive_fp.joinpath(bundle.file)
+
+    if bundle.fmt == BUNDLE_FORMAT_BUNDLE:
+        # Clone the bundle, keeping the repository without working tree if needed
+        clone_args: List[str] = []
+        if not bundle.checkout:
+            clone_args = ["--no-checkout", "--config", f"{GIT_CONFIG_NO_CHECKOUT}=1"]
+        git("clone", *clone_args, file_fp, repo_fp)
+
+        # Future updates should come from the student, not from the bundle
+        git_at(
+            repo_fp,
+            "remote",
+            "set-url",
+            "origin",
+            student_git.repo_url(bundle.repo_name),
+        )
+
+    else:
+        # Restore only the objects and references of the .git folder, in a new
+        # repository, so that the archived configuration and hooks, which could
+        # run arbitrary commands, are left out
+        git("init", repo_fp)
+        git_fp: Path = repo_fp.joinpath(".git")
+        with tarfile.open(file_fp) as tar_file:
+            members: List[tarfile.TarInfo] = []
+            for member in tar_file.getmembers():
+                member_parts = PurePosixPath(member.name).parts
+                if (
+                    member_parts[:1] != (".git",)
+                    or ".." in member_parts
+                    or not (member.isfile() or member.isdir())
+                ):
+                    raise SyntaxError(
+                        f"Unexpected file {member.name!r} in {str(file_fp)!r}"
+                    )
+                git_path: str = "/".join(member_parts[1:])
+                if (
+                    (len(member_parts) == 2 and git_path in _GIT_DATA_FILES)
+                    or (len(member_parts) > 2 and member_parts[1] in _GIT_DATA_FOLDERS)
+                ) and not git_path.startswith(_GIT_DATA_EXCLUDED):
+                    members.append(member)
+            tar_file.extractall(repo_fp, members=members)
+
+        # Future updates come from the student, lazily fetching any objects left
+        # out of partial clones
+        git_at(
+            repo_fp, "remote", "add", "origin", student_git.repo_url(bundle.repo_name)
+        )
+        if any(git_fp.joinpath("objects", "pack").glob("*.promisor")):
+            git_at(repo_fp, "config", "remote.origin.promisor", "true")
+        try:
+            branch: str = str(
+                git_at(repo_fp, "symbolic-ref", "--short", "HEAD")
+            ).strip()
+        except GitError:
+            # Detached HEAD, there is no branch to pull into
+            pass
+        else:
+            git_at(repo_fp, "config", f"branch.{branch}.remote", "origin")
+            git_at(repo_fp, "config", f"branch.{branch}.merge", f"refs/heads/{branch}")
+
+        # Recreate the working tree, if the repository had one
+        if not bundle.checkout:
+            git_at(repo_fp, "config", GIT_CONFIG_NO_CHECKOUT, "1")
+        elif git_head(repo_fp) is not None:
+            git_at(repo_fp, "reset", "--hard", "HEAD")
+
+
+def _has_checkout(repo_fp: Path) -> bool:
+    """Check if a repository has a working tree, i.e., wasn't cloned without it."""
+    try:
+        git_at(repo_fp, "config", "--get", GIT_CONFIG_NO_CHECKOUT)
+    except GitError:
+        return True
+    return False
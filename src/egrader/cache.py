@@ -0,0 +1,373 @@
+"""Cache of features and build outputs derived from student repositories."""
+
+import json
+import os
+import shutil
+import stat
+from contextlib import contextmanager, suppress
+from filecmp import cmp
+from hashlib import sha256
+from pathlib import Path
+from tempfile import mkdtemp
+from threading import Lock
+from typing import Any, Callable, Dict, Final, Iterator, List, Sequence, Tuple, TypeVar
+
+from .events import emit
+from .files import atomic_writer
+from .git import GitError, git_at
+
+_FEATURES_CACHE_MAX_BYTES: Final[int] = 64 * 1024 * 1024
+_FEATURE_FILE_SUFFIX: Final[str] = ".json"
+_BUILDS_CACHE_MAX_BYTES: Final[int] = 1024 * 1024 * 1024
+_BUILD_MANIFEST: Final[str] = "build.json"
+_BUILD_OUTPUTS: Final[str] = "outputs"
+
+_T = TypeVar("_T")
+
+
+class FeatureCache:
+    """Content-addressed cache of features derived from repositories.
+
+    A feature is any value computed from a repository which only depends on its
+    contents, such as its number of commits or the list of commit dates. Features
+    are keyed by the state of the repository (its HEAD and other references) and
+    by the feature name, so they never have to be invalidated: once a repository
+    changes, its features are simply looked up under a new key. Old features are
+    evicted, least recently used first, when the cache exceeds its maximum size.
+
+    Features are stored as JSON, so they must be plain data (strings, numbers,
+    booleans, None, lists, and dictionaries with string keys), which loads back
+    unchanged. Loading features never runs code, even if the cache was tampered
+    with.
+
+    The state of each repository is determined only once, so a cache should not
+    be used across repository updates.
+    """
+
+    def __init__(
+        self, cache_fp: Path, max_bytes: int = _FEATURES_CACHE_MAX_BYTES
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          cache_fp: Folder where features are stored, created if necessary.
+          max_bytes: Maximum size of the stored features, in bytes.
+        """
+        self.cache_fp: Path = cache_fp
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self._repo_states: Dict[str, str | None] = {}
+        self._lock: Lock = Lock()
+        self.cache_fp.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(cache_fp=%r, max_bytes=%r)" % (
+            self.__class__.__name__,
+            self.cache_fp,
+            self.max_bytes,
+        )
+
+    def get(self, repo_path: str, feature: str, compute: Callable[[], _T]) -> _T:
+        """Get a repository feature, computing and storing it if not cached.
+
+        Args:
+          repo_path: Path of the repository the feature is derived from.
+          feature: Name of the feature, unique among all features.
+          compute: Function which computes the feature if it's not in the cache,
+            as plain data. Exceptions it raises are propagated and nothing is
+            cached.
+
+        Returns:
+          The feature value.
+        """
+        # Repositories whose state can't be determined are not cached
+        repo_state: str | None = self._repo_state(repo_path)
+        if repo_state is None:
+            return compute()
+
+        feature_fp: Path = self.cache_fp.joinpath(
+            sha256(f"{repo_state}\0{feature}".encode()).hexdigest()
+            + _FEATURE_FILE_SUFFIX
+        )
+
+        # Try to load the feature, marking it as recently used
+        try:
+            value: _T = json.loads(feature_fp.read_text())
+            os.utime(feature_fp)
+        except (OSError, ValueError):
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        # Not cached (or unreadable), compute it and store it atomically
+        value = compute()
+        with atomic_writer(feature_fp) as feature_file:
+            json.dump(value, feature_file)
+        with self._lock:
+            self.misses += 1
+        return value
+
+    def evict(self) -> int:
+        """Remove least recently used features until the cache fits its size.
+
+        Returns:
+          Number of features removed.
+        """
+        # Stored features, most recently used first
+        features: List[os.stat_result] = []
+        feature_fps: List[Path] = []
+        for fp in self.cache_fp.glob(f"*{_FEATURE_FILE_SUFFIX}"):
+            feature_fps.append(fp)
+            features.append(fp.stat())
+        order: List[int] = sorted(
+            range(len(features)), key=lambda i: -features[i].st_mtime
+        )
+
+        # Keep the most recent features which fit in the cache
+        total: int = 0
+        evicted: int = 0
+        for i in order:
+            total += features[i].st_size
+            if total > self.max_bytes:
+                feature_fps[i].unlink(missing_ok=True)
+                evicted += 1
+
+        return evicted
+
+    def _repo_state(self, repo_path: str) -> str | None:
+        """Determine the state of a repository, i.e., its HEAD and references."""
+        with self._lock:
+            if repo_path in self._repo_states:
+                return self._repo_states[repo_path]
+
+        try:
+            state: str | None = sha256(
+                str(git_at(repo_path, "show-ref", "--head")).encode()
+            ).hexdigest()
+        except GitError:
+            state = None
+
+        with self._lock:
+            self._repo_states[repo_path] = state
+        return state
+
+
+class BuildCache:
+    """Content-addressed cache of build outputs, stored as plain files.
+
+    Each build is stored in a folder of its own, named after a hash of a key
+    which identifies the build command and its sources, with a copy of each
+    output file and a small manifest listing the outputs and their modes. Failed
+    builds are stored too, with no outputs, so they're not retried. Outputs are
+    copied between the cache and the repositories without loading them into
+    memory. Old builds are evicted, least recently used first, when the cache
+    exceeds its maximum size, independently of the feature cache.
+    """
+
+    def __init__(
+        self, cache_fp: Path, max_bytes: int = _BUILDS_CACHE_MAX_BYTES
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          cache_fp: Folder where builds are stored, created if necessary.
+          max_bytes: Maximum size of the stored builds, in bytes.
+        """
+        self.cache_fp: Path = cache_fp
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock: Lock = Lock()
+        self.cache_fp.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(cache_fp=%r, max_bytes=%r)" % (
+            self.__class__.__name__,
+            self.cache_fp,
+            self.max_bytes,
+        )
+
+    def get(
+        self, key: str, repo_fp: Path, build: Callable[[], Sequence[str] | None]
+    ) -> bool:
+        """Place the outputs of a build in a repository, building it if not cached.
+
+        Args:
+          key: Key which uniquely identifies the build, e.g. its command and a
+            hash of its sources.
+          repo_fp: Repository where the build runs and its outputs are placed.
+          build: Function which runs the build in `repo_fp` if it's not in the
+            cache, returning the paths of its outputs relative to `repo_fp`, or
+            None if the build failed. Exceptions it raises are propagated and
+            nothing is cached.
+
+        Returns:
+          Whether the build succeeded.
+        """
+        build_fp: Path = self.cache_fp.joinpath(sha256(key.encode()).hexdigest())
+        manifest_fp: Path = build_fp.joinpath(_BUILD_MANIFEST)
+
+        # Try to load the build manifest, marking the build as recently used
+        try:
+            manifest: Any = json.loads(manifest_fp.read_text())
+            outputs: Dict[str, int] | None = manifest["outputs"]
+            os.utime(manifest_fp)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Not cached, or partially removed, so build it again
+            shutil.rmtree(build_fp, ignore_errors=True)
+        else:
+            with self._lock:
+                self.hits += 1
+            if outputs is None:
+                return False
+            self._copy_outputs(build_fp.joinpath(_BUILD_OUTPUTS), repo_fp, outputs)
+            return True
+
+        # Build it, storing outputs in a temporary folder renamed once complete
+        output_paths: Sequence[str] | None = build()
+        tmp_fp: Path = Path(mkdtemp(prefix=".", dir=self.cache_fp))
+        try:
+            outputs = (
+                None
+                if output_paths is None
+                else {
+                    output: stat.S_IMODE(repo_fp.joinpath(output).stat().st_mode)
+                    for output in output_paths
+                }
+            )
+            if outputs is not None:
+                self._copy_outputs(repo_fp, tmp_fp.joinpath(_BUILD_OUTPUTS), outputs)
+            tmp_fp.joinpath(_BUILD_MANIFEST).write_text(
+                json.dumps({"key": key, "outputs": outputs})
+            )
+            # If the same build was stored concurrently, keep that one
+            with suppress(OSError):
+                os.rename(tmp_fp, build_fp)
+        finally:
+            shutil.rmtree(tmp_fp, ignore_errors=True)
+
+        with self._lock:
+            self.misses += 1
+        return outputs is not None
+
+    def evict(self) -> int:
+        """Remove least recently used builds until the cache fits its size.
+
+        Returns:
+          Number of builds removed.
+        """
+        # Stored builds, with when they were last used and their size
+        builds: List[Tuple[float, int, Path]] = []
+        for build_fp in self.cache_fp.iterdir():
+            if build_fp.name.startswith("."):
+                continue
+            try:
+                last_used: float = build_fp.joinpath(_BUILD_MANIFEST).stat().st_mtime
+            except OSError:
+                last_used = 0
+            size: int = sum(
+                fp.stat().st_size for fp in build_fp.rglob("*") if fp.is_file()
+            )
+            builds.append((last_used, size, build_fp))
+
+        # Keep the most recent builds which fit in the cache
+        total: int = 0
+        evicted: int = 0
+        for _, size, build_fp in sorted(builds, key=lambda b: -b[0]):
+            total += size
+            if total > self.max_bytes:
+                shutil.rmtree(build_fp, ignore_errors=True)
+                evicted += 1
+
+        return evicted
+
+    @staticmethod
+    def _copy_outputs(src_fp: Path, dst_fp: Path, outputs: Dict[str, int]) -> None:
+        """Copy build outputs between folders, unless they're already there."""
+        for output, mode in outputs.items():
+            src_output_fp: Path = src_fp.joinpath(output)
+            dst_output_fp: Path = dst_fp.joinpath(output)
+            if not dst_output_fp.is_file() or not cmp(
+                src_output_fp, dst_output_fp, shallow=False
+            ):
+                dst_output_fp.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(src_output_fp, dst_output_fp)
+            dst_output_fp.chmod(mode)
+
+
+# Feature and build caches currently in use, if any
+_feature_cache: FeatureCache | None = None
+_build_cache: BuildCache | None = None
+
+
+def cached_feature(repo_path: str, feature: str, compute: Callable[[], _T]) -> _T:
+    """Get a repository feature from the current feature cache, if any.
+
+    If no feature cache is in use, the feature is simply computed. See
+    `FeatureCache.get()`.
+    """
+    if _feature_cache is None:
+        return compute()
+    return _feature_cache.get(repo_path, feature, compute)
+
+
+def cached_build(
+    key: str, repo_fp: Path, build: Callable[[], Sequence[str] | None]
+) -> bool:
+    """Place the outputs of a build from the current build cache, if any.
+
+    If no build cache is in use, the project is simply built. See
+    `BuildCache.get()`.
+    """
+    if _build_cache is None:
+        return build() is not None
+    return _build_cache.get(key, repo_fp, build)
+
+
+@contextmanager
+def feature_cache(
+    cache_fp: Path, max_bytes: int = _FEATURES_CACHE_MAX_BYTES
+) -> Iterator[FeatureCache]:
+    """Use a feature cache while the `with` block runs, evicting old features after.
+
+    Args:
+      cache_fp: Folder where features are stored, created if necessary.
+      max_bytes: Maximum size of the stored features, in bytes.
+    """
+    global _feature_cache
+
+    cache = FeatureCache(cache_fp, max_bytes)
+    previous, _feature_cache = _feature_cache, cache
+    try:
+        yield cache
+    finally:
+        _feature_cache = previous
+        evicted: int = cache.evict()
+        emit("feature_cache", hits=cache.hits, misses=cache.misses, evicted=evicted)
+
+
+@contextmanager
+def build_cache(
+    cache_fp: Path, max_bytes: int = _BUILDS_CACHE_MAX_BYTES
+) -> Iterator[BuildCache]:
+    """Use a build cache while the `with` block runs, evicting old builds after.
+
+    Args:
+      cache_fp: Folder where builds are stored, created if necessary.
+      max_bytes: Maximum size of the stored builds, in bytes.
+    """
+    global _build_cache
+
+    cache = BuildCache(cache_fp, max_bytes)
+    previous, _build_cache = _build_cache, cache
+    try:
+        yield cache
+    finally:
+        _build_cache = previous
+        evicted: int = cache.evict()
+        emit("build_cache", hits=cache.hits, misses=cache.misses, evicted=evicted)
@@ -2,14 +2,16 @@
 
 import sys
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
-from contextlib import redirect_stdout
+from contextlib import nullcontext, redirect_stdout
 from io import StringIO
 from pathlib import Path
-from typing import Final
+from typing import Any, ContextManager, Final
 
 from sh import ErrorReturnCode
 
 from .assess import assess
+from .batch import batch
+from .bundle import export_bundles, import_bundles
 from .cli_lib import (
     OPT_E_LONG,
     OPT_E_OVWR,
@@ -17,15 +19,27 @@ from .cli_lib import (
     OPT_E_STOP,
     OPT_E_UPDT,
     CLIArgError,
+    blob_size,
+    byte_size,
+    positive_int,
 )
+from .diff import diff
+from .events import event_log, timed
 from .fetch import fetch
+from .files import LOCK_EXCLUSIVE, LOCK_SHARED, assessment_lock
+from .paths import get_metrics_fp
 from .plugin import PluginLoadError, list_plugins
 from .plugins.report import report_basic
 from .report import report
+from .rules import RulesError
+from .run import run
+from .watch import watch
 
 _ASSESS_FOLDER_ATTR: Final[str] = "assess_folder"
 _RULES_FILE_ATTR: Final[str] = "rules_file"
 _FOLDER_ASSESS_DEFAULT_PREFIX: Final[str] = "out_"
+_LIVE_OUTPUT_ATTR: Final[str] = "live_output"
+_LOCK_ATTR: Final[str] = "lock"
 
 
 def main():
@@ -43,12 +57,22 @@ def main():
         help="show complete exception traceback when an error occurs",
     )
 
-    # Allow for subcommands
-    subparsers = parser.add_subparsers(title="commands", required=True)
+    # Structured event log and metrics, for monitoring long-running commands
+    parser.add_argument(
+        "--events",
+        metavar="FILE",
+        help="append progress events in JSON lines format to FILE (- for stderr)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="write event metrics in Prometheus text format to the assessment "
+        "folder",
+    )
 
-    # Create the parser for the "fetch" command
-    parser_fetch = subparsers.add_parser("fetch", help="fetch all repositories")
-    parser_fetch.add_argument(
+    # Options shared by commands which fetch repositories
+    parser_existing = ArgumentParser(add_help=False)
+    parser_existing.add_argument(
         f"-{OPT_E_SHORT}",
         f"--{OPT_E_LONG}",
         choices=[OPT_E_STOP, OPT_E_UPDT, OPT_E_OVWR],
@@ -56,16 +80,65 @@ def main():
         f"(default: {OPT_E_STOP})",
         default=OPT_E_STOP,
     )
-
-    parser_fetch.add_argument(
+    parser_fetch_opts = ArgumentParser(add_help=False)
+    parser_fetch_opts.add_argument(
         "-w",
         "--wait",
-        help="time in seconds to wait between clones/fetches (default: 0)",
+        help="minimum time in seconds between clones/fetches from the same remote "
+        "host, increased while the host is overloaded (default: 0)",
         metavar="SECS",
         type=float,
         default=0,
     )
+    parser_fetch_opts.add_argument(
+        "--retries",
+        help="times to retry a clone/fetch which failed due to a possibly "
+        "temporary error, e.g. a network failure (default: 3)",
+        metavar="N",
+        type=int,
+        default=3,
+    )
+    parser_fetch_opts.add_argument(
+        "--backoff",
+        help="time in seconds to wait before the first retry, doubling on each "
+        "retry after that (default: 1)",
+        metavar="SECS",
+        type=float,
+        default=1.0,
+    )
+    parser_fetch_opts.add_argument(
+        "--skip-lfs",
+        action="store_true",
+        help="don't download files stored with Git LFS, keeping pointer files",
+    )
+    parser_fetch_opts.add_argument(
+        "--blob-limit",
+        help="don't download files larger than SIZE (e.g. 1m) from the history, "
+        "only when needed for the working tree or by a plugin",
+        metavar="SIZE",
+        type=blob_size,
+    )
+
+    # Options shared by commands which assess repositories
+    parser_build_cache = ArgumentParser(add_help=False)
+    parser_build_cache.add_argument(
+        "--build-cache-size",
+        help="maximum size of the build outputs kept between assessments, "
+        "least recently used builds being removed first (default: 1g)",
+        metavar="SIZE",
+        type=byte_size,
+        default="1g",
+    )
 
+    # Allow for subcommands
+    subparsers = parser.add_subparsers(title="commands", required=True)
+
+    # Create the parser for the "fetch" command
+    parser_fetch = subparsers.add_parser(
+        "fetch",
+        help="fetch all repositories",
+        parents=[parser_existing, parser_fetch_opts],
+    )
     parser_fetch.add_argument(
         "urls_file",
         metavar="URLS",
@@ -83,10 +156,28 @@ def main():
         "minus yaml extension)",
         nargs="?",
     )
-    parser_fetch.set_defaults(func=fetch)
+    parser_fetch.set_defaults(func=fetch, **{_LOCK_ATTR: LOCK_EXCLUSIVE})
 
     # Create the parser for the "assess" command
-    parser_assess = subparsers.add_parser("assess", help="perform assessment")
+    parser_assess = subparsers.add_parser(
+        "assess", help="perform assessment", parents=[parser_build_cache]
+    )
+    parser_assess.add_argument(
+        "-j",
+        "--jobs",
+        help="number of students to assess in parallel (default: 1)",
+        metavar="N",
+        type=positive_int,
+        default=1,
+    )
+    parser_assess.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="only perform assessments affected by changes to the rules since the "
+        "previous assessment, assuming unchanged repositories and plugins, and "
+        "show how grades would change instead of saving them",
+    )
     parser_assess.add_argument(
         _RULES_FILE_ATTR,
         metavar=_RULES_FILE_ATTR.upper(),
@@ -99,12 +190,18 @@ def main():
         "minus yaml extension)",
         nargs="?",
     )
-    parser_assess.set_defaults(func=assess)
+    parser_assess.set_defaults(func=assess, **{_LOCK_ATTR: LOCK_EXCLUSIVE})
 
     # Create the parser for the "report" command
     parser_report = subparsers.add_parser(
         "report", help="generate an assessment report"
     )
+    parser_report.add_argument(
+        "-s",
+        "--student",
+        help="report only on the student with this ID",
+        metavar="SID",
+    )
     parser_report.add_argument(
         _ASSESS_FOLDER_ATTR,
         metavar=_ASSESS_FOLDER_ATTR.upper(),
@@ -118,7 +215,185 @@ def main():
         default=default_report,
         nargs="?",
     )
-    parser_report.set_defaults(func=report)
+    parser_report.set_defaults(func=report, **{_LOCK_ATTR: LOCK_SHARED})
+
+    # Create the parser for the "run" command
+    parser_run = subparsers.add_parser(
+        "run",
+        help="fetch and assess in a pipeline, i.e., fetch followed by assess",
+        parents=[parser_existing, parser_fetch_opts, parser_build_cache],
+    )
+    parser_run.add_argument(
+        "-j",
+        "--jobs",
+        help="number of students to assess in parallel (default: 1)",
+        metavar="N",
+        type=positive_int,
+        default=1,
+    )
+    parser_run.add_argument(
+        "-q",
+        "--queue-size",
+        help="maximum number of fetched students waiting for assessment "
+        "(default: 16)",
+        metavar="N",
+        type=positive_int,
+        default=16,
+    )
+    parser_run.add_argument(
+        "urls_file",
+        metavar="URLS",
+        help="student public Git account URLs file in TSV format",
+    )
+    parser_run.add_argument(
+        _RULES_FILE_ATTR,
+        metavar=_RULES_FILE_ATTR.upper(),
+        help="assessment rules in YAML format",
+    )
+    parser_run.add_argument(
+        _ASSESS_FOLDER_ATTR,
+        metavar=_ASSESS_FOLDER_ATTR.upper(),
+        help="Folder where assessment data will be placed (defaults to RULES "
+        "minus yaml extension)",
+        nargs="?",
+    )
+    parser_run.set_defaults(func=run, **{_LOCK_ATTR: LOCK_EXCLUSIVE})
+
+    # Create the parser for the "watch" command
+    parser_watch = subparsers.add_parser(
+        "watch",
+        help="continuously fetch and reassess updated repositories",
+        parents=[parser_fetch_opts, parser_build_cache],
+    )
+    parser_watch.add_argument(
+        "-i",
+        "--interval",
+        help="time in seconds between repository polls (default: 60)",
+        metavar="SECS",
+        type=float,
+        default=60,
+    )
+    parser_watch.add_argument(
+        "-c",
+        "--cycles",
+        help="stop after this number of poll cycles, 0 means forever (default: 0)",
+        metavar="N",
+        type=int,
+        default=0,
+    )
+    parser_watch.add_argument(
+        "urls_file",
+        metavar="URLS",
+        help="student public Git account URLs file in TSV format",
+    )
+    parser_watch.add_argument(
+        _RULES_FILE_ATTR,
+        metavar=_RULES_FILE_ATTR.upper(),
+        help="assessment rules in YAML format",
+    )
+    parser_watch.add_argument(
+        _ASSESS_FOLDER_ATTR,
+        metavar=_ASSESS_FOLDER_ATTR.upper(),
+        help="Folder where assessment data will be placed (defaults to RULES "
+        "minus yaml extension)",
+        nargs="?",
+    )
+    parser_watch.set_defaults(func=watch, **{_LIVE_OUTPUT_ATTR: True})
+
+    # Create the parser for the "export" command
+    parser_export = subparsers.add_parser(
+        "export", help="export an assessment as repository bundles and results"
+    )
+    parser_export.add_argument(
+        "-j",
+        "--jobs",
+        help="number of repositories to export in parallel (default: 1)",
+        metavar="N",
+        type=positive_int,
+        default=1,
+    )
+    parser_export.add_argument(
+        _ASSESS_FOLDER_ATTR,
+        metavar=_ASSESS_FOLDER_ATTR.upper(),
+        help="Folder with the assessment data to export",
+    )
+    parser_export.add_argument(
+        "archive",
+        metavar="ARCHIVE",
+        help="Folder where the bundles and results will be placed",
+    )
+    parser_export.set_defaults(func=export_bundles, **{_LOCK_ATTR: LOCK_SHARED})
+
+    # Create the parser for the "import" command
+    parser_import = subparsers.add_parser(
+        "import", help="import an assessment from repository bundles and results"
+    )
+    parser_import.add_argument(
+        "-j",
+        "--jobs",
+        help="number of repositories to import in parallel (default: 1)",
+        metavar="N",
+        type=positive_int,
+        default=1,
+    )
+    parser_import.add_argument(
+        "archive",
+        metavar="ARCHIVE",
+        help="Folder with the bundles and results created by the export command",
+    )
+    parser_import.add_argument(
+        _ASSESS_FOLDER_ATTR,
+        metavar=_ASSESS_FOLDER_ATTR.upper(),
+        help="Folder where assessment data will be placed",
+    )
+    parser_import.set_defaults(func=import_bundles, **{_LOCK_ATTR: LOCK_EXCLUSIVE})
+
+    # Create the parser for the "diff" command
+    parser_diff = subparsers.add_parser(
+        "diff", help="compare the grades of two assessments"
+    )
+    parser_diff.add_argument(
+        "-t",
+        "--tolerance",
+        help="ignore grade changes up to this value (default: 1e-9)",
+        metavar="DELTA",
+        type=float,
+        default=1e-9,
+    )
+    parser_diff.add_argument(
+        "old_folder",
+        metavar="OLD_FOLDER",
+        help="Folder with the assessment data to compare against",
+    )
+    parser_diff.add_argument(
+        _ASSESS_FOLDER_ATTR,
+        metavar=_ASSESS_FOLDER_ATTR.upper(),
+        help="Folder with the assessment data to compare",
+    )
+    parser_diff.set_defaults(func=diff, **{_LOCK_ATTR: LOCK_SHARED})
+
+    # Create the parser for the "batch" command
+    parser_batch = subparsers.add_parser(
+        "batch",
+        help="fetch and assess several assessments, sharing fetches and workers",
+        parents=[parser_existing, parser_fetch_opts, parser_build_cache],
+    )
+    parser_batch.add_argument(
+        "-j",
+        "--jobs",
+        help="number of students to assess in parallel, across all assessments "
+        "(default: 1)",
+        metavar="N",
+        type=positive_int,
+        default=1,
+    )
+    parser_batch.add_argument(
+        "manifest",
+        metavar="MANIFEST",
+        help="YAML list of assessments, each with `urls`, `rules` and `folder` "
+        "paths, relative to the manifest",
+    )
+    parser_batch.set_defaults(func=batch)
 
     # Create the parser for the "plugins" command
     parser_plugins = subparsers.add_parser("plugins", help="list available plugins")
@@ -131,7 +406,11 @@ def main():
     assess_folder = getattr(args[0], _ASSESS_FOLDER_ATTR, None)
     rules_file = getattr(args[0], _RULES_FILE_ATTR, None)
 
-    if assess_folder is None and rules_file is None and args[0].func != list_plugins:
+    if (
+        assess_folder is None
+        and rules_file is None
+        and args[0].func not in (list_plugins, batch)
+    ):
         # This should not be possible
         raise AssertionError(
             f"{_ASSESS_FOLDER_ATTR.upper()} and {_RULES_FILE_ATTR.upper()} "
@@ -146,17 +425,42 @@ def main():
     else:
         assess_fp = None
 
+    # Determine metrics file path, if requested
+    metrics_fp = (
+        get_metrics_fp(assess_fp) if args[0].metrics and assess_fp is not None else None
+    )
+
+    # Lock the assessment folder, if the command requires it; watch locks it
+    # on its own, only while updating it
+    lock_mode: str | None = getattr(args[0], _LOCK_ATTR, None)
+    lock: ContextManager[Any] = (
+        assessment_lock(assess_fp, lock_mode)
+        if lock_mode is not None and assess_fp is not None
+        else nullcontext()
+    )
+
     # Invoke function to perform selected command
     try:
-        with StringIO() as out_stream, redirect_stdout(out_stream):
-            args[0].func(assess_fp, args[0], args[1])
-            out_string = out_stream.getvalue()
+        with (
+            lock,
+            event_log(args[0].events, metrics_fp),
+            timed("command", command=args[0].func.__name__),
+        ):
+            if getattr(args[0], _LIVE_OUTPUT_ATTR, False):
+                # Long-running commands show their output as it is produced
+                args[0].func(assess_fp, args[0], args[1])
+                out_string = ""
+            else:
+                with StringIO() as out_stream, redirect_stdout(out_stream):
+                    args[0].func(assess_fp, args[0], args[1])
+                    out_string = out_stream.getvalue()
     except (
         ErrorReturnCode,
         FileNotFoundError,
         FileExistsError,
         CLIArgError,
         PluginLoadError,
+        RulesError,
         SyntaxError,
     ) as e:
         print(e.args[0], file=sys.stderr)
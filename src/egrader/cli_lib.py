@@ -1,6 +1,8 @@
 """Functions used by the command-line interface."""
 
-from typing import Final, Sequence
+import re
+from argparse import ArgumentTypeError
+from typing import Dict, Final, Sequence
 
 OPT_E_SHORT: Final[str] = "e"
 OPT_E_LONG: Final[str] = "existing"
@@ -8,6 +10,9 @@ OPT_E_STOP: Final[str] = "stop"
 OPT_E_UPDT: Final[str] = "update"
 OPT_E_OVWR: Final[str] = "overwrite"
 
+# Multipliers of the size suffixes accepted in command-line options, as in Git
+_SIZE_UNITS: Final[Dict[str, int]] = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
 
 class CLIArgError(Exception):
     """Error raised when command-line arguments are invalid."""
@@ -17,3 +22,42 @@ def check_empty_args(args: Sequence[str]) -> None:
     """Check that argument list is empty, otherwise raise error."""
     if len(args) > 0:
         raise CLIArgError(None, f"Invalid arguments: {', '.join(args)}")
+
+
+def blob_size(value: str) -> str:
+    """Validate a blob size for Git, such as 512k, 10m or 1g (argparse type).
+
+    >>> blob_size("10m")
+    '10m'
+    """
+    if re.fullmatch(r"[0-9]+[kmg]?", value.lower()) is None:
+        raise ArgumentTypeError(
+            f"invalid size {value!r}, use bytes optionally followed by k, m or g"
+        )
+    return value.lower()
+
+
+def byte_size(value: str) -> int:
+    """Convert a size such as 512k, 10m or 1g to bytes (argparse type).
+
+    >>> byte_size("2k")
+    2048
+    """
+    size: str = blob_size(value)
+    unit: str = size[-1] if size[-1] in _SIZE_UNITS else ""
+    return int(size[: len(size) - len(unit)]) * _SIZE_UNITS[unit]
+
+
+def positive_int(value: str) -> int:
+    """Convert a count such as a number of jobs, which is at least 1 (argparse type).
+
+    >>> positive_int("4")
+    4
+    """
+    try:
+        count: int = int(value)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise ArgumentTypeError(f"invalid count {value!r}, use an integer from 1")
+    return count
@@ -0,0 +1,233 @@
+"""Comparison of assessment results."""
+
+from argparse import Namespace
+from pathlib import Path
+from typing import Dict, Final, Iterable, Iterator, List, Sequence
+
+from .cli_lib import check_empty_args
+from .paths import check_required_fp_exists, get_assessed_students_fp
+from .results import iter_assessed_students
+from .types import AssessedStudent
+
+# Grade changes smaller than this are considered rounding errors
+_DIFF_TOLERANCE: Final[float] = 1e-9
+
+
+class AssessmentDelta:
+    """Change in how much an assessment contributes to a student's grade."""
+
+    def __init__(self, label: str, old: float | None, new: float | None) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          label: Repository, assessment plugin and parameters.
+          old: Contribution in the old results, None if not there.
+          new: Contribution in the new results, None if not there.
+        """
+        self.label: str = label
+        self.old: float | None = old
+        self.new: float | None = new
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(label=%r, old=%r, new=%r)" % (
+            self.__class__.__name__,
+            self.label,
+            self.old,
+            self.new,
+        )
+
+    @property
+    def delta(self) -> float:
+        """Change in the contribution to the student's grade."""
+        return (self.new or 0) - (self.old or 0)
+
+
+class StudentDelta:
+    """Change in a student's grade, along with the assessments which changed."""
+
+    def __init__(
+        self,
+        sid: str,
+        old_grade: float | None,
+        new_grade: float | None,
+        assessments: Sequence[AssessmentDelta],
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          sid: Student ID.
+          old_grade: Grade in the old results, None if the student isn't there.
+          new_grade: Grade in the new results, None if the student isn't there.
+          assessments: Assessments whose contribution to the grade changed.
+        """
+        self.sid: str = sid
+        self.old_grade: float | None = old_grade
+        self.new_grade: float | None = new_grade
+        self.assessments: List[AssessmentDelta] = list(assessments)
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(sid=%r, old_grade=%r, new_grade=%r, assessments=%r)" % (
+            self.__class__.__name__,
+            self.sid,
+            self.old_grade,
+            self.new_grade,
+            self.assessments,
+        )
+
+    @property
+    def delta(self) -> float:
+        """Change in the student's grade."""
+        return (self.new_grade or 0) - (self.old_grade or 0)
+
+    @property
+    def changed(self) -> bool:
+        """Was the student added, removed, or did any assessment change?"""
+        return (
+            self.old_grade is None
+            or self.new_grade is None
+            or len(self.assessments) > 0
+        )
+
+
+def diff(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Compare the results of two assessments, showing grade changes."""
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Check if both assessment results exist, and if not, quit
+    old_fp: Path = Path(args.old_folder)
+    check_required_fp_exists(get_assessed_students_fp(old_fp))
+    check_required_fp_exists(get_assessed_students_fp(assess_fp))
+
+    # Compare students one at a time, in student ID order
+    print_student_deltas(
+        diff_assessed_students(
+            iter_assessed_students(old_fp),
+            iter_assessed_students(assess_fp),
+            args.tolerance,
+        )
+    )
+
+
+def diff_assessed_students(
+    old_students: Iterable[AssessedStudent],
+    new_students: Iterable[AssessedStudent],
+    tolerance: float = _DIFF_TOLERANCE,
+) -> Iterator[StudentDelta]:
+    """Compare two sequences of assessed students, both sorted by student ID.
+
+    The sequences are merged, so that each student is compared as soon as it is
+    read, without keeping the remaining students in memory. A delta is yielded
+    for every student, with the assessments whose contribution to the student's
+    grade changed by more than `tolerance`, assessments only in one of the
+    results contributing nothing to the other. Assessments are matched by
+    repository, plugin and parameters, so reordering rules or changing weights
+    doesn't make them different assessments.
+    """
+    old_iter: Iterator[AssessedStudent] = iter(old_students)
+    new_iter: Iterator[AssessedStudent] = iter(new_students)
+    old: AssessedStudent | None = next(old_iter, None)
+    new: AssessedStudent | None = next(new_iter, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old.sid < new.sid):
+            # Student only in the old results
+            yield _diff_student(old, None, tolerance)
+            old = next(old_iter, None)
+        elif old is None or new.sid < old.sid:
+            # Student only in the new results
+            yield _diff_student(None, new, tolerance)
+            new = next(new_iter, None)
+        else:
+            # Student in both results
+            yield _diff_student(old, new, tolerance)
+            old, new = next(old_iter, None), next(new_iter, None)
+
+
+def print_student_deltas(deltas: Iterable[StudentDelta]) -> None:
+    """Show the students whose grades changed, and a summary."""
+    n_students = n_changed = n_removed = n_added = 0
+
+    for student in deltas:
+        n_students += 1
+        if not student.changed:
+            continue
+        n_changed += 1
+
+        if student.new_grade is None:
+            n_removed += 1
+            print(f"- {student.sid}: only in old results, {student.old_grade:.4g}")
+            continue
+        if student.old_grade is None:
+            n_added += 1
+            print(f"- {student.sid}: only in new results, {student.new_grade:.4g}")
+            continue
+
+        print(
+            f"- {student.sid}: {student.old_grade:.4g} -> {student.new_grade:.4g} "
+            f"({student.delta:+.4g})"
+        )
+        for a in student.assessments:
+            old = "-" if a.old is None else f"{a.old:.4g}"
+            new = "-" if a.new is None else f"{a.new:.4g}"
+            print(f"  - {a.label}: {old} -> {new} ({a.delta:+.4g})")
+
+    print(
+        f"- Compared {n_students} students: {n_changed} changed, of which "
+        f"{n_removed} only in old results and {n_added} only in new results."
+    )
+
+
+def _diff_student(
+    old: AssessedStudent | None, new: AssessedStudent | None, tolerance: float
+) -> StudentDelta:
+    """Compare the assessments of a student in the old and new results."""
+    old_contribs: Dict[str, float] = _grade_contributions(old)
+    new_contribs: Dict[str, float] = _grade_contributions(new)
+
+    # Assessments in either results, in the order of the new ones
+    labels: Dict[str, None] = dict.fromkeys([*new_contribs, *old_contribs])
+    assessments: List[AssessmentDelta] = [
+        AssessmentDelta(label, old_contribs.get(label), new_contribs.get(label))
+        for label in labels
+    ]
+
+    sid: str = new.sid if new is not None else old.sid if old is not None else ""
+    return StudentDelta(
+        sid,
+        old.grade if old is not None else None,
+        new.grade if new is not None else None,
+        [a for a in assessments if abs(a.delta) > tolerance],
+    )
+
+
+def _grade_contributions(student: AssessedStudent | None) -> Dict[str, float]:
+    """Determine how much each assessment contributes to a student's grade.
+
+    Assessments are labeled by repository, plugin and parameters, numbering
+    repeated ones.
+    """
+    contribs: Dict[str, float] = {}
+    if student is None:
+        return contribs
+
+    for repo in student.assessed_repos:
+        for kind, assessments in (
+            ("", repo.assessments),
+            ("inter ", repo.inter_assessments),
+        ):
+            for a in assessments:
+                name, params = a.key
+                label: str = f"{repo.name}: {kind}{name}"
+                if len(a.parameters) > 0:
+                    label += f" {params}"
+                unique_label: str = label
+                n: int = 1
+                while unique_label in contribs:
+                    n += 1
+                    unique_label = f"{label} #{n}"
+                contribs[unique_label] = a.grade_final * repo.weight
+
+    return contribs
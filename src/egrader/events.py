@@ -0,0 +1,191 @@
+"""Structured event log and metrics of long-running commands."""
+
+import json
+import sys
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Dict, Final, Iterator, MutableMapping, TextIO
+
+from .files import atomic_writer
+
+_METRICS_PREFIX: Final[str] = "egrader"
+_METRICS_INTERVAL: Final[float] = 5.0
+_EVENTS_STDERR: Final[str] = "-"
+
+
+class EventLog:
+    """Writes events as JSON lines and keeps metrics about them.
+
+    Each event is a JSON object in its own line, with at least the `ts` (Unix
+    time) and `event` (event name) keys. Timed events also have the `duration`
+    (in seconds) and `ok` keys, the latter being False if the event ended with an
+    exception, in which case the `error` key contains its description.
+
+    If a metrics file is given, the number of events, failures and total
+    duration of each type of event are periodically written to it in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        metrics_fp: Path | None = None,
+        metrics_interval: float = _METRICS_INTERVAL,
+    ):
+        """Create a new event log.
+
+        Args:
+          stream: Where to write events, or None for not writing them.
+          metrics_fp: File where to write metrics, or None for not writing them.
+          metrics_interval: Minimum time in seconds between metrics file updates.
+        """
+        self.stream: TextIO | None = stream
+        self.metrics_fp: Path | None = metrics_fp
+        self.metrics_interval: float = metrics_interval
+        self.start_time: float = time()
+        self.counts: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.durations: Dict[str, float] = {}
+        self._lock: Lock = Lock()
+        self._metrics_written: float = monotonic()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """Log an event with the given fields."""
+        record: Dict[str, Any] = {"ts": round(time(), 3), "event": event, **fields}
+        with self._lock:
+            # Update metrics
+            self.counts[event] = self.counts.get(event, 0) + 1
+            if record.get("ok") is False:
+                self.failures[event] = self.failures.get(event, 0) + 1
+            if "duration" in record:
+                self.durations[event] = (
+                    self.durations.get(event, 0.0) + record["duration"]
+                )
+
+            # Write event immediately, so that it can be followed live
+            if self.stream is not None:
+                self.stream.write(json.dumps(record, default=str) + "\n")
+                self.stream.flush()
+
+            # Don't rewrite the metrics file too often
+            if monotonic() - self._metrics_written >= self.metrics_interval:
+                self._write_metrics()
+
+    @contextmanager
+    def timed(self, event: str, **fields: Any) -> Iterator[MutableMapping[str, Any]]:
+        """Log an event with its duration once the `with` block ends.
+
+        The yielded dictionary can be used to add fields to the event from
+        within the `with` block.
+        """
+        start: float = monotonic()
+        try:
+            yield fields
+        except Exception as e:
+            fields.update(ok=False, error=f"{type(e).__name__}: {e}")
+            raise
+        else:
+            fields.setdefault("ok", True)
+        finally:
+            self.emit(event, duration=round(monotonic() - start, 6), **fields)
+
+    def write_metrics(self) -> None:
+        """Write the metrics file now, if one was specified."""
+        with self._lock:
+            self._write_metrics()
+
+    def _write_metrics(self) -> None:
+        """Write the metrics file, assuming the lock is held."""
+        self._metrics_written = monotonic()
+
+        # No metrics file or no assessment folder (yet)
+        if self.metrics_fp is None or not self.metrics_fp.parent.exists():
+            return
+
+        lines = [
+            f"# TYPE {_METRICS_PREFIX}_start_time_seconds gauge",
+            f"{_METRICS_PREFIX}_start_time_seconds {self.start_time:.3f}",
+            f"# TYPE {_METRICS_PREFIX}_events_total counter",
+        ]
+        lines += [
+            f'{_METRICS_PREFIX}_events_total{{event="{event}"}} {count}'
+            for event, count in sorted(self.counts.items())
+        ]
+        lines.append(f"# TYPE {_METRICS_PREFIX}_event_failures_total counter")
+        lines += [
+            f'{_METRICS_PREFIX}_event_failures_total{{event="{event}"}} {count}'
+            for event, count in sorted(self.failures.items())
+        ]
+        lines.append(f"# TYPE {_METRICS_PREFIX}_event_duration_seconds_total counter")
+        lines += [
+            f'{_METRICS_PREFIX}_event_duration_seconds_total{{event="{event}"}} '
+            f"{duration:.6f}"
+            for event, duration in sorted(self.durations.items())
+        ]
+
+        # Replace the file atomically, so that scrapers never see it half written
+        with atomic_writer(self.metrics_fp) as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+
+
+# Event log currently in use, if any
+_event_log: EventLog | None = None
+
+
+def emit(event: str, **fields: Any) -> None:
+    """Log an event in the current event log, if any."""
+    if _event_log is not None:
+        _event_log.emit(event, **fields)
+
+
+@contextmanager
+def timed(event: str, **fields: Any) -> Iterator[MutableMapping[str, Any]]:
+    """Log a timed event in the current event log, if any.
+
+    See `EventLog.timed()`.
+    """
+    if _event_log is None:
+        yield fields
+    else:
+        with _event_log.timed(event, **fields) as event_fields:
+            yield event_fields
+
+
+@contextmanager
+def event_log(
+    events_file: str | None, metrics_fp: Path | None = None
+) -> Iterator[EventLog | None]:
+    """Use an event log while the `with` block runs.
+
+    Args:
+      events_file: File where to append events, `-` for the standard error, or
+        None for not writing events.
+      metrics_fp: File where to write metrics, or None for not writing them.
+    """
+    global _event_log
+
+    # Nothing to log
+    if events_file is None and metrics_fp is None:
+        yield None
+        return
+
+    with ExitStack() as stack:
+        # Open the events file, if any
+        stream: TextIO | None
+        if events_file is None:
+            stream = None
+        elif events_file == _EVENTS_STDERR:
+            stream = sys.stderr
+        else:
+            stream = stack.enter_context(Path(events_file).open("a", encoding="utf-8"))
+
+        # Make the event log available to the whole application
+        log = EventLog(stream, metrics_fp)
+        previous, _event_log = _event_log, log
+        try:
+            yield log
+        finally:
+            _event_log = previous
+            log.write_metrics()
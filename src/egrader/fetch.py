@@ -2,20 +2,58 @@
 
 import shutil
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from time import sleep
-from typing import List, Sequence
+from time import monotonic, sleep
+from typing import (
+    AbstractSet,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+)
+
+from yarl import URL
 
 from .cli_lib import OPT_E_LONG, OPT_E_OVWR, OPT_E_SHORT, OPT_E_STOP, check_empty_args
-from .git import GitError, git, git_at
+from .events import emit, timed
+from .git import (
+    GIT_ERROR_MISSING,
+    GIT_ERROR_TRANSIENT,
+    GitError,
+    git,
+    git_at,
+    git_head,
+)
 from .paths import (
     check_required_fp_exists,
     get_student_repo_fp,
     get_student_repos_fp,
     get_valid_students_git_fp,
 )
-from .types import StudentGit
-from .yaml import load_yaml, save_yaml
+from .plugin import NEEDS_ALL, NEEDS_CHECKOUT, NEEDS_LOG
+from .rules import RulesPlan, load_rules
+from .types import STUDENTS_GIT_SCHEMA, StudentGit
+from .yaml import load_yaml_list, yaml_list_writer
+
+GIT_CONFIG_NO_CHECKOUT: Final[str] = "egrader.nocheckout"
+_URLS_BATCH_SIZE: Final[int] = 256
+_URLS_VALIDATION_THREADS: Final[int] = 8
+_FETCH_RETRIES: Final[int] = 3
+_FETCH_BACKOFF: Final[float] = 1.0
+_FETCH_MAX_BACKOFF: Final[float] = 60.0
+_BREAKER_THRESHOLD: Final[int] = 5
+_BREAKER_COOLDOWN: Final[float] = 60.0
+_THROTTLE_BURST: Final[float] = 4.0
+_THROTTLE_MIN_INTERVAL: Final[float] = 0.5
+_THROTTLE_MAX_INTERVAL: Final[float] = 30.0
+_THROTTLE_SPEEDUP: Final[float] = 0.8
+
+# Environment which makes Git LFS leave pointer files instead of downloading
+_ENV_SKIP_LFS: Final[Dict[str, str]] = {"GIT_LFS_SKIP_SMUDGE": "1"}
 
 
 def fetch(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
@@ -29,9 +67,6 @@ def fetch(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
     urls_fp: Path = Path(args.urls_file)
     rules_fp: Path = Path(args.rules_file)
 
-    # Time to wait between fetches
-    wait_time: float = args.wait
-
     # Check if Git URLs file exists, and if not, quit
     check_required_fp_exists(urls_fp)
 
@@ -41,17 +76,68 @@ def fetch(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
     # Determine file path for validated URLs yaml file
     students_git_fp: Path = get_valid_students_git_fp(assess_fp)
 
+    # Load and validate rules, before doing any actual work
+    rules: RulesPlan = load_rules(rules_fp)
+
+    # Prepare the assessment folder, according to the -e command line option
+    prepare_assess_folder(assess_fp, getattr(args, OPT_E_LONG))
+
+    # Load student Git URLs, lazily if they haven't been validated yet
+    students_git: Iterable[StudentGit] = open_students_git(students_git_fp, urls_fp)
+
+    # Number of students, valid Git URLs, repositories and fetch errors
+    n_students = n_valid_urls = n_repos = n_fetch_errors = 0
+
+    # Clone or update student repositories, saving validated URLs and repositories
+    # as each student is done, to avoid rechecking them later with the
+    # "-e update" option
+    with yaml_list_writer(students_git_fp, STUDENTS_GIT_SCHEMA) as save_student_git:
+        for student_git in iter_fetch_repos(
+            assess_fp,
+            students_git,
+            rules.repo_names,
+            rules.repo_needs,
+            FetchScheduler(
+                args.retries,
+                args.backoff,
+                wait_time=args.wait,
+                skip_lfs=args.skip_lfs,
+                blob_limit=args.blob_limit,
+            ),
+        ):
+            save_student_git(student_git.to_dict())
+            n_students += 1
+            n_valid_urls += student_git.valid_url
+            n_repos += student_git.repo_count
+            n_fetch_errors += len(student_git.fetch_errors)
+
+    # Provide feedback to the user
+    print(
+        f"- Fetched {n_repos} repositories from {n_students} students, "
+        f"{n_valid_urls} of which with valid URLs."
+    )
+    if n_fetch_errors > 0:
+        print(
+            f"- Unable to fetch {n_fetch_errors} repositories, check fetch_errors "
+            f"in {students_git_fp}."
+        )
+    print(f"- Repositories saved at {get_student_repos_fp(assess_fp)}.")
+    print(f"- URL and repository validation report available at {students_git_fp}.")
+
+
+def prepare_assess_folder(assess_fp: Path, existing: str) -> None:
+    """Create the assessment folder, taking the specified action if it exists."""
     # Check if the assessment output folder exists
     if assess_fp.exists():
         # If so, action to take depends on the -e command line option
-        if getattr(args, OPT_E_LONG) == OPT_E_STOP:
+        if existing == OPT_E_STOP:
             # Stop processing
             raise FileExistsError(
                 "Assessment folder already exists, stopping operation. Check the "
                 f"-{OPT_E_SHORT}/--{OPT_E_LONG} option for alternative behavior."
             )
 
-        elif getattr(args, OPT_E_LONG) == OPT_E_OVWR:
+        elif existing == OPT_E_OVWR:
             # Delete folder and its contents and recreate it
             print(f"- Assessment folder already exists at {assess_fp}, deleting it.")
             shutil.rmtree(assess_fp)
@@ -60,129 +146,579 @@ def fetch(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
         # Folder doesn't exist, create it
         assess_fp.mkdir()
 
-    # Load rules
-    repo_rules = load_yaml(rules_fp)
 
-    # Declare list of student valid Git URLs
-    students_git: List[StudentGit]
+def load_students_git(students_git_fp: Path) -> List[StudentGit]:
+    """Load students and their repositories from the validated URLs file."""
+    return load_yaml_list(students_git_fp, STUDENTS_GIT_SCHEMA, StudentGit.from_dict)
 
-    # Load student Git URLs
+
+def save_students_git(
+    students_git_fp: Path, students_git: Iterable[StudentGit]
+) -> None:
+    """Save students and their repositories to the validated URLs file."""
+    with yaml_list_writer(students_git_fp, STUDENTS_GIT_SCHEMA) as save_student_git:
+        for student_git in students_git:
+            save_student_git(student_git.to_dict())
+
+
+def open_students_git(students_git_fp: Path, urls_fp: Path) -> Iterable[StudentGit]:
+    """Get student Git URLs, validated before or lazily validated from URLs file."""
     if students_git_fp.exists():
         # If file with validated URLs already exists, load info from there to
         # avoid rechecking the URLs (only with "-e update" option)
-        students_git = load_yaml(students_git_fp, safe=False)
+        return load_students_git(students_git_fp)
 
     else:
-        # Otherwise load info from original file and validate URLs
-        students_git = load_urls(urls_fp)
-
-    # Clone or update student repositories
-    n_valid_urls = fetch_repos(
-        assess_fp, students_git, [rule["repo"] for rule in repo_rules], wait_time
-    )
-
-    # Determine number of repositories
-    n_repos = sum([s.repo_count for s in students_git])
-
-    # Save validated URLs and repositories to avoid rechecking them later with
-    # the "-e update" option
-    save_yaml(students_git_fp, students_git)
-
-    # Provide feedback to the user
-    print(
-        f"- Fetched {n_repos} repositories from {len(students_git)} students, "
-        f"{n_valid_urls} of which with valid URLs."
-    )
-    print(f"- Repositories saved at {get_student_repos_fp(assess_fp)}.")
-    print(f"- URL and repository validation report available at {students_git_fp}.")
+        # Otherwise lazily load info from original file and validate URLs, so
+        # that cloning starts before the whole file is processed
+        return iter_urls(urls_fp)
 
 
 def fetch_repos(
     assess_fp: Path,
-    students_git: Sequence[StudentGit],
+    students_git: Iterable[StudentGit],
     repos: Sequence[str],
-    wait_time: float,
+    repo_needs: Dict[str, AbstractSet[str]] | None = None,
+    scheduler: "FetchScheduler | None" = None,
 ) -> int:
     """Clone or update student repositories."""
     # Number of valid Git URLs
-    n_valid_urls = 0
+    return sum(
+        student_git.valid_url
+        for student_git in iter_fetch_repos(
+            assess_fp, students_git, repos, repo_needs, scheduler
+        )
+    )
 
-    # Already fetched/cloned anything?
-    any_fetch = False
+
+def iter_fetch_repos(
+    assess_fp: Path,
+    students_git: Iterable[StudentGit],
+    repos: Sequence[str],
+    repo_needs: Dict[str, AbstractSet[str]] | None = None,
+    scheduler: "FetchScheduler | None" = None,
+) -> Iterator[StudentGit]:
+    """Clone or update student repositories, yielding each student when done.
+
+    Students with postponed fetches (see `FetchScheduler`) are only yielded at
+    the end, once their postponed fetches are retried.
+    """
+    # If not specified, assume all repository data is needed
+    if repo_needs is None:
+        repo_needs = {}
+
+    # If not specified, use the default retry, throttling and circuit breaking
+    # policy
+    if scheduler is None:
+        scheduler = FetchScheduler()
 
     # Loop through students
     for student_git in students_git:
-        if student_git.valid_url:
-            n_valid_urls += 1
+        # Are any of the student's fetches postponed?
+        postponed = False
 
+        if student_git.valid_url:
             # Loop through mandated repos
             for repo_name in repos:
-                # If a fetch/clone was already done, then wait the number of seconds
-                # specified by the user
-                if any_fetch:
-                    sleep(wait_time)
-
-                # Determine repo URL and local path
-                repo_url: str = student_git.repo_url(repo_name)
-                repo_fp: Path = get_student_repo_fp(
-                    assess_fp, student_git.sid, repo_name
+                # Clone or update the repository
+                postponed |= not scheduler.fetch(
+                    assess_fp,
+                    student_git,
+                    repo_name,
+                    repo_needs.get(repo_name, NEEDS_ALL),
                 )
 
-                # Does the repository already exist?
-                if repo_fp.exists():
-                    # Path exists, only update repository
-                    git_at(repo_fp, "pull")
-
-                    # Add repo location to student object
-                    student_git.add_repo(repo_name, str(repo_fp))
+        if not postponed:
+            emit("student_fetched", sid=student_git.sid, repos=student_git.repo_count)
+            yield student_git
+
+    # Retry postponed fetches, at last
+    for student_git in scheduler.retry_postponed(assess_fp):
+        emit("student_fetched", sid=student_git.sid, repos=student_git.repo_count)
+        yield student_git
+
+
+class HostThrottle:
+    """Adaptive token bucket which limits the rate of fetches from a host.
+
+    Each fetch takes a token, and tokens are replenished at one every `interval`
+    seconds, up to `burst` tokens. The interval doubles whenever the host
+    signals it's overloaded (e.g. with rate limiting errors), and shrinks after
+    each healthy response, back to the initial interval, which is never
+    undercut.
+    """
+
+    def __init__(self, interval: float = 0, burst: float = _THROTTLE_BURST) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          interval: Minimum time in seconds between fetches, 0 for no limit.
+          burst: Maximum number of fetches done without waiting.
+        """
+        self.min_interval: float = interval
+        self.interval: float = interval
+        self.burst: float = burst
+        self._tokens: float = burst
+        self._updated: float = monotonic()
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(interval=%r, burst=%r)" % (
+            self.__class__.__name__,
+            self.min_interval,
+            self.burst,
+        )
+
+    def acquire(self) -> float:
+        """Take a token, waiting for one if necessary, and return the time waited."""
+        # Replenish tokens for the time elapsed since the last update
+        now: float = monotonic()
+        if self.interval > 0:
+            self._tokens = min(
+                self._tokens + (now - self._updated) / self.interval, self.burst
+            )
+        else:
+            self._tokens = self.burst
+        self._updated = now
+
+        # Wait for a token if there is none
+        wait_time: float = max((1 - self._tokens) * self.interval, 0)
+        if wait_time > 0:
+            sleep(wait_time)
+            self._tokens, self._updated = 1, monotonic()
+        self._tokens -= 1
+
+        return wait_time
+
+    def slow_down(self) -> None:
+        """Reduce the rate of fetches, after the host signals it's overloaded."""
+        self.interval = min(
+            max(self.interval * 2, _THROTTLE_MIN_INTERVAL), _THROTTLE_MAX_INTERVAL
+        )
+        # No more bursts until the host recovers
+        self._tokens = min(self._tokens, 0)
+
+    def speed_up(self) -> None:
+        """Increase the rate of fetches, after a healthy response from the host."""
+        self.interval *= _THROTTLE_SPEEDUP
+        if self.interval < _THROTTLE_MIN_INTERVAL / 10:
+            self.interval = 0
+        # Never faster than the user asked for
+        self.interval = max(self.interval, self.min_interval)
+
+
+class FetchScheduler:
+    """Fetches repositories, retrying and postponing transient failures.
+
+    Git errors are classified (see `GitError`). Missing repositories are simply
+    not added to the student, while authentication and other permanent errors
+    are recorded in the student's `fetch_errors`, without retrying.
+
+    Fetches from each remote host are throttled by a `HostThrottle`, which slows
+    down when the host fails with transient errors, and speeds up when it
+    responds normally. Local repositories are never throttled.
+
+    Transient errors, such as network failures or rate limiting, are retried with
+    exponential backoff. Once a host fails too many times in a row, its circuit
+    opens: fetches from that host are postponed without being attempted, until a
+    cooldown period ends. Fetches which still fail, or are postponed, go to a
+    retry queue, processed by `retry_postponed()` once everything else is
+    fetched.
+
+    Each repository URL is fetched only once: if it is requested again, e.g. for
+    the same student in another assessment, the repository fetched before is
+    copied locally (see `copy_repo()`).
+    """
+
+    def __init__(
+        self,
+        retries: int = _FETCH_RETRIES,
+        backoff: float = _FETCH_BACKOFF,
+        breaker_threshold: int = _BREAKER_THRESHOLD,
+        breaker_cooldown: float = _BREAKER_COOLDOWN,
+        wait_time: float = 0,
+        skip_lfs: bool = False,
+        blob_limit: str | None = None,
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          retries: Number of retries after a transient error.
+          backoff: Seconds to wait before the first retry, doubling afterwards.
+          breaker_threshold: Consecutive transient errors in a host which open
+            its circuit.
+          breaker_cooldown: Seconds a host's circuit stays open.
+          wait_time: Minimum time in seconds between fetches from the same remote
+            host, increased while the host is overloaded.
+          skip_lfs: Don't download files stored with Git LFS (see `fetch_repo()`).
+          blob_limit: Don't download larger blobs (see `fetch_repo()`).
+        """
+        self.retries: int = retries
+        self.backoff: float = backoff
+        self.breaker_threshold: int = breaker_threshold
+        self.breaker_cooldown: float = breaker_cooldown
+        self.wait_time: float = wait_time
+        self.skip_lfs: bool = skip_lfs
+        self.blob_limit: str | None = blob_limit
+        self.postponed: List[Tuple[StudentGit, str, AbstractSet[str]]] = []
+        self._host_failures: Dict[str, int] = {}
+        self._host_open_until: Dict[str, float] = {}
+        self._host_throttles: Dict[str, HostThrottle] = {}
+        self._fetched: Dict[str, str | None] = {}
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return (
+            "%s(retries=%r, backoff=%r, breaker_threshold=%r, breaker_cooldown=%r, "
+            "wait_time=%r, skip_lfs=%r, blob_limit=%r)"
+            % (
+                self.__class__.__name__,
+                self.retries,
+                self.backoff,
+                self.breaker_threshold,
+                self.breaker_cooldown,
+                self.wait_time,
+                self.skip_lfs,
+                self.blob_limit,
+            )
+        )
+
+    def fetch(
+        self,
+        assess_fp: Path,
+        student_git: StudentGit,
+        repo_name: str,
+        needs: AbstractSet[str] = NEEDS_ALL,
+    ) -> bool:
+        """Clone or update a repository, returning False if it was postponed."""
+        # Repository already fetched, just copy it (unless it doesn't exist)
+        repo_url: str = student_git.repo_url(repo_name)
+        if repo_url in self._fetched:
+            source: str | None = self._fetched[repo_url]
+            repo_fp: Path = get_student_repo_fp(assess_fp, student_git.sid, repo_name)
+            if source is not None and Path(source).resolve() != repo_fp.resolve():
+                copy_repo(Path(source), assess_fp, student_git, repo_name, needs)
+            return True
+
+        host: str = _repo_host(student_git, repo_name)
+
+        # Don't even try if the host's circuit is open, or if retries didn't help
+        if self._host_open_until.get(host, 0) > monotonic() or (
+            not self._fetch_with_retries(assess_fp, student_git, repo_name, needs, host)
+        ):
+            emit("fetch_postponed", sid=student_git.sid, repo=repo_name, host=host)
+            self.postponed.append((student_git, repo_name, needs))
+            return False
+
+        return True
+
+    def forget_fetched(self) -> None:
+        """Forget which repositories were fetched, so that they're fetched again.
+
+        The state of each host, i.e., its throttle and circuit, is kept, e.g.
+        between the poll cycles of watch mode.
+        """
+        self._fetched.clear()
+
+    def retry_postponed(self, assess_fp: Path) -> List[StudentGit]:
+        """Retry postponed fetches, returning the respective students.
+
+        Fetches which fail again are recorded in the student's `fetch_errors`.
+        """
+        postponed, self.postponed = self.postponed, []
+        students_git: Dict[str, StudentGit] = {}
+
+        for student_git, repo_name, needs in postponed:
+            host: str = _repo_host(student_git, repo_name)
+
+            # Wait for the host's circuit to close
+            wait_time: float = self._host_open_until.get(host, 0) - monotonic()
+            if wait_time > 0:
+                sleep(wait_time)
+
+            if not self._fetch_with_retries(
+                assess_fp, student_git, repo_name, needs, host
+            ):
+                emit("fetch_failed", sid=student_git.sid, repo=repo_name, host=host)
+            students_git[student_git.sid] = student_git
+
+        return list(students_git.values())
+
+    def _fetch_with_retries(
+        self,
+        assess_fp: Path,
+        student_git: StudentGit,
+        repo_name: str,
+        needs: AbstractSet[str],
+        host: str,
+    ) -> bool:
+        """Fetch a repository, returning False if transient errors persisted."""
+        # Local repositories are not throttled
+        throttle: HostThrottle | None = None
+        if host != "":
+            throttle = self._host_throttles.setdefault(
+                host, HostThrottle(self.wait_time)
+            )
 
-                else:
-                    # Repository doesn't exist, do a full clone
-                    try:
-                        git("clone", repo_url, repo_fp)
+        for attempt in range(self.retries + 1):
+            # Exponential backoff before retrying
+            if attempt > 0:
+                sleep(min(self.backoff * 2 ** (attempt - 1), _FETCH_MAX_BACKOFF))
+
+            # Respect the host's current rate limit
+            if throttle is not None:
+                throttle.acquire()
+
+            try:
+                fetch_repo(
+                    assess_fp,
+                    student_git,
+                    repo_name,
+                    needs,
+                    self.skip_lfs,
+                    self.blob_limit,
+                )
 
-                    except GitError:
-                        # If a GitException occurs, assume the repo doesn't exist
-                        pass
+            except GitError as ge:
+                # Keep the error, in case this is the last attempt
+                student_git.fetch_errors[repo_name] = ge.reason
+
+                # Permanent errors are not retried, but the host is working
+                if ge.kind != GIT_ERROR_TRANSIENT:
+                    if throttle is not None:
+                        throttle.speed_up()
+                    return True
+
+                # Slow down, and open the host's circuit if it keeps failing
+                if throttle is not None:
+                    throttle.slow_down()
+                emit(
+                    "fetch_retry",
+                    sid=student_git.sid,
+                    repo=repo_name,
+                    host=host,
+                    interval=throttle.interval if throttle is not None else 0,
+                )
+                self._host_failures[host] = self._host_failures.get(host, 0) + 1
+                if self._host_failures[host] >= self.breaker_threshold:
+                    self._host_open_until[host] = monotonic() + self.breaker_cooldown
+                    self._host_failures[host] = 0
+                    return False
+
+            else:
+                # Success, so the host is working
+                self._fetched[student_git.repo_url(repo_name)] = student_git.repos.get(
+                    repo_name
+                )
+                student_git.fetch_errors.pop(repo_name, None)
+                self._host_failures[host] = 0
+                if throttle is not None:
+                    throttle.speed_up()
+                return True
 
-                    else:
-                        # Otherwise add repo location to student object
-                        student_git.add_repo(repo_name, str(repo_fp))
+        return False
 
-                # Indicate that at least one fetch/clone has been made
-                any_fetch = True
 
-    return n_valid_urls
+def _repo_host(student_git: StudentGit, repo_name: str) -> str:
+    """Determine the host of a student repository, empty for local ones."""
+    return URL(student_git.repo_url(repo_name)).host or ""
 
 
-def load_urls(urls_fp: Path) -> List[StudentGit]:
-    """Load student Git URLs."""
-    # The student list, initially empty
-    students_git: List[StudentGit] = []
-
-    # Open Git URLs file
-    with open(urls_fp) as urls_file:
-        # Cycle through each line of the file
-        for lno, line in enumerate(urls_file, 1):
-            # Remove leading and trailing whitespace
-            line = line.strip()
-
-            # Ignore line if it's empty or starts with # (comment)
-            if len(line) == 0 or line[0] == "#":
-                continue
-
-            # Split line and check that it's composed of three chunks
-            std_url = line.split()
-            if len(std_url) != 3:
-                raise SyntaxError(
-                    f"Syntax error in line {lno} of {urls_fp}: " f"{line!r}"
+def fetch_repo(
+    assess_fp: Path,
+    student_git: StudentGit,
+    repo_name: str,
+    needs: AbstractSet[str] = NEEDS_ALL,
+    skip_lfs: bool = False,
+    blob_limit: str | None = None,
+) -> bool:
+    """Clone or update a student repository, returning True if it changed.
+
+    Only the repository data in `needs` is fetched: without `log` the clone is
+    shallow, and without `checkout` no working tree is created. Large files can
+    also be left out: with `skip_lfs`, files stored with Git LFS are kept as
+    pointer files, and with `blob_limit` (e.g. `1m`), the clone is a partial
+    clone without blobs larger than that, except those needed for the working
+    tree. Plugins can download large files they need with
+    `plugins.helpers.fetch_large_files()`.
+    """
+    # Environment for Git, if any
+    env: Dict[str, str] | None = _ENV_SKIP_LFS if skip_lfs else None
+
+    # Determine repo URL and local path
+    repo_url: str = student_git.repo_url(repo_name)
+    repo_fp: Path = get_student_repo_fp(assess_fp, student_git.sid, repo_name)
+
+    with timed("repo_fetched", sid=student_git.sid, repo=repo_name) as event:
+        # Does the repository already exist?
+        if repo_fp.exists():
+            # Path exists, only update repository, checking if its HEAD moved
+            event["action"] = "update"
+            head_before: str | None = git_head(repo_fp)
+            try:
+                _update_repo(repo_fp, needs, env)
+            finally:
+                # Add repo location to student object, since the local
+                # repository can be assessed even if it couldn't be updated
+                student_git.add_repo(repo_name, str(repo_fp))
+            changed = git_head(repo_fp) != head_before
+
+        else:
+            # Repository doesn't exist, do a full clone
+            event["action"] = "clone"
+
+            # Partial clones of local repositories require the file:// protocol
+            if blob_limit is not None and student_git.url_type == "file":
+                repo_url = Path(repo_url).absolute().as_uri()
+
+            try:
+                git(
+                    "clone", *_clone_args(needs, blob_limit), repo_url, repo_fp, env=env
                 )
 
-            # Create a student instance with it's ID and URL, taken from the line
-            student_git = StudentGit(std_url[0], std_url[1], std_url[2])
+            except GitError as ge:
+                # Only a missing repository is not an actual error
+                if ge.kind != GIT_ERROR_MISSING:
+                    raise
+                changed = False
+
+            else:
+                # Otherwise add repo location to student object
+                student_git.add_repo(repo_name, str(repo_fp))
+                changed = True
+
+        event["found"] = repo_name in student_git.repos
+        event["changed"] = changed
+
+    return changed
 
-            # Append new student to the student list
-            students_git.append(student_git)
 
-    # Return students
-    return students_git
+def copy_repo(
+    source_fp: Path,
+    assess_fp: Path,
+    student_git: StudentGit,
+    repo_name: str,
+    needs: AbstractSet[str] = NEEDS_ALL,
+) -> None:
+    """Clone a student repository from a local copy, instead of fetching it again.
+
+    The clone shares the objects of the local copy through hard links, so it is
+    fast and takes little space, while its origin is the student's repository.
+    An existing clone is replaced.
+    """
+    repo_fp: Path = get_student_repo_fp(assess_fp, student_git.sid, repo_name)
+
+    with timed("repo_copied", sid=student_git.sid, repo=repo_name):
+        if repo_fp.exists():
+            shutil.rmtree(repo_fp)
+
+        # Local clones always have the whole history of the copy
+        git("clone", "--local", *_clone_args(needs | {NEEDS_LOG}), source_fp, repo_fp)
+        git_at(repo_fp, "remote", "set-url", "origin", student_git.repo_url(repo_name))
+        student_git.add_repo(repo_name, str(repo_fp))
+
+
+def _clone_args(needs: AbstractSet[str], blob_limit: str | None = None) -> List[str]:
+    """Determine git clone arguments which skip unneeded repository data."""
+    clone_args: List[str] = []
+
+    # Large blobs are only downloaded when actually required
+    if blob_limit is not None:
+        clone_args.append(f"--filter=blob:limit={blob_limit}")
+
+    # No plugin looks at the history, the last commit is enough
+    if NEEDS_LOG not in needs:
+        clone_args.append("--depth=1")
+
+    # No plugin looks at the files themselves, skip the working tree
+    if NEEDS_CHECKOUT not in needs:
+        clone_args.extend(["--no-checkout", "--config", f"{GIT_CONFIG_NO_CHECKOUT}=1"])
+
+    return clone_args
+
+
+def _update_repo(
+    repo_fp: Path, needs: AbstractSet[str], env: Dict[str, str] | None = None
+) -> None:
+    """Update an existing repository, obtaining data needed since it was cloned."""
+    # If history is now required but the repository is shallow, get all of it
+    if (
+        NEEDS_LOG in needs
+        and str(git_at(repo_fp, "rev-parse", "--is-shallow-repository")).strip()
+        == "true"
+    ):
+        git_at(repo_fp, "fetch", "--unshallow", env=env)
+
+    # Repositories without working tree can't be pulled, so move HEAD directly
+    try:
+        git_at(repo_fp, "config", "--get", GIT_CONFIG_NO_CHECKOUT)
+    except GitError:
+        git_at(repo_fp, "pull", env=env)
+    else:
+        git_at(repo_fp, "fetch", "origin", "HEAD", env=env)
+        if NEEDS_CHECKOUT in needs:
+            git_at(repo_fp, "reset", "--hard", "FETCH_HEAD", env=env)
+            git_at(repo_fp, "config", "--unset", GIT_CONFIG_NO_CHECKOUT)
+        else:
+            git_at(repo_fp, "reset", "--soft", "FETCH_HEAD")
+
+
+def load_urls(urls_fp: Path) -> List[StudentGit]:
+    """Load student Git URLs."""
+    return list(iter_urls(urls_fp))
+
+
+def iter_urls(
+    urls_fp: Path,
+    batch_size: int = _URLS_BATCH_SIZE,
+    n_threads: int = _URLS_VALIDATION_THREADS,
+) -> Iterator[StudentGit]:
+    """Lazily load and validate student Git URLs, in parallel batches.
+
+    Repeated lines are ignored, but a student repeated with a different email or
+    URL is considered a syntax error.
+    """
+    # Previously seen students, mapped to their email and URL
+    seen: Dict[str, Tuple[str, str]] = {}
+
+    # Rows waiting to be validated
+    batch: List[Tuple[str, str, str]] = []
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        # Open Git URLs file
+        with open(urls_fp) as urls_file:
+            # Cycle through each line of the file
+            for lno, line in enumerate(urls_file, 1):
+                # Remove leading and trailing whitespace
+                line = line.strip()
+
+                # Ignore line if it's empty or starts with # (comment)
+                if len(line) == 0 or line[0] == "#":
+                    continue
+
+                # Split line and check that it's composed of three chunks
+                std_url = line.split()
+                if len(std_url) != 3:
+                    raise SyntaxError(
+                        f"Syntax error in line {lno} of {urls_fp}: " f"{line!r}"
+                    )
+
+                # Skip repeated students, making sure they're really the same
+                sid, email, url = std_url
+                if sid in seen:
+                    if seen[sid] != (email, url):
+                        raise SyntaxError(
+                            f"Student {sid!r} repeated with different email or URL "
+                            f"in line {lno} of {urls_fp}"
+                        )
+                    continue
+                seen[sid] = (email, url)
+
+                # Validate rows in batches
+                batch.append((sid, email, url))
+                if len(batch) >= batch_size:
+                    yield from executor.map(lambda row: StudentGit(*row), batch)
+                    batch = []
+
+        # Validate remaining rows
+        yield from executor.map(lambda row: StudentGit(*row), batch)
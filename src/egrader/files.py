@@ -0,0 +1,78 @@
+"""Safe file handling: atomic writes and assessment folder locks."""
+
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from threading import get_ident
+from typing import IO, Any, Final, Iterator
+
+from .paths import get_lock_fp
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Not available on Windows, where assessment folders are not locked
+    fcntl = None  # type: ignore[assignment]
+
+LOCK_SHARED: Final[str] = "shared"
+LOCK_EXCLUSIVE: Final[str] = "exclusive"
+
+
+@contextmanager
+def atomic_writer(fp: Path, mode: str = "w", **kwargs: Any) -> Iterator[IO[Any]]:
+    """Open a file for writing, replacing it atomically once the `with` block ends.
+
+    Data is written to a temporary file, unique to the current process and
+    thread, in the same folder. The temporary file replaces the actual file only
+    if the `with` block finishes without errors, so readers either see the old
+    contents or the new ones, never partially written ones.
+
+    Args:
+      fp: File to write.
+      mode: Mode in which to open the file, either `w` or `wb`.
+      kwargs: Additional arguments to `open()`, such as `encoding`.
+    """
+    tmp_fp: Path = fp.with_name(f".{fp.name}.{os.getpid()}.{get_ident()}.part")
+    try:
+        with open(tmp_fp, mode, **kwargs) as tmp_file:
+            yield tmp_file
+        os.replace(tmp_fp, fp)
+    finally:
+        tmp_fp.unlink(missing_ok=True)
+
+
+@contextmanager
+def assessment_lock(assess_fp: Path, mode: str) -> Iterator[None]:
+    """Lock an assessment folder while the `with` block runs.
+
+    Commands which change an assessment take an exclusive lock, while commands
+    which only read it take a shared lock, so that several of them can run at
+    the same time. If the lock is taken by another process, a message is shown
+    and the lock is awaited.
+
+    Args:
+      assess_fp: Assessment folder, which doesn't need to exist.
+      mode: Either `shared` or `exclusive`.
+    """
+    if fcntl is None:  # pragma: no cover
+        yield
+        return
+
+    lock_fp: Path = get_lock_fp(assess_fp)
+    lock_op: int = fcntl.LOCK_EX if mode == LOCK_EXCLUSIVE else fcntl.LOCK_SH
+
+    with open(lock_fp, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, lock_op | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(
+                f"- Waiting for another egrader process using {assess_fp}...",
+                file=sys.stderr,
+                flush=True,
+            )
+            fcntl.flock(lock_file, lock_op)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
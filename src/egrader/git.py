@@ -1,24 +1,122 @@
 """Functions for handling Git functionality."""
 
+import os
+from typing import Dict, Final, Mapping, Tuple
+
 from sh import ErrorReturnCode
 from sh import git as sh_git
 
+GIT_ERROR_MISSING: Final[str] = "missing"
+GIT_ERROR_AUTH: Final[str] = "auth"
+GIT_ERROR_TRANSIENT: Final[str] = "transient"
+GIT_ERROR_OTHER: Final[str] = "other"
+
+# Git error messages (in lower case) which identify each kind of error
+_GIT_ERROR_PATTERNS: Final[Dict[str, Tuple[str, ...]]] = {
+    GIT_ERROR_MISSING: (
+        "repository not found",
+        "not found",
+        "does not appear to be a git repository",
+        "does not exist",
+        "returned error: 404",
+    ),
+    GIT_ERROR_AUTH: (
+        "authentication failed",
+        "could not read username",
+        "could not read password",
+        "permission denied",
+        "returned error: 401",
+        "returned error: 403",
+    ),
+    GIT_ERROR_TRANSIENT: (
+        "returned error: 408",
+        "returned error: 429",
+        "returned error: 5",
+        "could not resolve host",
+        "failed to connect",
+        "connection refused",
+        "connection reset",
+        "connection timed out",
+        "operation timed out",
+        "temporary failure",
+        "early eof",
+        "rpc failed",
+        "unexpected disconnect",
+        "remote end hung up",
+        "gnutls",
+        "ssl",
+    ),
+}
+
 
 class GitError(Exception):
-    """Error raised when a Git command fails."""
+    """Error raised when a Git command fails.
+
+    The `kind` attribute classifies the error as a missing repository
+    (`missing`), an authentication or authorization failure (`auth`), a
+    possibly temporary problem, such as a network failure or rate limiting,
+    which is worth retrying (`transient`), or any other error (`other`).
+    """
+
+    def __init__(self, message: str, stderr: str = "") -> None:
+        """Initialize an instance of this class."""
+        super().__init__(message, stderr)
+        self.stderr: str = stderr
+        self.kind: str = classify_git_error(stderr)
+
+    def __str__(self) -> str:
+        """The error message."""
+        return self.args[0]
+
+    @property
+    def reason(self) -> str:
+        """Short description of the error, i.e., its last line of output."""
+        lines = [line.strip() for line in self.stderr.splitlines() if line.strip()]
+        return f"{self.kind}: {lines[-1] if len(lines) > 0 else 'unknown error'}"
 
 
-def git(*args):
-    """Run git with the specified arguments."""
+def classify_git_error(stderr: str) -> str:
+    """Classify a Git error given its error output.
+
+    >>> classify_git_error("fatal: repository 'https://x.org/a/b/' not found")
+    'missing'
+    >>> classify_git_error("fatal: unable to access 'https://x.org/a/b/': "
+    ...                    "The requested URL returned error: 503")
+    'transient'
+    """
+    stderr_lower: str = stderr.lower()
+    for kind, patterns in _GIT_ERROR_PATTERNS.items():
+        if any(pattern in stderr_lower for pattern in patterns):
+            return kind
+    return GIT_ERROR_OTHER
+
+
+def git(*args, env: Mapping[str, str] | None = None):
+    """Run git with the specified arguments and additional environment variables."""
     try:
-        return sh_git("--no-pager", *args)
+        # Never wait for credentials, inaccessible repositories fail right away
+        return sh_git(
+            "--no-pager",
+            *args,
+            _env={**os.environ, "GIT_TERMINAL_PROMPT": "0", **(env or {})},
+        )
     except ErrorReturnCode as erc:
+        stderr: str = erc.stderr.decode("UTF-8", errors="replace")
         raise GitError(
             f"The following error occurred when executing the {erc.full_cmd!r} command:"
-            f"\n\n{erc.stderr.decode('UTF-8')}"
+            f"\n\n{stderr}",
+            stderr,
         ) from erc
 
 
-def git_at(repo_path, *args):
+def git_at(repo_path, *args, env: Mapping[str, str] | None = None):
     """Run git at location given by repo_path with the specified arguments."""
-    return git("-C", repo_path, *args)
+    return git("-C", repo_path, *args, env=env)
+
+
+def git_head(repo_path) -> str | None:
+    """Get the commit hash of HEAD at repo_path, or None if there is no HEAD."""
+    try:
+        return str(git_at(repo_path, "rev-parse", "--verify", "HEAD")).strip()
+    except GitError:
+        return None
@@ -5,7 +5,13 @@ from typing import Final
 
 _FILE_VALID_STUDENTS_GIT: Final[str] = "validated_git_urls.yml"
 _FILE_ASSESSED_STUDENTS: Final[str] = "assessed_students.yml"
+_FILE_ASSESSED_STUDENTS_INDEX: Final[str] = "assessed_students.idx"
 _FOLDER_STUDENT_REPOS: Final[str] = "student_repos"
+_FOLDER_CACHE: Final[str] = ".cache"
+_FOLDER_FEATURES: Final[str] = "features"
+_FOLDER_BUILDS: Final[str] = "builds"
+_FILE_METRICS: Final[str] = "metrics.prom"
+_FILE_LOCK_SUFFIX: Final[str] = ".lock"
 
 
 def check_required_fp_exists(fp_to_check: Path) -> None:
@@ -32,3 +38,38 @@ def get_valid_students_git_fp(assess_fp: Path) -> Path:
 def get_assessed_students_fp(assess_fp: Path) -> Path:
     """Determine path for student assessments yaml file."""
     return assess_fp.joinpath(_FILE_ASSESSED_STUDENTS)
+
+
+def get_assessed_students_index_fp(assess_fp: Path) -> Path:
+    """Determine path for the index of the student assessments yaml file."""
+    return assess_fp.joinpath(_FILE_ASSESSED_STUDENTS_INDEX)
+
+
+def get_cache_fp(assess_fp: Path) -> Path:
+    """Determine the path of the folder containing cached data."""
+    return assess_fp.joinpath(_FOLDER_CACHE)
+
+
+def get_features_cache_fp(assess_fp: Path) -> Path:
+    """Determine the path of the folder containing cached repository features."""
+    return get_cache_fp(assess_fp).joinpath(_FOLDER_FEATURES)
+
+
+def get_builds_cache_fp(assess_fp: Path) -> Path:
+    """Determine the path of the folder containing cached build outputs."""
+    return get_cache_fp(assess_fp).joinpath(_FOLDER_BUILDS)
+
+
+def get_metrics_fp(assess_fp: Path) -> Path:
+    """Determine path for the metrics file in Prometheus text format."""
+    return assess_fp.joinpath(_FILE_METRICS)
+
+
+def get_lock_fp(assess_fp: Path) -> Path:
+    """Determine path for the lock file of an assessment folder.
+
+    The lock file is placed beside the folder, as a hidden file, so that it
+    outlives the folder being deleted and recreated.
+    """
+    assess_fp = assess_fp.resolve()
+    return assess_fp.with_name(f".{assess_fp.name}{_FILE_LOCK_SUFFIX}")
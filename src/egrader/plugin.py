@@ -1,16 +1,32 @@
 """Plug-in handling functionality."""
 
 from argparse import Namespace
+from functools import update_wrapper
 from importlib.metadata import EntryPoints, entry_points
 from inspect import getdoc
 from pathlib import Path
-from typing import AbstractSet, Any, Dict, Final, Sequence
+from typing import AbstractSet, Any, Callable, Dict, Final, Iterable, Sequence, TypeVar
 
 from .cli_lib import check_empty_args
 
 _PLUGINS_ASSESS_REPO: Final[str] = "egrader.assess_repo"
 _PLUGINS_ASSESS_INTER_REPO: Final[str] = "egrader.assess_inter_repo"
 _PLUGINS_REPORT: Final[str] = "egrader.report"
+_PLUGIN_CAPABILITIES_ATTR: Final[str] = "egrader_capabilities"
+_PLUGIN_PARAMS_CHECK_ATTR: Final[str] = "egrader_params_check"
+
+COST_FREE: Final[str] = "free"
+COST_CHEAP: Final[str] = "cheap"
+COST_EXPENSIVE: Final[str] = "expensive"
+
+NEEDS_LOG: Final[str] = "log"
+NEEDS_TREE: Final[str] = "tree"
+NEEDS_CHECKOUT: Final[str] = "checkout"
+NEEDS_ALL: Final[AbstractSet[str]] = frozenset({NEEDS_LOG, NEEDS_TREE, NEEDS_CHECKOUT})
+
+_COST_RANKS: Final[Dict[str, int]] = {COST_FREE: 0, COST_CHEAP: 1, COST_EXPENSIVE: 2}
+
+_F = TypeVar("_F", bound=Callable[..., Any])
 
 
 def _load_plugin_functions(
@@ -56,6 +72,160 @@ class PluginLoadError(Exception):
     """Error raised when a required plugin fails to load."""
 
 
+class PluginCapabilities:
+    """Cost, repository data requirements and parallel safety of a plug-in.
+
+    The repository data a plug-in may need is the commit history (`log`), the list
+    of files at HEAD (`tree`) and/or the actual files in the working tree
+    (`checkout`). A plug-in is parallel safe if it can be invoked concurrently on
+    different repositories; egrader never runs two assessments on the same
+    repository at the same time.
+    """
+
+    def __init__(
+        self,
+        cost: str = COST_EXPENSIVE,
+        needs: Iterable[str] = NEEDS_ALL,
+        parallel_safe: bool = False,
+    ) -> None:
+        """Initialize an instance of this class."""
+        # Check if cost and needs are known
+        if cost not in _COST_RANKS:
+            raise ValueError(f"Unknown plugin cost {cost!r}")
+        unknown_needs: AbstractSet[str] = set(needs) - NEEDS_ALL
+        if len(unknown_needs) > 0:
+            raise ValueError(f"Unknown plugin needs {unknown_needs}")
+
+        # Set instance variables
+        self.cost: str = cost
+        self.needs: AbstractSet[str] = frozenset(needs)
+        self.parallel_safe: bool = parallel_safe
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(cost=%r, needs=%r, parallel_safe=%r)" % (
+            self.__class__.__name__,
+            self.cost,
+            sorted(self.needs),
+            self.parallel_safe,
+        )
+
+    @property
+    def cost_rank(self) -> int:
+        """Rank of this plug-in's cost, lower is cheaper."""
+        return _COST_RANKS[self.cost]
+
+
+def plugin_capabilities(
+    cost: str = COST_EXPENSIVE,
+    needs: Iterable[str] = NEEDS_ALL,
+    parallel_safe: bool = False,
+) -> Callable[[_F], _F]:
+    """Decorator which declares the capabilities of a plug-in function."""
+    capabilities = PluginCapabilities(cost, needs, parallel_safe)
+
+    def _decorate(func: _F) -> _F:
+        setattr(func, _PLUGIN_CAPABILITIES_ATTR, capabilities)
+        return func
+
+    return _decorate
+
+
+def get_plugin_capabilities(func) -> PluginCapabilities:
+    """Get the capabilities of a plug-in, assuming the worst if undeclared."""
+    return getattr(func, _PLUGIN_CAPABILITIES_ATTR, None) or PluginCapabilities()
+
+
+def plugin_params_check(check: Callable[[Dict[str, Any]], None]) -> Callable[[_F], _F]:
+    """Decorator which declares a function checking the parameters of a plug-in.
+
+    The check is performed when the rules are compiled, so that invalid
+    parameters are reported before any assessment is performed. It receives the
+    parameters given in the rules, and raises `ValueError` if they're invalid.
+    """
+
+    def _decorate(func: _F) -> _F:
+        setattr(func, _PLUGIN_PARAMS_CHECK_ATTR, check)
+        return func
+
+    return _decorate
+
+
+def check_plugin_params(func, params: Dict[str, Any]) -> None:
+    """Check the parameters of a plug-in, if it declared a check for them.
+
+    Raises:
+      ValueError: If the parameters are invalid.
+    """
+    check: Callable[[Dict[str, Any]], None] | None = getattr(
+        func, _PLUGIN_PARAMS_CHECK_ATTR, None
+    )
+    if check is not None:
+        check(params)
+
+
+class MapReducePlugin:
+    """Inter-repository plug-in split in a map phase and a reduce phase.
+
+    The map phase extracts a compact feature from each repository (e.g., its
+    number of commits), independently of the other repositories. The reduce phase
+    determines the grades of all repositories from their features alone. Since
+    extraction only depends on a single repository, it can run in parallel and
+    its results can be reused while the repository doesn't change.
+
+    Instances are called like regular inter-repository plug-ins, i.e., with the
+    repository paths followed by the plug-in parameters, and take the name,
+    docstring and signature of the reduce function, so that parameters specified
+    in the rules are validated against it.
+    """
+
+    def __init__(
+        self,
+        extract: Callable[[str], Any],
+        reduce: Callable[..., Sequence[float]],
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          extract: Function which receives a repository path and returns the
+            feature of interest.
+          reduce: Function which receives the features of all repositories,
+            followed by the plug-in parameters, and returns the grade of each
+            repository, in the same order.
+        """
+        self.extract: Callable[[str], Any] = extract
+        self.reduce: Callable[..., Sequence[float]] = reduce
+        update_wrapper(self, reduce)
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(extract=%s, reduce=%s)" % (
+            self.__class__.__name__,
+            self.extract.__name__,
+            self.reduce.__name__,
+        )
+
+    def __call__(self, repo_paths: Sequence[str], *args, **kwargs) -> Sequence[float]:
+        """Extract features from the repositories and reduce them to grades."""
+        return self.reduce([self.extract(rp) for rp in repo_paths], *args, **kwargs)
+
+
+def map_reduce_plugin(
+    extract: Callable[[str], Any],
+) -> Callable[[Callable[..., Sequence[float]]], MapReducePlugin]:
+    """Decorator which turns a reduce function into a map/reduce plug-in.
+
+    Args:
+      extract: Function which receives a repository path and returns the feature
+        which is passed to the decorated reduce function.
+    """
+
+    def _decorate(reduce: Callable[..., Sequence[float]]) -> MapReducePlugin:
+        return MapReducePlugin(extract, reduce)
+
+    return _decorate
+
+
 def get_short_plugin_desc(func) -> str:
     """Get a short description of a plugin."""
     desc: str | None = getdoc(func)
@@ -98,5 +268,13 @@ def list_plugins(assess_fp: Path, args: Namespace, extra_args: Sequence[str]):
         plugins: EntryPoints = entry_points(group=plugin_type[1])
         print(f"{plugin_type[0]}\n")
         for plugin in plugins:
-            print(f"\t{plugin.name}\n\t\t{get_short_plugin_desc(plugin.load())}")
+            plugin_fun = plugin.load()
+            print(f"\t{plugin.name}\n\t\t{get_short_plugin_desc(plugin_fun)}")
+            if plugin_type[1] != _PLUGINS_REPORT:
+                caps = get_plugin_capabilities(plugin_fun)
+                print(
+                    f"\t\tCost: {caps.cost}; "
+                    f"needs: {', '.join(sorted(caps.needs)) or 'nothing'}; "
+                    f"parallel safe: {'yes' if caps.parallel_safe else 'no'}"
+                )
         print()
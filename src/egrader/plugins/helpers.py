@@ -1,10 +1,22 @@
 """Helper functions for the various plug-ins."""
 
+import os
+import re
+import signal
+from codecs import getincrementaldecoder
+from contextlib import suppress
 from datetime import date, datetime, tzinfo
-from typing import cast
+from pathlib import Path
+from selectors import EVENT_READ, DefaultSelector
+from subprocess import PIPE, STDOUT, Popen, TimeoutExpired
+from threading import Thread
+from time import monotonic
+from typing import IO, List, Pattern, Sequence, cast
 
 from dateutil import parser
 
+from ..git import GitError, git_at
+
 
 def interpret_datetime(obj: date | datetime | str, tzi: tzinfo | None) -> datetime:
     """Try to convert an object into a [datetime][datetime.datetime] instance."""
@@ -23,3 +35,156 @@ def interpret_datetime(obj: date | datetime | str, tzi: tzinfo | None) -> dateti
         dt = dt.replace(tzinfo=tzi)
 
     return dt
+
+
+def fetch_large_files(repo_path: str | Path, paths: Sequence[str]) -> None:
+    """Download large files which were left out when fetching the repository.
+
+    Files stored with Git LFS are downloaded if Git LFS is installed, and blobs
+    left out of partial clones are downloaded by Git as the files are checked
+    out. Paths can be Git pathspecs, such as `assets/*.png`. Files which can't be
+    downloaded are left as they are.
+    """
+    if len(paths) == 0:
+        return
+
+    with suppress(GitError):
+        git_at(repo_path, "lfs", "pull", "--include", ",".join(paths))
+    with suppress(GitError):
+        git_at(repo_path, "checkout", "HEAD", "--", *paths)
+
+
+class CommandOutcome:
+    """Outcome of a command whose output was streamed and matched."""
+
+    def __init__(self) -> None:
+        """Initialize an instance of this class."""
+        self.exit_code: int | None = None
+        self.timed_out: bool = False
+        self.stopped_early: bool = False
+        self.output_matched: bool = False
+        self.regex_matched: bool = False
+        self.output: str = ""
+        self.output_truncated: bool = False
+
+
+def run_streaming(
+    args: Sequence[str],
+    cwd: str | Path,
+    input_stream: str | None = None,
+    timeout: float = 6.5,
+    expect_output: str | None = None,
+    expect_regex: str | None = None,
+    max_output: int = 1_048_576,
+    stop_on_match: bool = False,
+) -> CommandOutcome:
+    """Run a command, matching its output (stdout and stderr) as it is produced.
+
+    At most `max_output` characters of output are retained, so a command printing
+    without end only costs memory up to that limit. The `expect_output` substring
+    is matched incrementally over the whole output, while the `expect_regex`
+    pattern is matched against the retained output only. If `stop_on_match` is
+    set, the command is killed as soon as the expected output is matched.
+    """
+    outcome = CommandOutcome()
+    deadline: float = monotonic() + timeout
+    regex: Pattern[str] | None = (
+        re.compile(expect_regex, re.MULTILINE) if expect_regex is not None else None
+    )
+
+    # Start the command in its own session, so it can be killed with its children
+    proc = Popen(
+        args,
+        cwd=cwd,
+        stdin=PIPE if input_stream is not None else None,
+        stdout=PIPE,
+        stderr=STDOUT,
+        start_new_session=True,
+    )
+
+    # Feed the input in a separate thread, so a command which doesn't read it
+    # doesn't block us
+    if input_stream is not None and proc.stdin is not None:
+        Thread(target=_feed_input, args=(proc.stdin, input_stream), daemon=True).start()
+
+    # Read output as it comes, keeping only what is needed for matching
+    decoder = getincrementaldecoder("utf-8")(errors="replace")
+    retained: List[str] = []
+    n_retained: int = 0
+    tail: str = ""
+    stdout_fd: int = cast(IO[bytes], proc.stdout).fileno()
+
+    try:
+        with DefaultSelector() as selector:
+            selector.register(stdout_fd, EVENT_READ)
+            eof: bool = False
+            while not eof:
+                remaining: float = deadline - monotonic()
+                if remaining <= 0:
+                    outcome.timed_out = True
+                    break
+                if len(selector.select(remaining)) == 0:
+                    continue
+                data: bytes = os.read(stdout_fd, 65536)
+                eof = len(data) == 0
+                text: str = decoder.decode(data, final=eof)
+
+                # Keep output up to the maximum size
+                kept: str = text[: max(max_output - n_retained, 0)]
+                retained.append(kept)
+                n_retained += len(kept)
+                outcome.output_truncated |= len(kept) < len(text)
+
+                # Match expected substring in the output seen so far, keeping
+                # enough of it to detect matches across chunk boundaries
+                if expect_output is not None and not outcome.output_matched:
+                    window: str = tail + text
+                    outcome.output_matched = expect_output in window
+                    tail = window[max(len(window) - len(expect_output) + 1, 0) :]
+
+                # Match expected pattern in the retained output
+                if regex is not None and not outcome.regex_matched and len(kept) > 0:
+                    outcome.regex_matched = regex.search("".join(retained)) is not None
+
+                # Stop command early if nothing else is required from it
+                if (
+                    stop_on_match
+                    and (expect_output is None or outcome.output_matched)
+                    and (regex is None or outcome.regex_matched)
+                ):
+                    outcome.stopped_early = True
+                    break
+
+        # Wait for the command to finish within the time available
+        if not outcome.timed_out and not outcome.stopped_early:
+            try:
+                outcome.exit_code = proc.wait(max(deadline - monotonic(), 0))
+            except TimeoutExpired:
+                outcome.timed_out = True
+
+    finally:
+        # Make sure no process is left behind
+        if proc.poll() is None or outcome.timed_out or outcome.stopped_early:
+            _kill_session(proc)
+        cast(IO[bytes], proc.stdout).close()
+
+    outcome.output = "".join(retained)
+
+    return outcome
+
+
+def _feed_input(stdin: IO[bytes], input_stream: str) -> None:
+    """Write the input stream to a command's stdin and close it."""
+    try:
+        stdin.write(input_stream.encode())
+        stdin.close()
+    except OSError:
+        # Command exited or closed its stdin without reading everything
+        pass
+
+
+def _kill_session(proc: "Popen[bytes]") -> None:
+    """Kill a command and all processes in its session."""
+    with suppress(ProcessLookupError):
+        os.killpg(proc.pid, signal.SIGKILL)
+    proc.wait()
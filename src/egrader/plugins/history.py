@@ -0,0 +1,288 @@
+"""Commit history analytics plug-ins."""
+
+from datetime import date, datetime
+from typing import Any, Dict, Final, List
+
+import numpy as np
+import numpy.typing as npt
+
+from ..cache import cached_feature
+from ..git import GitError, git_at
+from ..plugin import COST_CHEAP, NEEDS_LOG, plugin_capabilities
+from ..types import StudentGit
+from .helpers import interpret_datetime
+
+# Marks the start of each commit in the git log output
+_COMMIT_MARKER: Final[str] = "\x01"
+
+_SECONDS_PER_DAY: Final[int] = 24 * 60 * 60
+
+
+class CommitTable:
+    """Columnar table of the non-merge commits in a repository, newest first.
+
+    Each column is a NumPy array with one element per commit, so that metrics
+    over the history can be computed with vectorized operations.
+    """
+
+    def __init__(
+        self,
+        timestamps: npt.NDArray[np.int64],
+        utc_offsets: npt.NDArray[np.int64],
+        authors: npt.NDArray[np.int64],
+        author_emails: List[str],
+        insertions: npt.NDArray[np.int64],
+        deletions: npt.NDArray[np.int64],
+    ) -> None:
+        """Initialize an instance of this class.
+
+        Args:
+          timestamps: Commit times, in seconds since the epoch.
+          utc_offsets: Time zone offsets of the commit times, in seconds.
+          authors: Author of each commit, as an index into `author_emails`.
+          author_emails: Emails of the authors, in lower case.
+          insertions: Lines inserted by each commit.
+          deletions: Lines deleted by each commit.
+        """
+        self.timestamps: npt.NDArray[np.int64] = timestamps
+        self.utc_offsets: npt.NDArray[np.int64] = utc_offsets
+        self.authors: npt.NDArray[np.int64] = authors
+        self.author_emails: List[str] = author_emails
+        self.insertions: npt.NDArray[np.int64] = insertions
+        self.deletions: npt.NDArray[np.int64] = deletions
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(commits=%r, authors=%r)" % (
+            self.__class__.__name__,
+            self.commit_count,
+            self.author_emails,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for caching it."""
+        return {
+            "timestamps": self.timestamps.tolist(),
+            "utc_offsets": self.utc_offsets.tolist(),
+            "authors": self.authors.tolist(),
+            "author_emails": self.author_emails,
+            "insertions": self.insertions.tolist(),
+            "deletions": self.deletions.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CommitTable":
+        """Create an instance from plain data."""
+        return cls(
+            np.array(data["timestamps"], dtype=np.int64),
+            np.array(data["utc_offsets"], dtype=np.int64),
+            np.array(data["authors"], dtype=np.int64),
+            list(data["author_emails"]),
+            np.array(data["insertions"], dtype=np.int64),
+            np.array(data["deletions"], dtype=np.int64),
+        )
+
+    @property
+    def commit_count(self) -> int:
+        """Number of commits in the table."""
+        return len(self.timestamps)
+
+    @property
+    def lines_changed(self) -> npt.NDArray[np.int64]:
+        """Lines inserted plus lines deleted by each commit."""
+        return self.insertions + self.deletions
+
+    @property
+    def local_days(self) -> npt.NDArray[np.int64]:
+        """Day of each commit, in days since the epoch, in the committer's zone."""
+        return (self.timestamps + self.utc_offsets) // _SECONDS_PER_DAY
+
+
+def load_commit_table(repo_path: str) -> CommitTable:
+    """Extract the history of a repository into a table, with a single git log."""
+    return CommitTable.from_dict(
+        cached_feature(
+            repo_path,
+            "commit_table",
+            lambda: _parse_git_log(_git_log(repo_path)).to_dict(),
+        )
+    )
+
+
+def _git_log(repo_path: str) -> str:
+    """Get the commit times, authors and lines changed of the repository history."""
+    return str(
+        git_at(
+            repo_path,
+            "log",
+            "--no-merges",
+            "--numstat",
+            f"--format={_COMMIT_MARKER}%ct %cI %ae",
+        )
+    )
+
+
+def _parse_git_log(log: str) -> CommitTable:
+    """Parse the output of `_git_log()` into a table."""
+    timestamps: List[int] = []
+    utc_offsets: List[int] = []
+    authors: List[int] = []
+    author_idxs: Dict[str, int] = {}
+    insertions: List[int] = []
+    deletions: List[int] = []
+
+    for line in log.splitlines():
+        if line.startswith(_COMMIT_MARKER):
+            # A new commit: time, ISO time with the zone offset, and author
+            timestamp, iso_time, email = line[len(_COMMIT_MARKER) :].split(" ", 2)
+            timestamps.append(int(timestamp))
+            utc_offsets.append(_parse_utc_offset(iso_time))
+            authors.append(author_idxs.setdefault(email.lower(), len(author_idxs)))
+            insertions.append(0)
+            deletions.append(0)
+        else:
+            # Lines changed in a file of the current commit, "-" for binary files
+            numstat: List[str] = line.split("\t", 2)
+            if len(numstat) == 3 and len(insertions) > 0:
+                insertions[-1] += int(numstat[0]) if numstat[0].isdigit() else 0
+                deletions[-1] += int(numstat[1]) if numstat[1].isdigit() else 0
+
+    return CommitTable(
+        np.array(timestamps, dtype=np.int64),
+        np.array(utc_offsets, dtype=np.int64),
+        np.array(authors, dtype=np.int64),
+        list(author_idxs),
+        np.array(insertions, dtype=np.int64),
+        np.array(deletions, dtype=np.int64),
+    )
+
+
+def _parse_utc_offset(iso_time: str) -> int:
+    """Determine the time zone offset, in seconds, of an ISO 8601 time.
+
+    >>> _parse_utc_offset("2023-01-02T03:04:05-02:30")
+    -9000
+    """
+    sign: int = -1 if iso_time[-6] == "-" else 1
+    return sign * (int(iso_time[-5:-3]) * 3600 + int(iso_time[-2:]) * 60)
+
+
+def _try_load_commit_table(repo_path: str) -> CommitTable | None:
+    """Load the commit table of a repository, or None if it has no commits."""
+    try:
+        table: CommitTable = load_commit_table(repo_path)
+    except GitError:
+        return None
+    return table if table.commit_count > 0 else None
+
+
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+def assess_commit_cadence(
+    student: StudentGit,
+    repo_path: str,
+    min_days: int,
+    max_gap_days: int | None = None,
+) -> float:
+    """Check if commits were spread over a minimum number of different days.
+
+    The grade is the fraction of `min_days` with commits, up to 1. If
+    `max_gap_days` is given, the grade is 0 if there is a longer period without
+    commits.
+    """
+    table: CommitTable | None = _try_load_commit_table(repo_path)
+    if table is None:
+        return 0
+
+    active_days: npt.NDArray[np.int64] = np.unique(table.local_days)
+    if max_gap_days is not None and np.any(np.diff(active_days) > max_gap_days + 1):
+        return 0
+
+    return min(len(active_days) / min_days, 1) if min_days > 0 else 1
+
+
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+def assess_last_minute(
+    student: StudentGit,
+    repo_path: str,
+    deadline: date | datetime | str,
+    hours: float = 24,
+    max_share: float = 0.5,
+    by_lines: bool = True,
+) -> float:
+    """Penalize work crammed into the last hours before the deadline.
+
+    The share of the work done until the deadline which was done in its last
+    `hours` is determined, either by lines changed or by number of commits. The
+    grade is 1 if the share is at most `max_share`, decreasing linearly to 0 as
+    it approaches 1. Deadlines without time zone are in local time.
+    """
+    table: CommitTable | None = _try_load_commit_table(repo_path)
+    if table is None:
+        return 0
+
+    deadline_ts: float = interpret_datetime(deadline, None).timestamp()
+    work: npt.NDArray[np.int64] = (
+        table.lines_changed if by_lines else np.ones_like(table.timestamps)
+    )
+
+    # Work done until the deadline, and in its last hours
+    until_deadline = table.timestamps <= deadline_ts
+    last_minute = until_deadline & (table.timestamps >= deadline_ts - hours * 3600)
+    total: int = int(work[until_deadline].sum())
+    if total == 0:
+        return 0
+    share: float = work[last_minute].sum() / total
+
+    if share <= max_share:
+        return 1
+    return float((1 - share) / (1 - max_share))
+
+
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+def assess_lines_per_commit(
+    student: StudentGit,
+    repo_path: str,
+    min_lines: int = 1,
+    max_lines: int = 500,
+) -> float:
+    """Return the fraction of commits changing a reasonable number of lines."""
+    table: CommitTable | None = _try_load_commit_table(repo_path)
+    if table is None:
+        return 0
+
+    lines: npt.NDArray[np.int64] = table.lines_changed
+    return float(np.mean((lines >= min_lines) & (lines <= max_lines)))
+
+
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+def assess_author_diversity(
+    student: StudentGit,
+    repo_path: str,
+    min_authors: int = 2,
+    min_share: float = 0.1,
+    by_lines: bool = False,
+) -> float:
+    """Check if several authors contributed significantly to the repository.
+
+    Authors (identified by email) contribute significantly if they did at least
+    `min_share` of the commits, or of the lines changed, if `by_lines` is set.
+    The grade is the fraction of `min_authors` contributing significantly, up
+    to 1.
+    """
+    table: CommitTable | None = _try_load_commit_table(repo_path)
+    if table is None:
+        return 0
+
+    work: npt.NDArray[np.int64] = (
+        table.lines_changed if by_lines else np.ones_like(table.timestamps)
+    )
+    total: int = int(work.sum())
+    if total == 0:
+        return 0
+
+    author_work: npt.NDArray[np.int64] = np.bincount(
+        table.authors, weights=work, minlength=len(table.author_emails)
+    )
+    n_authors: int = int(np.count_nonzero(author_work / total >= min_share))
+
+    return min(n_authors / min_authors, 1) if min_authors > 0 else 1
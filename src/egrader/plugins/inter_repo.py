@@ -2,15 +2,28 @@
 
 from typing import List, Sequence, Tuple
 
+from ..cache import cached_feature
 from ..git import git_at
+from ..plugin import COST_CHEAP, NEEDS_LOG, map_reduce_plugin, plugin_capabilities
 
 
+def extract_commit_count(repo_path: str) -> int:
+    """Determine the number of commits in a repository."""
+    return cached_feature(
+        repo_path,
+        "head_commit_count",
+        lambda: int(git_at(repo_path, "rev-list", "HEAD", "--count")),
+    )
+
+
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+@map_reduce_plugin(extract_commit_count)
 def assess_more_commits_bonus(
-    repo_paths: Sequence[str], bonuses: Sequence[float]
+    commit_counts: Sequence[int], bonuses: Sequence[float]
 ) -> Sequence[float]:
     """Add bonuses to repositories with more commits."""
     # Number of repositories to inter-assess
-    n_repos = len(repo_paths)
+    n_repos = len(commit_counts)
 
     # Make bonus list the same size as the number of repositories
     bonus_lst: Sequence[float]
@@ -22,11 +35,9 @@ def assess_more_commits_bonus(
     else:
         bonus_lst = bonuses[:]
 
-    # Determine number of commits in each repository and associate them with
-    # the repositories index in repo_paths
-    idx_commits: List[Tuple[int, int]] = list(
-        enumerate([int(git_at(rp, "rev-list", "HEAD", "--count")) for rp in repo_paths])
-    )
+    # Associate the number of commits in each repository with the repository
+    # index
+    idx_commits: List[Tuple[int, int]] = list(enumerate(commit_counts))
 
     # Sort by number of commits, higher to lower
     idx_commits.sort(key=lambda ic: -ic[1])
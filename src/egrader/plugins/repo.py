@@ -1,31 +1,58 @@
 """Repository plug-ins."""
 
+import os
+import re
 import shlex
 import sys
+from argparse import ArgumentTypeError
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import date, datetime
+from functools import lru_cache
 from pathlib import Path
-from subprocess import TimeoutExpired, run
-from typing import Sequence
+from typing import Any, Dict, List, MutableSet, Pattern, Sequence, Tuple
 
 import numpy as np
 from dateutil.parser import isoparse
 
+from ..cache import cached_build, cached_feature
+from ..cli_lib import byte_size
 from ..git import GitError, git_at
+from ..plugin import (
+    COST_CHEAP,
+    COST_EXPENSIVE,
+    COST_FREE,
+    NEEDS_CHECKOUT,
+    NEEDS_LOG,
+    NEEDS_TREE,
+    plugin_capabilities,
+    plugin_params_check,
+)
 from ..types import StudentGit
-from .helpers import interpret_datetime
+from .helpers import (
+    CommandOutcome,
+    fetch_large_files,
+    interpret_datetime,
+    run_streaming,
+)
 
 _max_git_commits: int = np.iinfo(np.int32).max
 
 
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
 def assess_min_commits(student: StudentGit, repo_path: str, minimum: int) -> float:
     """Check if repository has a minimum number of commits."""
-    n_commits = git_at(repo_path, "rev-list", "--all", "--count")
-    if int(n_commits) >= minimum:
+    n_commits: int = cached_feature(
+        repo_path,
+        "all_commit_count",
+        lambda: int(git_at(repo_path, "rev-list", "--all", "--count")),
+    )
+    if n_commits >= minimum:
         return 1
     else:
         return 0
 
 
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
 def assess_commit_date_interval(
     student: StudentGit,
     repo_path: str,
@@ -36,14 +63,16 @@ def assess_commit_date_interval(
 ) -> float:
     """Return the percentage of commits performed on the specified date interval."""
     try:
-        commit_dates_cmd = git_at(
-            repo_path, "log", f"-{last_n_commits}", "--date=iso-strict", r"--format=%cd"
-        )
+        commit_dates: List[str] = cached_feature(
+            repo_path,
+            "commit_dates",
+            lambda: git_at(
+                repo_path, "log", "--date=iso-strict", r"--format=%cd"
+            ).splitlines(),
+        )[:last_n_commits]
     except GitError:
         return 0
 
-    commit_dates = commit_dates_cmd.splitlines()
-
     within_interval: int = 0
 
     for commit_date in commit_dates:
@@ -59,25 +88,32 @@ def assess_commit_date_interval(
     return within_interval / len(commit_dates)
 
 
+@plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
 def assess_commits_email(student: StudentGit, repo_path: str) -> float:
     """Check commits were performed with the specified emails."""
     try:
-        commits_emails_cmd: str = git_at(repo_path, "log", r"--format=%ae")
+        commit_emails_lst: List[str] = cached_feature(
+            repo_path,
+            "commit_emails",
+            lambda: [
+                email.strip()
+                for email in git_at(repo_path, "log", r"--format=%ae").splitlines()
+            ],
+        )
     except GitError:
         return 0
 
-    # Convert returned command to list of emails
-    commit_emails_lst = [email.strip() for email in commits_emails_cmd.splitlines()]
-
     # Grade is percentage of commits done with the student email
     return commit_emails_lst.count(student.email) / len(commit_emails_lst)
 
 
+@plugin_capabilities(COST_FREE, set(), parallel_safe=True)
 def assess_repo_exists(student: StudentGit, repo_path: str) -> float:
     """Check if a repository exists (always returns 1)."""
     return 1
 
 
+@plugin_capabilities(COST_CHEAP, {NEEDS_CHECKOUT}, parallel_safe=True)
 def assess_files_exist(
     student: StudentGit, repo_path: str, filenames: Sequence[str], strict: bool = False
 ) -> float:
@@ -95,26 +131,228 @@ def assess_files_exist(
     return n_files_exist / len(filenames)
 
 
+def _check_files_match_params(params: Dict[str, Any]) -> None:
+    """Check the parameters of `assess_files_match()`, when rules are compiled."""
+    # A single pattern given as text would be taken as one pattern per character
+    for key in ("include", "exclude"):
+        patterns: Any = params.get(key, [])
+        if not isinstance(patterns, list) or not all(
+            isinstance(pattern, str) for pattern in patterns
+        ):
+            raise ValueError(f"'{key}' must be a list of patterns, got {patterns!r}")
+
+    for key in ("max_size", "max_total_size"):
+        if params.get(key) is not None:
+            try:
+                byte_size(str(params[key]))
+            except ArgumentTypeError as ate:
+                raise ValueError(f"invalid '{key}': {ate}") from ate
+
+
+@plugin_params_check(_check_files_match_params)
+@plugin_capabilities(COST_CHEAP, {NEEDS_TREE}, parallel_safe=True)
+def assess_files_match(
+    student: StudentGit,
+    repo_path: str,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    max_size: int | str | None = None,
+    max_total_size: int | str | None = None,
+    strict: bool = False,
+) -> float:
+    """Check the committed files against glob patterns and size limits.
+
+    Each `include` pattern must match at least one file (e.g. `*.sln`), and
+    each `exclude` pattern must match none (e.g. `bin/`). Patterns follow the
+    `.gitignore` conventions: without a slash they match at any depth, `**`
+    matches any number of folders, and a trailing slash only matches folders.
+    No file may be larger than `max_size`, nor all files together larger than
+    `max_total_size`, in bytes optionally followed by k, m or g.
+
+    Every constraint is checked in a single pass over a single listing of the
+    committed files, so the cost barely depends on the number of patterns. The
+    grade is the fraction of satisfied constraints, or 0 if any of them is not
+    satisfied and `strict` is set.
+    """
+    # Patterns are compiled once, into a regex which matches all of them
+    patterns: Tuple[str, ...] = (*include, *exclude)
+    any_regex, each_regex = _compile_globs(patterns)
+
+    # Sizes are only listed if needed, since they may require fetching blobs
+    with_sizes: bool = max_size is not None or max_total_size is not None
+    try:
+        files: Dict[str, int] = cached_feature(
+            repo_path,
+            "tree_sizes" if with_sizes else "tree",
+            lambda: _list_tree(repo_path, with_sizes),
+        )
+    except GitError:
+        # No commits, hence no files
+        files = {}
+
+    # Single pass over the committed files
+    matched: MutableSet[int] = set()
+    largest: int = 0
+    total: int = 0
+    for path, size in files.items():
+        if len(patterns) > 0 and any_regex.match(path) is not None:
+            each_match = each_regex.match(path)
+            for i, group in enumerate(each_match.groups() if each_match else ()):
+                if group is not None:
+                    matched.add(i)
+        largest = max(largest, size)
+        total += size
+
+    # Check which constraints are satisfied
+    satisfied: List[bool] = [i in matched for i in range(len(include))]
+    satisfied.extend(i not in matched for i in range(len(include), len(patterns)))
+    if max_size is not None:
+        satisfied.append(largest <= byte_size(str(max_size)))
+    if max_total_size is not None:
+        satisfied.append(total <= byte_size(str(max_total_size)))
+
+    if len(satisfied) == 0:
+        return 1
+    if strict and not all(satisfied):
+        return 0
+    return sum(satisfied) / len(satisfied)
+
+
+def _list_tree(repo_path: str, with_sizes: bool) -> Dict[str, int]:
+    """Map the committed files to their sizes (0 if not requested)."""
+    entries: str = str(
+        git_at(
+            repo_path,
+            "ls-tree",
+            "-r",
+            "-z",
+            *(["-l"] if with_sizes else []),
+            "--full-tree",
+            "HEAD",
+        )
+    )
+
+    files: Dict[str, int] = {}
+    for entry in entries.split("\0"):
+        # Each entry is "mode type object [size]\tpath", submodules aren't files
+        if "\t" not in entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        fields: List[str] = meta.split()
+        if fields[1] != "blob":
+            continue
+        files[path] = int(fields[3]) if with_sizes else 0
+
+    return files
+
+
+@lru_cache(maxsize=256)
+def _compile_globs(patterns: Tuple[str, ...]) -> Tuple[Pattern[str], Pattern[str]]:
+    """Compile glob patterns into regexes matching any and each of them.
+
+    The first regex matches paths matched by any of the patterns. The second one
+    tries every pattern in a lookahead, setting the i-th group if the i-th
+    pattern matches, so that a single match finds all the patterns matching a
+    path.
+
+    >>> any_regex, each_regex = _compile_globs(("*.md", "docs/", "*.txt"))
+    >>> each_regex.match("docs/README.md").groups()
+    ('docs/README.md', 'docs/README.md', None)
+    >>> any_regex.match("src/main.c") is None
+    True
+    """
+    regexes: List[str] = [_glob_to_regex(pattern) for pattern in patterns]
+    return (
+        re.compile("|".join(f"(?:{regex})\\Z" for regex in regexes)),
+        re.compile("".join(f"(?:(?=((?:{regex})\\Z))|)" for regex in regexes)),
+    )
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a glob pattern, following the `.gitignore` conventions, to a regex.
+
+    A pattern matching a folder also matches everything in it.
+
+    >>> regex = _glob_to_regex("src/**/bin/")
+    >>> [bool(re.fullmatch(regex, p)) for p in ("src/bin/a", "src/a/b/bin/c", "bin/a")]
+    [True, True, False]
+    >>> regex = _glob_to_regex("*.s[!l]n")
+    >>> [bool(re.fullmatch(regex, p)) for p in ("a/b.sin", "b.sln")]
+    [True, False]
+    """
+    # A trailing slash matches only folders, a leading or middle one anchors the
+    # pattern at the repository root
+    folder_only: bool = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored: bool = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex: List[str] = []
+    i: int = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end: int = pattern.index("]", i + 2)
+            chars: str = pattern[i + 1 : end].replace("\\", "\\\\")
+            regex.append(f"[^{chars[1:]}]" if chars[0] == "!" else f"[{chars}]")
+            i = end + 1
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+
+    prefix: str = "" if anchored else "(?:.*/)?"
+    suffix: str = "/.*" if folder_only else "(?:/.*)?"
+    return prefix + "".join(regex) + suffix
+
+
+@plugin_capabilities(COST_EXPENSIVE, {NEEDS_CHECKOUT}, parallel_safe=True)
 def assess_run_command(
     student: StudentGit,
     repo_path: str,
     command: str,
     input_stream: str | None = None,
-    expect_exit_code: int = 0,
+    expect_exit_code: int | None = 0,
     expect_output: str | None = None,
+    expect_regex: str | None = None,
     timeout: float = 6.5,
+    max_output: int = 1_048_576,
+    large_files: Sequence[str] = (),
 ) -> float:
-    """Run a command and check for exit code and/or expected output."""
+    """Run a command and check for exit code and/or expected output.
+
+    Large files the command needs, left out when fetching, can be downloaded
+    first by listing them in `large_files`.
+    """
+    fetch_large_files(repo_path, large_files)
+
+    # If the exit code is irrelevant, the command can stop once output matches
+    stop_on_match: bool = expect_exit_code is None and (
+        expect_output is not None or expect_regex is not None
+    )
+
     try:
-        r = run(
+        outcome = run_streaming(
             shlex.split(command),
-            input=input_stream,
-            capture_output=True,
-            text=True,
-            cwd=repo_path,
+            repo_path,
+            input_stream=input_stream,
             timeout=timeout,
+            expect_output=expect_output,
+            expect_regex=expect_regex,
+            max_output=max_output,
+            stop_on_match=stop_on_match,
         )
-    except (TimeoutExpired, FileNotFoundError):
+    except FileNotFoundError:
         return 0
 
     except Exception as ex:
@@ -125,10 +363,212 @@ def assess_run_command(
         )
         return 0
 
-    if expect_exit_code != r.returncode:
+    if outcome.timed_out:
+        return 0
+
+    if expect_exit_code is not None and expect_exit_code != outcome.exit_code:
+        return 0
+
+    if expect_output is not None and not outcome.output_matched:
         return 0
 
-    if expect_output is not None and expect_output not in r.stdout + r.stderr:
+    if expect_regex is not None and not outcome.regex_matched:
         return 0
 
     return 1
+
+
+def _check_io_cases_params(params: Dict[str, Any]) -> None:
+    """Check the cases given to `assess_io_cases()`, when rules are compiled."""
+    cases: Any = params.get("cases")
+    cases_dir: Any = params.get("cases_dir")
+    if cases is None and cases_dir is None:
+        raise ValueError("either 'cases' or 'cases_dir' must be given")
+
+    # Each case needs an output, inputs and outputs may be unquoted numbers
+    if cases is not None:
+        if not isinstance(cases, list):
+            raise ValueError(f"'cases' must be a list, got {cases!r}")
+        for case in cases:
+            if (
+                not isinstance(case, dict)
+                or "output" not in case
+                or len(case.keys() - {"input", "output"}) > 0
+                or not all(isinstance(v, (str, int, float)) for v in case.values())
+            ):
+                raise ValueError(
+                    "each case must have an 'output' and optionally an 'input', "
+                    f"both text, got {case!r}"
+                )
+
+    if cases_dir is not None and not Path(str(cases_dir)).is_dir():
+        raise ValueError(f"test cases folder {cases_dir!r} does not exist")
+
+
+@plugin_params_check(_check_io_cases_params)
+@plugin_capabilities(COST_EXPENSIVE, {NEEDS_CHECKOUT}, parallel_safe=True)
+def assess_io_cases(
+    student: StudentGit,
+    repo_path: str,
+    command: str,
+    cases: Sequence[Dict[str, Any]] | None = None,
+    cases_dir: str | None = None,
+    contains: bool = False,
+    stop_at_first_failure: bool = False,
+    read_only: bool = False,
+    jobs: int | None = None,
+    timeout: float = 6.5,
+    max_output: int = 1_048_576,
+) -> float:
+    """Run a command once per input/output case, grading the fraction passed.
+
+    Cases are given in `cases`, a list of mappings with the `input` fed to the
+    command and its expected `output`, and/or in `cases_dir`, a folder with
+    `<case>.in` and `<case>.out` files (relative to where egrader runs). The
+    output passes if it's equal to the expected one, ignoring trailing
+    whitespace, or if it contains it, when `contains` is set.
+
+    Cases run one at a time, since they share the repository's working tree.
+    If the command is declared `read_only`, i.e., it doesn't write to the
+    working tree, cases run concurrently, at most `jobs` at a time (by default,
+    the number of CPUs). If `stop_at_first_failure` is set, no more cases are
+    started after one fails, and those not run count as failed.
+    """
+    all_cases: List[Tuple[str, str]] = [
+        (str(case.get("input", "")), str(case["output"])) for case in cases or []
+    ]
+    if cases_dir is not None:
+        all_cases.extend(_load_io_cases_dir(cases_dir))
+    if len(all_cases) == 0:
+        return 0
+
+    args: List[str] = shlex.split(command)
+
+    def _run_case(case: Tuple[str, str]) -> bool:
+        """Run a single case, returning True if it passed."""
+        case_input, case_output = case
+        try:
+            outcome: CommandOutcome = run_streaming(
+                args,
+                repo_path,
+                input_stream=case_input,
+                timeout=timeout,
+                expect_output=case_output if contains else None,
+                max_output=max_output,
+                stop_on_match=contains,
+            )
+        except OSError:
+            # E.g. the command doesn't exist or isn't executable
+            return False
+
+        if outcome.timed_out:
+            return False
+        if contains:
+            return outcome.output_matched
+        return outcome.exit_code == 0 and _normalize_output(
+            outcome.output
+        ) == _normalize_output(case_output)
+
+    # Run cases, stopping at the first failure if requested
+    n_passed: int = 0
+    with ThreadPoolExecutor(
+        max_workers=(jobs or os.cpu_count()) if read_only else 1
+    ) as executor:
+        pending: MutableSet[Future[bool]] = {
+            executor.submit(_run_case, case) for case in all_cases
+        }
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            passed: List[bool] = [future.result() for future in done]
+            n_passed += sum(passed)
+            if stop_at_first_failure and not all(passed):
+                for future in pending:
+                    future.cancel()
+                break
+
+    return n_passed / len(all_cases)
+
+
+@plugin_capabilities(COST_EXPENSIVE, {NEEDS_CHECKOUT}, parallel_safe=True)
+def assess_build(
+    student: StudentGit,
+    repo_path: str,
+    command: str,
+    outputs: Sequence[str],
+    source: str = "",
+    timeout: float = 120,
+    large_files: Sequence[str] = (),
+) -> float:
+    """Build a project, reusing the outputs of identical sources built before.
+
+    The build `command` is successful if it exits with code zero and produces
+    files matching each of the `outputs` glob patterns (relative to the
+    repository). Its outcome is cached by command and by the Git tree of the
+    `source` folder at HEAD (by default, the whole repository), so unchanged
+    repositories, as well as identical submissions, such as untouched
+    templates, are only built once. Cached outputs are copied to the
+    repository, for use by the following assessments, e.g. `run_command`. Builds
+    are kept in a cache of their own, limited by the `--build-cache-size` option.
+    Large files the build needs, left out when fetching, can be downloaded
+    first by listing them in `large_files`.
+    """
+    # Identify the sources by their tree, which only depends on their contents
+    try:
+        tree: str = str(git_at(repo_path, "rev-parse", f"HEAD:{source}")).strip()
+    except GitError:
+        return 0
+
+    def _build() -> List[str] | None:
+        """Build the project, returning its outputs, or None if it failed."""
+        fetch_large_files(repo_path, large_files)
+        outcome: CommandOutcome = run_streaming(
+            shlex.split(command), repo_path, timeout=timeout
+        )
+
+        # Builds which time out may succeed next time, so they're not cached
+        if outcome.timed_out:
+            raise TimeoutError()
+        if outcome.exit_code != 0:
+            return None
+
+        # Collect the outputs, all of which must exist
+        built: List[str] = []
+        for pattern in outputs:
+            output_fps: List[Path] = [
+                fp for fp in Path(repo_path).glob(pattern) if fp.is_file()
+            ]
+            if len(output_fps) == 0:
+                return None
+            built.extend(fp.relative_to(repo_path).as_posix() for fp in output_fps)
+        return built
+
+    # Cached outputs are placed in the repository, unless they're already there
+    try:
+        succeeded: bool = cached_build(
+            f"build\0{command}\0{sorted(outputs)}\0{tree}", Path(repo_path), _build
+        )
+    except OSError:
+        # E.g. the command doesn't exist, isn't executable, or timed out
+        return 0
+
+    return 1 if succeeded else 0
+
+
+def _load_io_cases_dir(cases_dir: str) -> List[Tuple[str, str]]:
+    """Load the `<case>.in` and `<case>.out` files in a folder, sorted by case."""
+    cases_fp: Path = Path(cases_dir)
+    if not cases_fp.is_dir():
+        raise FileNotFoundError(f"Test cases folder {cases_dir!r} does not exist!")
+
+    # Cases without an input file get no input
+    cases: List[Tuple[str, str]] = []
+    for out_fp in sorted(cases_fp.glob("*.out")):
+        in_fp: Path = out_fp.with_suffix(".in")
+        cases.append((in_fp.read_text() if in_fp.exists() else "", out_fp.read_text()))
+
+    return cases
+
+
+def _normalize_output(output: str) -> str:
+    """Remove trailing whitespace from each line and from the whole output."""
+    return "\n".join(line.rstrip() for line in output.rstrip().splitlines())
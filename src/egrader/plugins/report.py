@@ -1,12 +1,16 @@
 """Reporting plug-ins."""
 
-from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout, suppress
 from datetime import datetime
 from io import StringIO
 from pathlib import Path
-from typing import Final, Sequence
+from typing import Final, Iterator, List, Sequence
 
 from ..cli_lib import CLIArgError, check_empty_args
+from ..files import atomic_writer
+from ..paths import check_required_fp_exists
+from ..plugin import PluginLoadError
 from ..types import AssessedStudent
 
 _FOLDER_STUDENT_REPORTS_MD: Final[str] = "reports_md"
@@ -18,43 +22,6 @@ def report_markdown(
     args: Sequence[str],
 ) -> str:
     """Generate a Markdown assessment report."""
-    # Internal functions
-
-    # Print the report's header
-    def print_header() -> None:
-        print("# Assessment report")
-        print()
-        print(datetime.now().ctime())
-        print()
-
-    # Print the detailed student assessment
-    def print_student(student: AssessedStudent) -> None:
-        print(f"## Student {student.sid}")
-        print()
-        print(f"- Grade: {student.grade:.3f}")
-        print()
-        print("### Repositories")
-        print()
-        for repo in student.assessed_repos:
-            print(f"#### {repo.name}")
-            print()
-            print(f"- Weight in grade: {repo.weight}")
-            print(f"- Grade (unweighted): {repo.grade_raw}")
-            print(f"- Final grade: {repo.grade_final:.3f}")
-            print()
-            print("##### Assessments")
-            print()
-            if repo.is_empty():
-                print("Repository not available and/or no assessments performed.")
-            for assess in repo.assessments + repo.inter_assessments:
-                print(f"- `{assess.name}`")
-                print(f"  - Description: {assess.description}")
-                print(f"  - Parameters: `{assess.parameters}`")
-                print(f"  - Weight in grade: {assess.weight}")
-                print(f"  - Grade (unweighted): {assess.grade_raw}")
-                print(f"  - Final grade: {assess.grade_final:.3f}")
-            print()
-
     # Report output to main program
     rep_output: str
 
@@ -67,6 +34,9 @@ def report_markdown(
     elif len(args) >= 1:
         raise CLIArgError(f"Invalid arguments: {', '.join(args)}")
 
+    # The header is the same for all students
+    header: str = _md_header()
+
     if to_files:
         with StringIO() as out_string:
             # Determine and create folder where to place reports
@@ -76,32 +46,96 @@ def report_markdown(
             print(f"- Absolute assessment path: {assess_fp.absolute()}.")
             print(f"- Markdown reports saved to {reports_fp}.")
 
-            # Save individual reports to a file for each student
-            for student in assessed_students:
-                report_fp = reports_fp.joinpath(f"{student.sid}.md")
-                with open(report_fp, "w") as md_file, redirect_stdout(md_file):
-                    print_header()
-                    print_student(student)
+            # Save individual reports to a file for each student, in parallel
+            with ThreadPoolExecutor() as executor:
+                written: List[bool] = list(
+                    executor.map(
+                        lambda s: _save_md_report(
+                            reports_fp.joinpath(f"{s.sid}.md"), header, _md_student(s)
+                        ),
+                        assessed_students,
+                    )
+                )
 
+            for student, was_written in zip(assessed_students, written, strict=True):
                 print(
-                    f"- Assessment report for student {student.sid} saved at "
-                    f"{report_fp}.",
+                    f"- Assessment report for student {student.sid} "
+                    f"{'saved' if was_written else 'unchanged'} at "
+                    f"{reports_fp.joinpath(f'{student.sid}.md')}.",
                     file=out_string,
                 )
 
             rep_output = out_string.getvalue()
 
     else:
-        # Print report to report output string
-        with StringIO() as md_string, redirect_stdout(md_string):
-            print_header()
-            for student in assessed_students:
-                print_student(student)
-            rep_output = md_string.getvalue()
+        # Join the header and all the students in the report output string
+        rep_output = header + "".join(_md_student(s) for s in assessed_students)
 
     return rep_output
 
 
+def _md_header() -> str:
+    """Render the header of Markdown reports."""
+    return f"# Assessment report\n\n{datetime.now().ctime()}\n\n"
+
+
+def _md_student(student: AssessedStudent) -> str:
+    """Render the detailed assessment of a student in Markdown."""
+    lines: List[str] = [
+        f"## Student {student.sid}",
+        "",
+        f"- Grade: {student.grade:.3f}",
+        "",
+        "### Repositories",
+        "",
+    ]
+    for repo in student.assessed_repos:
+        lines += [
+            f"#### {repo.name}",
+            "",
+            f"- Weight in grade: {repo.weight}",
+            f"- Grade (unweighted): {repo.grade_raw}",
+            f"- Final grade: {repo.grade_final:.3f}",
+            "",
+            "##### Assessments",
+            "",
+        ]
+        if repo.is_empty():
+            lines.append("Repository not available and/or no assessments performed.")
+        for assess in repo.assessments + repo.inter_assessments:
+            lines += [
+                f"- `{assess.name}`",
+                f"  - Description: {assess.description}",
+                f"  - Parameters: `{assess.parameters}`",
+                f"  - Weight in grade: {assess.weight}",
+                f"  - Grade (unweighted): {assess.grade_raw}",
+                f"  - Final grade: {assess.grade_final:.3f}",
+            ]
+            if assess.skipped is not None:
+                lines.append(f"  - Skipped: {assess.skipped}")
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+
+def _save_md_report(report_fp: Path, header: str, body: str) -> bool:
+    """Save a student's Markdown report, unless only its header would change.
+
+    Returns:
+      True if the report was written, False if it was left unchanged.
+    """
+    # Compare the existing report without its header, which contains the date
+    with suppress(FileNotFoundError):
+        existing: str = report_fp.read_text()
+        if existing.split("\n", header.count("\n"))[-1] == body:
+            return False
+
+    # Write the whole report at once, atomically
+    with atomic_writer(report_fp) as report_file:
+        report_file.write(header + body)
+    return True
+
+
 def report_basic(
     assess_fp: Path, assessed_students: Sequence[AssessedStudent], args: Sequence[str]
 ) -> str:
@@ -128,3 +162,54 @@ def report_tsv(
         for student in assessed_students:
             print(f"{student.sid}\t{student.grade}")
         return out_text.getvalue()
+
+
+def report_template(
+    assess_fp: Path, assessed_students: Sequence[AssessedStudent], args: Sequence[str]
+) -> str:
+    """Generate a report from a Jinja2 template (arguments: TEMPLATE [OUTPUT]).
+
+    The template receives the list of assessed `students`, the assessment folder
+    path `assess_path` and the report generation date `now`. If an output file is
+    given, the report is written to it as it's rendered, otherwise it's returned.
+    """
+    # Check parameters
+    if len(args) not in (1, 2):
+        raise CLIArgError(
+            f"Expected TEMPLATE [OUTPUT] arguments, got: {', '.join(args) or 'none'}"
+        )
+    template_fp: Path = Path(args[0])
+    check_required_fp_exists(template_fp)
+
+    # Jinja2 is an optional dependency, only required by this plugin
+    try:
+        import jinja2
+    except ImportError as ie:
+        raise PluginLoadError(
+            "The template report requires Jinja2 (pip install egrader[template])"
+        ) from ie
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(template_fp.parent),
+        autoescape=jinja2.select_autoescape(["html", "htm", "xml"]),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+    )
+    template = env.get_template(template_fp.name)
+
+    # Render the report, piece by piece
+    chunks: Iterator[str] = template.generate(
+        students=assessed_students,
+        assess_path=assess_fp,
+        now=datetime.now(),
+    )
+
+    # Return the report, or stream it to the output file
+    if len(args) == 1:
+        return "".join(chunks)
+
+    output_fp: Path = Path(args[1])
+    with atomic_writer(output_fp) as output_file:
+        output_file.writelines(chunks)
+    return f"- Report saved to {output_fp}.\n"
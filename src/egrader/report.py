@@ -2,12 +2,13 @@
 
 from argparse import Namespace
 from pathlib import Path
-from typing import Sequence, cast
+from typing import Sequence
 
+from .cli_lib import CLIArgError
 from .paths import check_required_fp_exists, get_assessed_students_fp
 from .plugin import load_report_plugin_function
+from .results import load_assessed_student, load_assessed_students
 from .types import AssessedStudent
-from .yaml import load_yaml
 
 
 def report(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
@@ -18,10 +19,15 @@ def report(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
     # Check if assessment file exists, and if not, quit
     check_required_fp_exists(assess_file_fp)
 
-    # Load report file
-    assessed_students: Sequence[AssessedStudent] = cast(
-        Sequence[AssessedStudent], load_yaml(assess_file_fp, False)
-    )
+    # Load only the specified student, if any, otherwise load the report file
+    assessed_students: Sequence[AssessedStudent]
+    if args.student is not None:
+        assessed_student = load_assessed_student(assess_fp, args.student)
+        if assessed_student is None:
+            raise CLIArgError(f"Student {args.student!r} not found")
+        assessed_students = [assessed_student]
+    else:
+        assessed_students = load_assessed_students(assess_fp)
 
     # Load plugin function to perform reporting
     report_fun = load_report_plugin_function(args.report_type)
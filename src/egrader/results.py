@@ -0,0 +1,225 @@
+"""Indexed storage of assessment results."""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Final, Iterator, List, Sequence, Tuple
+
+from .files import atomic_writer
+from .paths import get_assessed_students_fp, get_assessed_students_index_fp
+from .types import ASSESSED_STUDENTS_SCHEMA, AssessedStudent
+from .yaml import load_yaml_item, load_yaml_list, yaml_list_writer
+
+# Index header: magic, size and modification time of the indexed yaml file,
+# number of entries and width of the keys (student IDs) in bytes
+_INDEX_HEADER: Final[struct.Struct] = struct.Struct("<8sQQQI")
+_INDEX_MAGIC: Final[bytes] = b"EGRIDX1\n"
+
+# Each index entry is a key, padded with zeros, followed by the offset and length
+# of the respective item in the yaml file
+_INDEX_ENTRY_LOCATION: Final[struct.Struct] = struct.Struct("<QQ")
+
+
+def save_assessed_students(
+    assess_fp: Path, assessed_students: Sequence[AssessedStudent]
+) -> None:
+    """Save assessed students, along with an index for looking up each of them.
+
+    Students are saved in a yaml file as usual. The index is a separate file with
+    fixed-width entries sorted by student ID, each one pointing to the location of
+    the respective student in the yaml file.
+    """
+    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
+
+    # Save students one at a time, keeping track of where each one was saved
+    entries: List[Tuple[bytes, int, int]] = []
+    with yaml_list_writer(
+        assessed_students_fp, ASSESSED_STUDENTS_SCHEMA
+    ) as save_student:
+        for student in assessed_students:
+            entries.append(
+                (student.sid.encode("utf-8"), *save_student(student.to_dict()))
+            )
+
+    # Sort entries by their zero-padded keys, for binary search
+    key_width: int = max((len(key) for key, _, _ in entries), default=0)
+    entries.sort(key=lambda e: e[0].ljust(key_width, b"\0"))
+
+    # The index is only valid for this exact version of the yaml file
+    yaml_stat: os.stat_result = assessed_students_fp.stat()
+
+    # Write the index to a temporary file, replacing the actual index when done
+    with atomic_writer(get_assessed_students_index_fp(assess_fp), "wb") as index_file:
+        index_file.write(
+            _INDEX_HEADER.pack(
+                _INDEX_MAGIC,
+                yaml_stat.st_size,
+                yaml_stat.st_mtime_ns,
+                len(entries),
+                key_width,
+            )
+        )
+        for key, offset, length in entries:
+            index_file.write(key.ljust(key_width, b"\0"))
+            index_file.write(_INDEX_ENTRY_LOCATION.pack(offset, length))
+
+
+def load_assessed_students(assess_fp: Path) -> List[AssessedStudent]:
+    """Load all assessed students."""
+    return load_yaml_list(
+        get_assessed_students_fp(assess_fp),
+        ASSESSED_STUDENTS_SCHEMA,
+        AssessedStudent.from_dict,
+    )
+
+
+def iter_assessed_students(assess_fp: Path) -> Iterator[AssessedStudent]:
+    """Iterate over the assessed students, sorted by student ID.
+
+    Students are read in the order of the index, decoding one record at a time,
+    so that only the current student is kept in memory. If the index is missing
+    or outdated, all students are loaded and sorted instead.
+    """
+    index_fp: Path = get_assessed_students_index_fp(assess_fp)
+
+    with open(get_assessed_students_fp(assess_fp), "rb") as yaml_file:
+        # Without a valid index, fall back to loading every student
+        try:
+            locations: List[Tuple[int, int]] = _read_index_locations(
+                index_fp, os.fstat(yaml_file.fileno())
+            )
+        except _StaleIndexError:
+            yield from sorted(load_assessed_students(assess_fp), key=lambda s: s.sid)
+            return
+
+        # Decode each student's record in turn
+        with mmap.mmap(yaml_file.fileno(), 0, access=mmap.ACCESS_READ) as yaml_map:
+            for offset, length in locations:
+                yield load_yaml_item(
+                    yaml_map[offset : offset + length], AssessedStudent.from_dict
+                )
+
+
+def load_assessed_student(assess_fp: Path, sid: str) -> AssessedStudent | None:
+    """Load a single assessed student, or None if there is no such student.
+
+    The student is located with a binary search over the memory-mapped index, and
+    only its own record is decoded. If the index is missing or outdated, all
+    students are loaded instead.
+
+    The yaml file is opened only once, and checked against the index through
+    the open file, so the student is read consistently even if the yaml file is
+    concurrently replaced.
+    """
+    index_fp: Path = get_assessed_students_index_fp(assess_fp)
+
+    with open(get_assessed_students_fp(assess_fp), "rb") as yaml_file:
+        # Without a valid index, fall back to loading every student
+        location: Tuple[int, int] | None
+        try:
+            location = _find_in_index(index_fp, os.fstat(yaml_file.fileno()), sid)
+        except _StaleIndexError:
+            students = load_assessed_students(assess_fp)
+            return next((s for s in students if s.sid == sid), None)
+
+        # Student not found
+        if location is None:
+            return None
+
+        # Decode only the student's own record
+        offset, length = location
+        with mmap.mmap(yaml_file.fileno(), 0, access=mmap.ACCESS_READ) as yaml_map:
+            return load_yaml_item(
+                yaml_map[offset : offset + length], AssessedStudent.from_dict
+            )
+
+
+class _StaleIndexError(Exception):
+    """Error raised when an index is missing or doesn't match its yaml file."""
+
+
+def _find_in_index(
+    index_fp: Path, yaml_stat: os.stat_result, sid: str
+) -> Tuple[int, int] | None:
+    """Find the offset and length of a student's record in the yaml file."""
+    try:
+        with (
+            open(index_fp, "rb") as index_file,
+            mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map,
+        ):
+            return _search_index(index_map, yaml_stat, sid)
+    except (OSError, ValueError, struct.error) as e:
+        # Missing, empty or truncated index
+        raise _StaleIndexError() from e
+
+
+def _read_index_locations(
+    index_fp: Path, yaml_stat: os.stat_result
+) -> List[Tuple[int, int]]:
+    """Read the offset and length of every record, in student ID order."""
+    try:
+        with (
+            open(index_fp, "rb") as index_file,
+            mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map,
+        ):
+            n_entries, key_width = _check_index_header(index_map, yaml_stat)
+            entry_size: int = key_width + _INDEX_ENTRY_LOCATION.size
+            return [
+                _INDEX_ENTRY_LOCATION.unpack_from(
+                    index_map, _INDEX_HEADER.size + i * entry_size + key_width
+                )
+                for i in range(n_entries)
+            ]
+    except (OSError, ValueError, struct.error) as e:
+        # Missing, empty or truncated index
+        raise _StaleIndexError() from e
+
+
+def _check_index_header(
+    index_map: mmap.mmap, yaml_stat: os.stat_result
+) -> Tuple[int, int]:
+    """Check if an index is up to date, returning its entry count and key width."""
+    magic, yaml_size, yaml_mtime_ns, n_entries, key_width = _INDEX_HEADER.unpack_from(
+        index_map
+    )
+    if (
+        magic != _INDEX_MAGIC
+        or yaml_size != yaml_stat.st_size
+        or yaml_mtime_ns != yaml_stat.st_mtime_ns
+    ):
+        raise _StaleIndexError()
+    return n_entries, key_width
+
+
+def _search_index(
+    index_map: mmap.mmap, yaml_stat: os.stat_result, sid: str
+) -> Tuple[int, int] | None:
+    """Binary search an index for a student, checking if it's up to date."""
+    # Check if the index matches the yaml file
+    n_entries, key_width = _check_index_header(index_map, yaml_stat)
+
+    # Keys larger than the key width are certainly not in the index
+    key: bytes = sid.encode("utf-8")
+    if len(key) > key_width:
+        return None
+    key = key.ljust(key_width, b"\0")
+
+    # Binary search for the key
+    entry_size: int = key_width + _INDEX_ENTRY_LOCATION.size
+    low, high = 0, n_entries
+    while low < high:
+        mid = (low + high) // 2
+        entry_start = _INDEX_HEADER.size + mid * entry_size
+        entry_key = index_map[entry_start : entry_start + key_width]
+        if entry_key < key:
+            low = mid + 1
+        elif entry_key > key:
+            high = mid
+        else:
+            offset, length = _INDEX_ENTRY_LOCATION.unpack_from(
+                index_map, entry_start + key_width
+            )
+            return offset, length
+
+    return None
@@ -0,0 +1,322 @@
+"""Assessment rules compilation and validation."""
+
+from heapq import heapify, heappop, heappush
+from inspect import signature
+from pathlib import Path
+from typing import AbstractSet, Any, Dict, Final, List, MutableSet, Sequence, Tuple
+
+from .plugin import (
+    PluginCapabilities,
+    check_plugin_params,
+    get_plugin_capabilities,
+    get_short_plugin_desc,
+    load_inter_repo_plugin_functions,
+    load_repo_plugin_functions,
+)
+from .yaml import load_yaml
+
+_RULE_KEYS: Final[AbstractSet[str]] = frozenset(
+    {"repo", "weight", "assessments", "inter_assessments"}
+)
+_ASSESSMENT_KEYS: Final[AbstractSet[str]] = frozenset(
+    {"name", "weight", "params", "id", "requires", "stop_on_fail"}
+)
+_INTER_ASSESSMENT_KEYS: Final[AbstractSet[str]] = frozenset(
+    {"name", "weight", "params"}
+)
+
+
+class RulesError(Exception):
+    """Error raised when assessment rules are invalid."""
+
+
+class AssessmentPlan:
+    """A validated assessment, with its plugin function already resolved."""
+
+    def __init__(
+        self,
+        name: str,
+        function: Any,
+        params: Dict[str, Any],
+        weight: float,
+        aid: str | None = None,
+        requires: Sequence[str] = (),
+        stop_on_fail: bool = False,
+    ) -> None:
+        """Initialize an instance of this class."""
+        # Set instance variables
+        self.name: str = name
+        self.function: Any = function
+        self.description: str = get_short_plugin_desc(function)
+        self.capabilities: PluginCapabilities = get_plugin_capabilities(function)
+        self.params: Dict[str, Any] = params
+        self.weight: float = weight
+        self.id: str | None = aid
+        self.requires: List[str] = list(requires)
+        self.stop_on_fail: bool = stop_on_fail
+
+        # Other assessments depend on this one? Set when the repository is planned
+        self.is_gate: bool = stop_on_fail
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(name=%r, params=%r, weight=%r, id=%r)" % (
+            self.__class__.__name__,
+            self.name,
+            self.params,
+            self.weight,
+            self.id,
+        )
+
+
+class RepoPlan:
+    """The validated assessments to perform on a repository."""
+
+    def __init__(
+        self,
+        name: str,
+        weight: float,
+        assessments: Sequence[AssessmentPlan],
+        inter_assessments: Sequence[AssessmentPlan],
+    ) -> None:
+        """Initialize an instance of this class."""
+        # Set instance variables
+        self.name: str = name
+        self.weight: float = weight
+        self.assessments: List[AssessmentPlan] = list(assessments)
+        self.inter_assessments: List[AssessmentPlan] = list(inter_assessments)
+
+        # Determine assessment execution order, validating requirements
+        self.exec_order: List[int] = get_assessment_exec_order(self.assessments)
+
+        # Assessments which others require are gates
+        required_ids: AbstractSet[str] = {
+            rid for a in self.assessments for rid in a.requires
+        }
+        for a in self.assessments:
+            a.is_gate = a.stop_on_fail or a.id in required_ids
+
+        # Repository data required by the assessments
+        self.needs: AbstractSet[str] = frozenset(
+            need
+            for a in self.assessments + self.inter_assessments
+            for need in a.capabilities.needs
+        )
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(name=%r, weight=%r, assessments=%r, inter_assessments=%r)" % (
+            self.__class__.__name__,
+            self.name,
+            self.weight,
+            self.assessments,
+            self.inter_assessments,
+        )
+
+
+class RulesPlan:
+    """Validated assessment rules, ready to be applied."""
+
+    def __init__(self, repos: Sequence[RepoPlan]) -> None:
+        """Initialize an instance of this class."""
+        self.repos: List[RepoPlan] = list(repos)
+
+    def __repr__(self) -> str:
+        """String representation of this instance."""
+        return "%s(repos=%r)" % (self.__class__.__name__, self.repos)
+
+    @property
+    def repo_names(self) -> List[str]:
+        """Names of the repositories to assess."""
+        return [repo.name for repo in self.repos]
+
+    @property
+    def repo_needs(self) -> Dict[str, AbstractSet[str]]:
+        """Repository data required by the assessments of each repository."""
+        return {repo.name: repo.needs for repo in self.repos}
+
+    @property
+    def assess_functions(self) -> Dict[str, Any]:
+        """Repository assessment plugin functions by name."""
+        return {a.name: a.function for repo in self.repos for a in repo.assessments}
+
+
+def load_rules(rules_fp: Path) -> RulesPlan:
+    """Load and compile a rules file.
+
+    Rules are validated and compiled into a plan with the plugin functions
+    already resolved, so that invalid rules are reported before any work is
+    done. Compiled rules are not cached on disk, since loading them safely
+    would cost as much as compiling them again.
+    """
+    return compile_rules(load_yaml(rules_fp))
+
+
+def compile_rules(rules: Any) -> RulesPlan:
+    """Validate rules loaded from a rules file and compile them into a plan."""
+    if not isinstance(rules, list) or len(rules) == 0:
+        raise RulesError("Rules must be a non-empty list of repository rules")
+
+    # Validate the structure of each rule
+    for rule in rules:
+        _check_keys(rule, _RULE_KEYS, "repository rule")
+        _check_type(rule.get("repo"), str, "'repo' of repository rule")
+        where: str = f"repository {rule['repo']!r}"
+        _check_weight(rule.get("weight"), where)
+        for key, valid_keys in (
+            ("assessments", _ASSESSMENT_KEYS),
+            ("inter_assessments", _INTER_ASSESSMENT_KEYS),
+        ):
+            _check_type(rule.get(key, []), list, f"{key!r} of {where}")
+            for assess_rule in rule.get(key, []):
+                _check_keys(assess_rule, valid_keys, f"assessment of {where}")
+                _check_type(assess_rule.get("name"), str, f"assessment of {where}")
+                _check_weight(assess_rule.get("weight"), where)
+                _check_type(
+                    assess_rule.get("params") or {}, dict, f"'params' of {where}"
+                )
+
+    # Repository names must be unique
+    repo_names: List[str] = [rule["repo"] for rule in rules]
+    if len(set(repo_names)) < len(repo_names):
+        raise RulesError("Repository names in rules must be unique")
+
+    # Load the required plugins
+    assess_functions: Dict[str, Any] = load_repo_plugin_functions(
+        {a["name"] for rule in rules for a in rule.get("assessments", [])}
+    )
+    inter_assess_functions: Dict[str, Any] = load_inter_repo_plugin_functions(
+        {a["name"] for rule in rules for a in rule.get("inter_assessments", [])}
+    )
+
+    # Create the plan for each repository
+    repos: List[RepoPlan] = []
+    for rule in rules:
+        where = f"repository {rule['repo']!r}"
+        assessments: List[AssessmentPlan] = []
+        for assess_rule in rule.get("assessments", []):
+            requires: Any = assess_rule.get("requires", [])
+            if isinstance(requires, str):
+                requires = [requires]
+            _check_type(requires, list, f"'requires' of {where}")
+            _check_type(assess_rule.get("id", ""), str, f"'id' of {where}")
+            _check_type(
+                assess_rule.get("stop_on_fail", False),
+                bool,
+                f"'stop_on_fail' of {where}",
+            )
+            assessments.append(
+                AssessmentPlan(
+                    assess_rule["name"],
+                    assess_functions[assess_rule["name"]],
+                    _bind_params(assess_functions, assess_rule, where, 2),
+                    assess_rule["weight"],
+                    assess_rule.get("id"),
+                    requires,
+                    assess_rule.get("stop_on_fail", False),
+                )
+            )
+        inter_assessments: List[AssessmentPlan] = [
+            AssessmentPlan(
+                inter_rule["name"],
+                inter_assess_functions[inter_rule["name"]],
+                _bind_params(inter_assess_functions, inter_rule, where, 1),
+                inter_rule["weight"],
+            )
+            for inter_rule in rule.get("inter_assessments", [])
+        ]
+        try:
+            repos.append(
+                RepoPlan(rule["repo"], rule["weight"], assessments, inter_assessments)
+            )
+        except RulesError as re:
+            raise RulesError(f"{re.args[0]} in {where}") from re
+
+    return RulesPlan(repos)
+
+
+def get_assessment_exec_order(assessments: Sequence[AssessmentPlan]) -> List[int]:
+    """Determine the order in which the assessments of a repository are performed.
+
+    Cheaper assessments are performed first, as long as required assessments are
+    performed before the ones requiring them, and assessments which stop on failure
+    are performed before all assessments following them in the rules.
+    """
+    # Map assessment ids to assessment indexes
+    idx_by_id: Dict[str, int] = {}
+    for i, a in enumerate(assessments):
+        if a.id is not None:
+            if a.id in idx_by_id:
+                raise RulesError(f"Duplicate assessment id {a.id!r}")
+            idx_by_id[a.id] = i
+
+    # Determine which assessments must be performed before each assessment
+    preds: List[MutableSet[int]] = [set() for _ in assessments]
+    for i, a in enumerate(assessments):
+        for required_id in a.requires:
+            if required_id not in idx_by_id:
+                raise RulesError(f"Unknown required assessment id {required_id!r}")
+            preds[i].add(idx_by_id[required_id])
+        if a.stop_on_fail:
+            for j in range(i + 1, len(assessments)):
+                preds[j].add(i)
+
+    # Topological sort, picking the cheapest (and then first) assessment available
+    ready: List[Tuple[int, int]] = [
+        (assessments[i].capabilities.cost_rank, i)
+        for i in range(len(assessments))
+        if len(preds[i]) == 0
+    ]
+    heapify(ready)
+    exec_order: List[int] = []
+    while len(ready) > 0:
+        _, i = heappop(ready)
+        exec_order.append(i)
+        for j in range(len(assessments)):
+            if i in preds[j]:
+                preds[j].remove(i)
+                if len(preds[j]) == 0:
+                    heappush(ready, (assessments[j].capabilities.cost_rank, j))
+
+    if len(exec_order) < len(assessments):
+        raise RulesError("Circular requirements between assessments")
+
+    return exec_order
+
+
+def _check_keys(obj: Any, valid_keys: AbstractSet[str], what: str) -> None:
+    """Check that obj is a dictionary without unknown keys."""
+    _check_type(obj, dict, what)
+    unknown_keys: AbstractSet[str] = obj.keys() - valid_keys
+    if len(unknown_keys) > 0:
+        raise RulesError(f"Unknown keys {sorted(unknown_keys)} in {what}: {obj!r}")
+
+
+def _check_type(obj: Any, obj_type: type, what: str) -> None:
+    """Check that obj is of the given type."""
+    if not isinstance(obj, obj_type):
+        raise RulesError(
+            f"Expected {obj_type.__name__} for {what}, got {obj!r} instead"
+        )
+
+
+def _check_weight(weight: Any, where: str) -> None:
+    """Check that a weight is a number."""
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+        raise RulesError(f"Invalid or missing weight {weight!r} in {where}")
+
+
+def _bind_params(
+    functions: Dict[str, Any], assess_rule: Dict[str, Any], where: str, n_fixed: int
+) -> Dict[str, Any]:
+    """Check that the plugin accepts the assessment parameters and return them."""
+    params: Dict[str, Any] = assess_rule.get("params") or {}
+    function: Any = functions[assess_rule["name"]]
+    try:
+        signature(function).bind(*([None] * n_fixed), **params)
+        check_plugin_params(function, params)
+    except (TypeError, ValueError) as e:
+        raise RulesError(
+            f"Invalid parameters for {assess_rule['name']!r} in {where}: {e}"
+        ) from e
+    return params
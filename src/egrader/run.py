@@ -0,0 +1,174 @@
+"""Pipelined fetch and assessment of student repositories."""
+
+from argparse import Namespace
+from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .assess import assess_inter_repos, assess_student, make_plugin_locks
+from .cache import build_cache, feature_cache
+from .cli_lib import OPT_E_LONG, check_empty_args
+from .fetch import (
+    FetchScheduler,
+    iter_fetch_repos,
+    open_students_git,
+    prepare_assess_folder,
+)
+from .paths import (
+    check_required_fp_exists,
+    get_assessed_students_fp,
+    get_builds_cache_fp,
+    get_features_cache_fp,
+    get_student_repos_fp,
+    get_valid_students_git_fp,
+)
+from .results import save_assessed_students
+from .rules import RulesPlan, load_rules
+from .types import STUDENTS_GIT_SCHEMA, AssessedStudent, StudentGit
+from .yaml import yaml_list_writer
+
+
+def run(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Fetch and assess students in a pipeline, then perform inter-assessments.
+
+    Each student is assessed as soon as their repositories are fetched, while the
+    repositories of the following students are being fetched. A bounded queue
+    between the fetch and assessment stages keeps fetching from getting too far
+    ahead of assessment.
+    """
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Determine file paths for Git URLs and rules files
+    urls_fp: Path = Path(args.urls_file)
+    rules_fp: Path = Path(args.rules_file)
+
+    # Check if Git URLs and rules files exist, and if not, quit
+    check_required_fp_exists(urls_fp)
+    check_required_fp_exists(rules_fp)
+
+    # Determine file paths for validated URLs and assessment yaml files
+    students_git_fp: Path = get_valid_students_git_fp(assess_fp)
+    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
+
+    # Load and validate rules, before doing any actual work
+    rules: RulesPlan = load_rules(rules_fp)
+
+    # Prepare the assessment folder, according to the -e command line option
+    prepare_assess_folder(assess_fp, getattr(args, OPT_E_LONG))
+
+    # Load student Git URLs, lazily if they haven't been validated yet
+    students_git: Iterable[StudentGit] = open_students_git(students_git_fp, urls_fp)
+
+    # Students fetched and waiting to be assessed, None signals the end
+    fetched: Queue[Tuple[int, StudentGit] | None] = Queue(maxsize=args.queue_size)
+
+    # Assessed students by the order in which they were fetched, i.e., the order
+    # of the URLs file, except for students with postponed fetches, which come last
+    assessed: Dict[int, AssessedStudent] = {}
+
+    # Number of students with valid Git URLs and number of repositories
+    counts: Dict[str, int] = {"valid_urls": 0, "repos": 0}
+
+    # Errors in any of the stages, which stop the pipeline
+    errors: List[BaseException] = []
+    errors_lock = Lock()
+    stop = Event()
+
+    def _fail(error: BaseException) -> None:
+        with errors_lock:
+            errors.append(error)
+        stop.set()
+
+    # Fetch stage: fetch and save each student, then queue it for assessment
+    def _fetch_stage() -> None:
+        try:
+            with yaml_list_writer(
+                students_git_fp, STUDENTS_GIT_SCHEMA
+            ) as save_student_git:
+                for idx, student_git in enumerate(
+                    iter_fetch_repos(
+                        assess_fp,
+                        students_git,
+                        rules.repo_names,
+                        rules.repo_needs,
+                        FetchScheduler(
+                            args.retries,
+                            args.backoff,
+                            wait_time=args.wait,
+                            skip_lfs=args.skip_lfs,
+                            blob_limit=args.blob_limit,
+                        ),
+                    )
+                ):
+                    save_student_git(student_git.to_dict())
+                    counts["valid_urls"] += student_git.valid_url
+                    counts["repos"] += student_git.repo_count
+                    fetched.put((idx, student_git))
+                    if stop.is_set():
+                        break
+        except Exception as e:
+            _fail(e)
+        finally:
+            for _ in range(args.jobs):
+                fetched.put(None)
+
+    # Assessment stage: assess students as they come out of the fetch stage
+    plugin_locks = make_plugin_locks(rules.assess_functions)
+
+    def _assess_stage() -> None:
+        while (item := fetched.get()) is not None:
+            if stop.is_set():
+                continue
+            idx, student_git = item
+            try:
+                assessed[idx] = assess_student(student_git, rules, plugin_locks)
+            except Exception as e:
+                _fail(e)
+
+    # Run both stages concurrently and wait for them to finish
+    threads: List[Thread] = [Thread(target=_fetch_stage)] + [
+        Thread(target=_assess_stage) for _ in range(args.jobs)
+    ]
+
+    # Reuse repository features and builds from previous runs
+    with (
+        feature_cache(get_features_cache_fp(assess_fp)),
+        build_cache(get_builds_cache_fp(assess_fp), args.build_cache_size),
+    ):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # If anything went wrong in the pipeline, report the first error
+        if len(errors) > 0:
+            raise errors[0]
+
+        # Inter-repository assessments require every student to be assessed
+        assessed_students: List[AssessedStudent] = [
+            assessed[idx] for idx in range(len(assessed))
+        ]
+        assess_inter_repos(rules, assessed_students, args.jobs)
+
+    # Save list of assessed students to yaml file
+    save_assessed_students(assess_fp, assessed_students)
+
+    # Number of assessments performed and skipped
+    n_assessments = sum([s.assessment_count for s in assessed_students])
+    n_skipped = sum([s.skipped_count for s in assessed_students])
+
+    # Provide feedback to the user
+    print(f"- Absolute assessment path: {assess_fp.absolute()}.")
+    print(
+        f"- Fetched {counts['repos']} repositories from {len(assessed_students)} "
+        f"students, {counts['valid_urls']} of which with valid URLs."
+    )
+    print(
+        f"- Performed {n_assessments} assessments ({n_skipped} skipped) on "
+        f"{len(assessed_students)} student repositories at "
+        f"{get_student_repos_fp(assess_fp)}."
+    )
+    print(f"- URL and repository validation report available at {students_git_fp}.")
+    print(f"- Updated {assessed_students_fp}.")
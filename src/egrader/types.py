@@ -1,13 +1,44 @@
 """Classes used in egrader."""
 
+import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Final, List, Tuple
 from urllib.parse import urlparse
 
 # import requests
 import validators
 from yarl import URL
 
+from .yaml import Schema
+
+# Schemas of the files where these classes are saved, version should be
+# incremented whenever the respective to_dict() output changes
+STUDENTS_GIT_SCHEMA: Final[Schema] = ("egrader.students_git", 2)
+ASSESSED_STUDENTS_SCHEMA: Final[Schema] = ("egrader.assessed_students", 1)
+
+
+@lru_cache(maxsize=65536)
+def _validate_git_url(url: str) -> Tuple[str | None, str]:
+    """Validate a partial Git URL, returning its type and normalized form.
+
+    Only local file and http/https URLs are supported. Results are cached, since
+    the same URL is often checked many times.
+    """
+    u = urlparse(url)
+    if u.scheme in {"file", ""}:
+        # It's a file URL probably, let's check if it exists and is a folder
+        p = Path(u.netloc, u.path)
+        if p.exists() and p.is_dir():
+            return "file", str(p)
+    elif (
+        u.scheme in {"http", "https"}  # Is it a HTTP/HTTPS URL?
+        and validators.url(url)  # Is it a well-formed URL?
+        # and requests.head(url).status_code < 400  # Valid net resource (200)?
+    ):
+        return u.scheme, url
+    return None, ""
+
 
 class StudentGit:
     """A student and his Git repositories."""
@@ -17,37 +48,54 @@ class StudentGit:
         # Set instance variables
         self.sid: str = sid
         self.email: str = email
-        self._url: str = ""
-        self.url_type: str | None = None
         self.repos: Dict[str, str] = {}
+        self.fetch_errors: Dict[str, str] = {}
 
         # Validate partial Git URL (only local file and http/https supported)
-        u = urlparse(url)
-        if u.scheme in {"file", ""}:
-            # It's a file URL probably, let's check if it exists and is a folder
-            p = Path(u.netloc, u.path)
-            if p.exists() and p.is_dir():
-                self.url_type = "file"
-                self._url = str(p)
-        elif (
-            u.scheme in {"http", "https"}  # Is it a HTTP/HTTPS URL?
-            and validators.url(url)  # Is it a well-formed URL?
-            # and requests.head(url).status_code < 400  # Valid net resource (200)?
-        ):
-            self.url_type = u.scheme
-            self._url = url
+        url_type, valid_url = _validate_git_url(url)
+        self._url: str = valid_url
+        self.url_type: str | None = url_type
 
     def __repr__(self) -> str:
         """String representation of this instance for YAML serialization."""
-        return "%s(sid=%r, email=%r, url=%r, url_type=%r, repos=%r)" % (
-            self.__class__.__name__,
-            self.sid,
-            self.email,
-            self._url,
-            self.url_type,
-            self.repos,
+        return (
+            "%s(sid=%r, email=%r, url=%r, url_type=%r, repos=%r, fetch_errors=%r)"
+            % (
+                self.__class__.__name__,
+                self.sid,
+                self.email,
+                self._url,
+                self.url_type,
+                self.repos,
+                self.fetch_errors,
+            )
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for saving it."""
+        return {
+            "sid": self.sid,
+            "email": self.email,
+            "url": self._url,
+            "url_type": self.url_type,
+            "repos": dict(self.repos),
+            "fetch_errors": dict(self.fetch_errors),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StudentGit":
+        """Create an instance from plain data, without validating its URL again."""
+        student_git: StudentGit = cls.__new__(cls)
+        student_git.sid = str(data["sid"])
+        student_git.email = str(data["email"])
+        student_git.repos = {str(k): str(v) for k, v in data["repos"].items()}
+        student_git.fetch_errors = {
+            str(k): str(v) for k, v in (data.get("fetch_errors") or {}).items()
+        }
+        student_git._url = str(data["url"])
+        student_git.url_type = data["url_type"]
+        return student_git
+
     def add_repo(self, repo_name: str, repo_path: str) -> None:
         """Add a new repository to this student instance."""
         self.repos[repo_name] = repo_path
@@ -72,8 +120,17 @@ class StudentGit:
         return self._url != "" and self.url_type is not None
 
 
+def assessment_key(name: str, parameters: Dict[str, Any]) -> Tuple[str, str]:
+    """Identify an assessment by its plugin and parameters, e.g. across rule changes.
+
+    >>> assessment_key("files_exist", {"filenames": ["a.txt"], "all": True})
+    ('files_exist', '{"all": true, "filenames": ["a.txt"]}')
+    """
+    return name, json.dumps(parameters, sort_keys=True, default=str)
+
+
 class Assessment:
-    """An already performed assessment."""
+    """An already performed (or skipped) assessment."""
 
     def __init__(
         self,
@@ -82,6 +139,7 @@ class Assessment:
         parameters: Dict[str, Any],
         weight: float,
         grade_raw: float,
+        skipped: str | None = None,
     ) -> None:
         """Initialize an instance of this class."""
         # Set instance variables
@@ -90,15 +148,40 @@ class Assessment:
         self.parameters: Dict[str, Any] = parameters
         self.weight: float = weight
         self.grade_raw: float = grade_raw
+        self.skipped: str | None = skipped
 
     def __repr__(self) -> str:
         """String representation of this instance for YAML serialization."""
-        return "%s(name=%r, description=%r, weight=%r, grade_raw=%r)" % (
+        return "%s(name=%r, description=%r, weight=%r, grade_raw=%r, skipped=%r)" % (
             self.__class__.__name__,
             self.name,
             self.description,
             self.weight,
             self.grade_raw,
+            self.skipped,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for saving it."""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": self.parameters,
+            "weight": self.weight,
+            "grade_raw": self.grade_raw,
+            "skipped": self.skipped,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Assessment":
+        """Create an instance from plain data."""
+        return cls(
+            str(data["name"]),
+            str(data["description"]),
+            dict(data["parameters"] or {}),
+            data["weight"],
+            data["grade_raw"],
+            data.get("skipped"),
         )
 
     @property
@@ -106,6 +189,11 @@ class Assessment:
         """Final grade for this assessment."""
         return self.grade_raw * self.weight
 
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Plugin and parameters identifying this assessment across rule changes."""
+        return assessment_key(self.name, self.parameters)
+
 
 class AssessedRepo:
     """An assessed student repository."""
@@ -129,6 +217,29 @@ class AssessedRepo:
             self.inter_assessments,
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for saving it."""
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "local_path": self.local_path,
+            "assessments": [a.to_dict() for a in self.assessments],
+            "inter_assessments": [a.to_dict() for a in self.inter_assessments],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AssessedRepo":
+        """Create an instance from plain data."""
+        assessed_repo: AssessedRepo = cls(str(data["name"]), data["weight"])
+        assessed_repo.local_path = data["local_path"]
+        assessed_repo.assessments = [
+            Assessment.from_dict(a) for a in data["assessments"]
+        ]
+        assessed_repo.inter_assessments = [
+            Assessment.from_dict(a) for a in data["inter_assessments"]
+        ]
+        return assessed_repo
+
     def add_assessment(self, assessment: Assessment) -> None:
         """Add an assessment to this repository."""
         self.assessments.append(assessment)
@@ -137,6 +248,10 @@ class AssessedRepo:
         """Add an inter-repository assessment to this repository."""
         self.inter_assessments.append(assessment)
 
+    def clear_inter_assessments(self) -> None:
+        """Remove all inter-repository assessments from this repository."""
+        self.inter_assessments.clear()
+
     def is_empty(self) -> bool:
         """Does this repository have any assessments?"""
         return len(self.assessments) + len(self.inter_assessments) == 0
@@ -156,7 +271,17 @@ class AssessedRepo:
     @property
     def assessment_count(self) -> int:
         """Number of assessment performed in this repository."""
-        return len(self.assessments) + len(self.inter_assessments)
+        return len(self.assessments) + len(self.inter_assessments) - self.skipped_count
+
+    @property
+    def skipped_assessments(self) -> List[Assessment]:
+        """Assessments skipped in this repository."""
+        return [a for a in self.assessments if a.skipped is not None]
+
+    @property
+    def skipped_count(self) -> int:
+        """Number of assessments skipped in this repository."""
+        return len(self.skipped_assessments)
 
 
 class AssessedStudent:
@@ -176,6 +301,22 @@ class AssessedStudent:
             self.assessed_repos,
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert this instance to plain data, for saving it."""
+        return {
+            "sid": self.sid,
+            "assessed_repos": [r.to_dict() for r in self.assessed_repos],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AssessedStudent":
+        """Create an instance from plain data."""
+        assessed_student: AssessedStudent = cls(str(data["sid"]))
+        assessed_student.assessed_repos = [
+            AssessedRepo.from_dict(r) for r in data["assessed_repos"]
+        ]
+        return assessed_student
+
     def add_assessed_repo(self, assessed_repo: AssessedRepo) -> None:
         """Add an assessed repository to this student."""
         self.assessed_repos.append(assessed_repo)
@@ -189,3 +330,8 @@ class AssessedStudent:
     def assessment_count(self) -> int:
         """Number of assessments performed for this student."""
         return sum([r.assessment_count for r in self.assessed_repos])
+
+    @property
+    def skipped_count(self) -> int:
+        """Number of assessments skipped for this student."""
+        return sum([r.skipped_count for r in self.assessed_repos])
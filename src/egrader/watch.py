@@ -0,0 +1,180 @@
+"""Watch mode: keep rules and plugins in memory and re-grade updated repositories."""
+
+from argparse import Namespace
+from datetime import datetime
+from pathlib import Path
+from time import sleep
+from typing import Dict, List, MutableSet, Sequence
+
+from .assess import assess_inter_repos, assess_student
+from .cache import build_cache, feature_cache
+from .cli_lib import check_empty_args
+from .fetch import FetchScheduler, load_students_git, load_urls, save_students_git
+from .files import LOCK_EXCLUSIVE, assessment_lock
+from .git import git_head
+from .paths import (
+    check_required_fp_exists,
+    get_assessed_students_fp,
+    get_builds_cache_fp,
+    get_features_cache_fp,
+    get_student_repo_fp,
+    get_valid_students_git_fp,
+)
+from .results import save_assessed_students
+from .rules import RulesPlan, load_rules
+from .types import AssessedStudent, StudentGit
+
+
+def watch(assess_fp: Path, args: Namespace, extra_args: Sequence[str]) -> None:
+    """Periodically fetch student repositories and re-grade the updated ones."""
+    # extra_args should be empty
+    check_empty_args(extra_args)
+
+    # Determine file paths for Git URLs and rules files
+    urls_fp: Path = Path(args.urls_file)
+    rules_fp: Path = Path(args.rules_file)
+
+    # Check if Git URLs and rules files exist, and if not, quit
+    check_required_fp_exists(urls_fp)
+    check_required_fp_exists(rules_fp)
+
+    # Load and validate rules only once, keeping them in memory
+    rules: RulesPlan = load_rules(rules_fp)
+
+    # Create the assessment folder if it doesn't exist yet, otherwise reuse it
+    assess_fp.mkdir(exist_ok=True)
+
+    # Determine file paths for validated URLs and assessment yaml files
+    students_git_fp: Path = get_valid_students_git_fp(assess_fp)
+    assessed_students_fp: Path = get_assessed_students_fp(assess_fp)
+
+    # Load student Git URLs, reusing previously validated URLs if available
+    students_git: List[StudentGit]
+    if students_git_fp.exists():
+        students_git = load_students_git(students_git_fp)
+    else:
+        students_git = load_urls(urls_fp)
+
+    # Current assessment of each student, kept in memory between cycles
+    assessed_by_sid: Dict[str, AssessedStudent] = {}
+
+    print(f"- Absolute assessment path: {assess_fp.absolute()}.", flush=True)
+    print(
+        f"- Watching {len(rules.repos)} repositories of {len(students_git)} "
+        f"students every {args.interval} seconds (Ctrl+C to stop).",
+        flush=True,
+    )
+
+    # Fetch repositories as the fetch command does, keeping the throttle and
+    # circuit of each host between cycles
+    scheduler = FetchScheduler(
+        args.retries,
+        args.backoff,
+        wait_time=args.wait,
+        skip_lfs=args.skip_lfs,
+        blob_limit=args.blob_limit,
+    )
+
+    cycle: int = 0
+    try:
+        while args.cycles == 0 or cycle < args.cycles:
+            # Wait before polling again, except on the first cycle
+            if cycle > 0:
+                sleep(args.interval)
+            cycle += 1
+
+            with assessment_lock(assess_fp, LOCK_EXCLUSIVE):
+                n_reassessed: int = _watch_cycle(
+                    assess_fp,
+                    rules,
+                    students_git,
+                    assessed_by_sid,
+                    scheduler,
+                    args.build_cache_size,
+                )
+
+            if n_reassessed > 0:
+                print(
+                    f"- [{datetime.now().ctime()}] Cycle {cycle}: reassessed "
+                    f"{n_reassessed} students, updated {assessed_students_fp}.",
+                    flush=True,
+                )
+
+    except KeyboardInterrupt:
+        print("- Stopped watching.", flush=True)
+
+
+def _watch_cycle(
+    assess_fp: Path,
+    rules: RulesPlan,
+    students_git: List[StudentGit],
+    assessed_by_sid: Dict[str, AssessedStudent],
+    scheduler: FetchScheduler,
+    build_cache_size: int,
+) -> int:
+    """Fetch repositories and reassess updated students, returning how many."""
+    # Fetch repositories and determine which students have updates
+    scheduler.forget_fetched()
+    updated_sids: MutableSet[str] = set()
+    for student_git in students_git:
+        if not student_git.valid_url:
+            continue
+        for repo_plan in rules.repos:
+            repo_fp: Path = get_student_repo_fp(
+                assess_fp, student_git.sid, repo_plan.name
+            )
+            head_before: str | None = git_head(repo_fp) if repo_fp.exists() else None
+
+            # Keep watching even if a single repository fails to update
+            if not scheduler.fetch(
+                assess_fp, student_git, repo_plan.name, repo_plan.needs
+            ):
+                print(
+                    f"- Postponed update of {repo_plan.name} of student "
+                    f"{student_git.sid} to the next cycle.",
+                    flush=True,
+                )
+            elif repo_plan.name in student_git.fetch_errors:
+                print(
+                    f"- Unable to update {repo_plan.name} of student "
+                    f"{student_git.sid}: {student_git.fetch_errors[repo_plan.name]}",
+                    flush=True,
+                )
+
+            if repo_fp.exists() and git_head(repo_fp) != head_before:
+                updated_sids.add(student_git.sid)
+
+    # Postponed fetches are simply attempted again in the next cycle
+    scheduler.postponed.clear()
+
+    # Students never assessed must be assessed in any case
+    to_assess: List[StudentGit] = [
+        sg
+        for sg in students_git
+        if sg.sid in updated_sids or sg.sid not in assessed_by_sid
+    ]
+
+    if len(to_assess) == 0:
+        return 0
+
+    # Repositories may have changed, so use new caches each cycle, which also
+    # keeps stored builds within their size while watching
+    with (
+        feature_cache(get_features_cache_fp(assess_fp)),
+        build_cache(get_builds_cache_fp(assess_fp), build_cache_size),
+    ):
+        # Reassess only the affected students
+        for student_git in to_assess:
+            assessed_by_sid[student_git.sid] = assess_student(student_git, rules)
+
+        # Inter-repository assessments depend on every student, redo them
+        assessed_students: List[AssessedStudent] = [
+            assessed_by_sid[sg.sid] for sg in students_git
+        ]
+        assess_inter_repos(rules, assessed_students)
+
+    # Expose current grades and repository information
+    save_students_git(get_valid_students_git_fp(assess_fp), students_git)
+    save_assessed_students(assess_fp, assessed_students)
+
+    return len(to_assess)
@@ -1,29 +1,126 @@
 """YAML handling functionality."""
 
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Dict, Iterator, List, Tuple, TypeVar
 
 import yaml
 
+from .files import atomic_writer
 
-def load_yaml(yaml_fp: Path, safe: bool = True) -> Any:
-    """Load a yaml file."""
+_T = TypeVar("_T")
+
+# Schemas are identified by a name and a version
+Schema = Tuple[str, int]
+
+
+def load_yaml(yaml_fp: Path) -> Any:
+    """Load a yaml file, constructing only plain data (no Python objects)."""
     try:
         with open(yaml_fp, "r") as yaml_file:
-            if safe:
-                yaml_obj = yaml.safe_load(yaml_file)
-            else:
-                yaml_obj = yaml.load(yaml_file, yaml.CLoader)
-    except yaml.scanner.ScannerError as se:
+            yaml_obj = yaml.load(yaml_file, yaml.CSafeLoader)
+    except yaml.constructor.ConstructorError as ce:
         raise SyntaxError(
-            f"Syntax error{se.problem_mark} {se.context}: {se.problem}"
-        ) from se
+            f"File {str(yaml_fp)!r} contains Python objects, which are not loaded "
+            "for security reasons; if it was created by an older egrader version, "
+            "please create it again"
+        ) from ce
+    except yaml.MarkedYAMLError as ye:
+        raise SyntaxError(
+            f"Syntax error{ye.problem_mark} {ye.context}: {ye.problem}"
+        ) from ye
 
     return yaml_obj
 
 
 def save_yaml(yaml_fp: Path, data: Any) -> None:
     """Save a yaml file."""
-    yaml_text = yaml.dump(data, Dumper=yaml.CDumper)
-    with open(yaml_fp, "w") as yaml_file:
+    yaml_text = yaml.dump(data, Dumper=yaml.CSafeDumper)
+    with atomic_writer(yaml_fp) as yaml_file:
         print(yaml_text, file=yaml_file)
+
+
+@contextmanager
+def yaml_list_writer(
+    yaml_fp: Path, schema: Schema
+) -> Iterator[Callable[[Dict[str, Any]], Tuple[int, int]]]:
+    """Save a list of records one at a time, as records become available.
+
+    The file is a mapping with the `schema` name and `version`, and the `items`
+    list containing the records. Records are written to a temporary file, which
+    atomically replaces the yaml file only if all records were successfully
+    written.
+    Writing a record returns its offset and length in bytes, so that it can later
+    be loaded on its own with `load_yaml_item()`.
+    """
+    n_items: int = 0
+
+    with atomic_writer(yaml_fp, "w", encoding="utf-8") as yaml_file:
+        header: str = f"schema: {schema[0]}\nversion: {schema[1]}\n"
+        yaml_file.write(header)
+        offset: int = len(header.encode("utf-8"))
+
+        def _write_item(item: Dict[str, Any]) -> Tuple[int, int]:
+            nonlocal n_items, offset
+            if n_items == 0:
+                yaml_file.write("items:\n")
+                offset += len("items:\n")
+            item_text: str = yaml.dump([item], Dumper=yaml.CSafeDumper)
+            yaml_file.write(item_text)
+            yaml_file.flush()
+            n_items += 1
+            item_offset, item_length = offset, len(item_text.encode("utf-8"))
+            offset += item_length
+            return item_offset, item_length
+
+        yield _write_item
+
+        # An empty list must still be a list
+        if n_items == 0:
+            yaml_file.write("items: []\n")
+
+
+def load_yaml_list(
+    yaml_fp: Path, schema: Schema, decode: Callable[[Dict[str, Any]], _T]
+) -> List[_T]:
+    """Load and decode the records saved with `yaml_list_writer()`.
+
+    Raises:
+      SyntaxError: If the file is not valid yaml, is not in the given schema,
+        was saved with a newer version of the schema, or has invalid records.
+    """
+    data: Any = load_yaml(yaml_fp)
+
+    # Check schema
+    if not isinstance(data, dict) or data.get("schema") != schema[0]:
+        raise SyntaxError(
+            f"File {str(yaml_fp)!r} is not in the {schema[0]!r} format; if it was "
+            "created by an older egrader version, please create it again"
+        )
+    if not isinstance(data.get("version"), int) or data["version"] > schema[1]:
+        raise SyntaxError(
+            f"File {str(yaml_fp)!r} was created by a newer egrader version"
+        )
+
+    # Decode records
+    return [
+        _decode_item(yaml_fp, i, item, decode)
+        for i, item in enumerate(data.get("items") or [])
+    ]
+
+
+def load_yaml_item(item_bytes: bytes, decode: Callable[[Dict[str, Any]], _T]) -> _T:
+    """Load and decode a single record saved with `yaml_list_writer()`."""
+    return decode(yaml.load(item_bytes, yaml.CSafeLoader)[0])
+
+
+def _decode_item(
+    yaml_fp: Path, idx: int, item: Any, decode: Callable[[Dict[str, Any]], _T]
+) -> _T:
+    """Decode a record, raising a syntax error if it is invalid."""
+    try:
+        return decode(item)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise SyntaxError(
+            f"Invalid record {idx} in {str(yaml_fp)!r}: {type(e).__name__} {e}"
+        ) from e
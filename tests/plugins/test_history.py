@@ -0,0 +1,89 @@
+"""Tests for commit history analytics plug-ins."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from egrader.cache import feature_cache
+from egrader.plugins.history import (
+    assess_author_diversity,
+    assess_commit_cadence,
+    assess_last_minute,
+    assess_lines_per_commit,
+    load_commit_table,
+)
+from egrader.types import StudentGit
+
+
+@pytest.fixture()
+def history_repo(git_repo, make_commit, monkeypatch):
+    """Repository with commits on three days by two authors, the last one large."""
+    start = datetime(2023, 3, 1, 12, 0, 0)
+    make_commit(git_repo, start, contents="one\n")
+    make_commit(git_repo, start + timedelta(days=1), contents="two\n")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "Other@Example.com")
+    make_commit(git_repo, start + timedelta(days=5), contents="x\n" * 98)
+    return git_repo
+
+
+def test_load_commit_table(history_repo, tmp_path):
+    """Test that the history is loaded into columns, newest commit first."""
+    # Once computed and stored in the cache, and once loaded from it
+    with feature_cache(tmp_path / "cache") as cache:
+        tables = [load_commit_table(str(history_repo)) for _ in range(2)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    for table in tables:
+        assert table.commit_count == 3
+        assert list(table.insertions) == [98, 1, 1]
+        assert list(table.deletions) == [0, 0, 0]
+        assert table.author_emails[0] == "other@example.com"
+        assert list(table.authors) == [0, 1, 1]
+        assert list(table.local_days[:-1] - table.local_days[1:]) == [4, 1]
+
+
+@pytest.mark.parametrize(
+    ("params", "expected"),
+    [
+        ({"min_days": 2}, 1),
+        ({"min_days": 6}, 0.5),
+        ({"min_days": 2, "max_gap_days": 2}, 0),
+        ({"min_days": 2, "max_gap_days": 3}, 1),
+    ],
+)
+def test_assess_commit_cadence(history_repo, params, expected):
+    """Test that the number of days with commits and the gaps are graded."""
+    stdgit = StudentGit("", "", "")
+
+    assert assess_commit_cadence(stdgit, str(history_repo), **params) == expected
+
+
+def test_assess_last_minute(history_repo):
+    """Test that work done right before the deadline is penalized."""
+    stdgit = StudentGit("", "", "")
+    deadline = "2023-03-06 18:00:00"
+
+    assert assess_last_minute(stdgit, str(history_repo), deadline) == pytest.approx(
+        0.04
+    )
+    assert assess_last_minute(stdgit, str(history_repo), deadline, by_lines=False) == (
+        1
+    )
+    assert (
+        assess_last_minute(stdgit, str(history_repo), "2023-03-02 18:00", hours=48) == 0
+    )
+
+
+def test_assess_lines_and_authors(history_repo):
+    """Test the lines per commit and author diversity metrics."""
+    stdgit = StudentGit("", "", "")
+
+    assert assess_lines_per_commit(stdgit, str(history_repo), max_lines=50) == (
+        pytest.approx(2 / 3)
+    )
+    assert assess_author_diversity(stdgit, str(history_repo)) == 1
+    assert assess_author_diversity(stdgit, str(history_repo), min_share=0.5) == 0.5
+    assert (
+        assess_author_diversity(stdgit, str(history_repo), min_share=0.5, by_lines=True)
+        == 0.5
+    )
@@ -0,0 +1,27 @@
+"""Tests for inter-repository plugins."""
+
+import pytest
+
+from egrader.git import git_at
+from egrader.plugins.inter_repo import assess_more_commits_bonus
+
+
+@pytest.mark.parametrize(
+    ("bonuses", "expected"),
+    [([1, 0.5], [0.5, 1, 0]), ([1, 0.5, 0.25, 0.1], [0.5, 1, 0.25])],
+)
+def test_inter_repo_more_commits_bonus_reduce(bonuses, expected):
+    """Test that bonuses are given to the repositories with more commits."""
+    assert assess_more_commits_bonus.reduce([3, 5, 1], bonuses) == expected
+
+
+def test_inter_repo_more_commits_bonus_repos(tmp_path, git_repo, make_commit):
+    """Test that the plugin can still be invoked directly with repositories."""
+    other_repo = tmp_path / "other"
+    other_repo.mkdir()
+    git_at(other_repo, "init")
+    make_commit(git_repo)
+    for _ in range(2):
+        make_commit(other_repo)
+
+    assert assess_more_commits_bonus([git_repo, other_repo], [1, 0.5]) == [0.5, 1]
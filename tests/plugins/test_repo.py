@@ -1,16 +1,27 @@
 """Tests for repository plug-ins."""
 
+import shlex
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, Dict, List
 
 import numpy as np
 import pytest
 
+from egrader.cache import build_cache
+from egrader.git import git, git_at
+from egrader.plugins.helpers import run_streaming
 from egrader.plugins.repo import (
+    assess_build,
     assess_commit_date_interval,
     assess_files_exist,
+    assess_files_match,
+    assess_io_cases,
     assess_min_commits,
+    assess_run_command,
 )
+from egrader.rules import RulesError, compile_rules
 from egrader.types import StudentGit
 
 
@@ -161,3 +172,256 @@ def test_repo_assess_files_exist_ok(tmp_path, file_list, strict, percent):
             grade,
             num_files_to_create / len(file_list),
         )
+
+
+@pytest.mark.parametrize(
+    ("command", "params", "expected"),
+    [
+        ("python -c 'exit(3)'", {"expect_exit_code": 3}, 1),
+        ("python -c 'exit(3)'", {}, 0),
+        ("this-command-does-not-exist", {}, 0),
+        ("python -c 'import time; time.sleep(10)'", {"timeout": 0.5}, 0),
+        (
+            "python -c 'import sys; print(input()); sys.stderr.write(\"err\")'",
+            {"input_stream": "line one\nline two", "expect_output": "one\nerr"},
+            1,
+        ),
+        (
+            "python -c 'print(input())'",
+            {"input_stream": "abc", "expect_output": "xyz"},
+            0,
+        ),
+        (
+            'python -c \'print("a=1"); print("b=22")\'',
+            {"expect_regex": r"^b=\d{2}$"},
+            1,
+        ),
+    ],
+)
+def test_repo_assess_run_command(tmp_path, command, params, expected):
+    """Test that commands are run and their exit code and output checked."""
+    stdgit = StudentGit("", "", "")
+
+    assert assess_run_command(stdgit, str(tmp_path), command, **params) == expected
+
+
+def test_repo_assess_run_command_endless_output(tmp_path):
+    """Test that commands printing without end are bounded in time and memory."""
+    stdgit = StudentGit("", "", "")
+    command = 'python -c \'print("start")\nwhile True: print("x" * 1000)\''
+    start = time.monotonic()
+
+    # Expected output found early, exit code irrelevant, command stopped early
+    grade = assess_run_command(
+        stdgit,
+        str(tmp_path),
+        command,
+        expect_exit_code=None,
+        expect_output="start",
+        timeout=30,
+    )
+    assert grade == 1
+    assert time.monotonic() - start < 10
+
+    # Output never matches, command stops at timeout with retained output capped
+    outcome = run_streaming(
+        shlex.split(command),
+        tmp_path,
+        timeout=1,
+        expect_output="never",
+        max_output=5000,
+    )
+    assert outcome.timed_out
+    assert not outcome.output_matched
+    assert outcome.output_truncated
+    assert len(outcome.output) == 5000
+
+
+def test_run_streaming_split_output(tmp_path):
+    """Test that expected output is matched when written in several small reads."""
+    command = (
+        "python -c 'import sys, time\n"
+        'for c in "abcdefg":\n'
+        "    sys.stdout.write(c); sys.stdout.flush(); time.sleep(0.05)'"
+    )
+    outcome = run_streaming(
+        shlex.split(command), tmp_path, timeout=10, expect_output="abcdefg"
+    )
+    assert outcome.output == "abcdefg"
+    assert outcome.output_matched
+
+
+@pytest.mark.parametrize(
+    ("params", "expected"),
+    [
+        ({}, 0.5),
+        ({"contains": True}, 0.25),
+        ({"read_only": True, "jobs": 4}, 0.5),
+        ({"stop_at_first_failure": True}, 0),
+    ],
+)
+def test_repo_assess_io_cases(tmp_path, params, expected):
+    """Test that input/output cases from a table and a folder are graded."""
+    stdgit = StudentGit("", "", "")
+    cases_fp = tmp_path / "cases"
+    cases_fp.mkdir()
+    (cases_fp / "1.in").write_text("4")
+    (cases_fp / "1.out").write_text("16  \n")
+    (cases_fp / "2.in").write_text("5")
+    (cases_fp / "2.out").write_text("24")
+    cases: List[Dict[str, Any]] = [
+        {"input": "2", "output": "5"},
+        {"input": 3, "output": 9},
+    ]
+
+    grade = assess_io_cases(
+        stdgit,
+        str(tmp_path),
+        "python -c 'x = int(input()); print(x * x)'",
+        cases=cases,
+        cases_dir=str(cases_fp),
+        **params,
+    )
+
+    assert grade == expected
+
+
+def test_repo_assess_io_cases_not_executable(tmp_path):
+    """Test that cases whose command can't be run fail, without raising."""
+    stdgit = StudentGit("", "", "")
+    (tmp_path / "prog").write_text("#!/bin/sh\necho 1\n")
+    (tmp_path / "prog").chmod(0o644)
+
+    assert assess_io_cases(stdgit, str(tmp_path), "./prog", [{"output": "1"}]) == 0
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"cases": [{"input": "1"}]},
+        {"cases": [{"output": "1", "expected": "1"}]},
+        {"cases": {"output": "1"}},
+        {"cases_dir": "/nonexistent/cases"},
+    ],
+)
+def test_repo_assess_io_cases_invalid(params):
+    """Test that invalid cases are rejected when the rules are compiled."""
+    rules = [
+        {
+            "repo": "r",
+            "weight": 1,
+            "assessments": [
+                {
+                    "name": "io_cases",
+                    "weight": 1,
+                    "params": {"command": "true", **params},
+                }
+            ],
+        }
+    ]
+
+    with pytest.raises(RulesError):
+        compile_rules(rules)
+
+
+def test_repo_assess_build(tmp_path, git_repo, make_commit):
+    """Test that identical sources are built once, and failed builds graded 0."""
+    stdgit = StudentGit("", "", "")
+    make_commit(git_repo, filepath="main.txt", contents="source")
+    clone_fp = tmp_path / "clone"
+    git("clone", git_repo, clone_fp)
+    builds_fp = tmp_path / "builds.txt"
+    command = (
+        'python -c \'import shutil; shutil.copy("main.txt", "main.bin"); '
+        f'open("{builds_fp}", "a").write("x")\''
+    )
+
+    with build_cache(tmp_path / "cache"):
+        for repo_fp in (git_repo, clone_fp, clone_fp):
+            assert assess_build(stdgit, str(repo_fp), command, ["*.bin"]) == 1
+            assert (repo_fp / "main.bin").read_text() == "source"
+        assert assess_build(stdgit, str(git_repo), command, ["*.exe"]) == 0
+        assert assess_build(stdgit, str(git_repo), "python -c 'exit(1)'", []) == 0
+
+    # Only the first build and the one with other outputs were actually run
+    assert builds_fp.read_text() == "xx"
+
+    # Cached outputs are placed with their mode, even if removed from the repository
+    (clone_fp / "main.bin").unlink()
+    command = (
+        "python -c 'import os, shutil; "
+        'shutil.copy("main.txt", "main.bin"); os.chmod("main.bin", 0o755)\''
+    )
+    with build_cache(tmp_path / "cache"):
+        assert assess_build(stdgit, str(git_repo), command, ["*.bin"]) == 1
+        assert assess_build(stdgit, str(clone_fp), command, ["*.bin"]) == 1
+    assert (clone_fp / "main.bin").read_text() == "source"
+    assert (clone_fp / "main.bin").stat().st_mode & 0o777 == 0o755
+
+
+def test_repo_assess_build_not_executable(tmp_path, git_repo):
+    """Test that builds whose command can't be run are graded 0, without raising."""
+    stdgit = StudentGit("", "", "")
+    (tmp_path / "build.sh").write_text("#!/bin/sh\n")
+    (tmp_path / "build.sh").chmod(0o644)
+
+    with build_cache(tmp_path / "cache"):
+        assert assess_build(stdgit, str(git_repo), str(tmp_path / "build.sh"), []) == 0
+
+
+@pytest.mark.parametrize(
+    ("params", "expected"),
+    [
+        ({"include": ["*.sln", "README.md", "src/**/*.c"]}, 1),
+        ({"include": ["*.sln", "*.exe", "/main.c"]}, 1 / 3),
+        ({"exclude": ["bin/", "obj/", "*.dll"]}, 1 / 3),
+        ({"exclude": ["src/main.c", "App.s[!l]n", "lib/"]}, 2 / 3),
+        ({"include": ["*.sln"], "exclude": ["bin/"], "strict": True}, 0),
+        ({"max_size": "1k", "max_total_size": 2000}, 0.5),
+        ({"max_size": 1500, "max_total_size": "2k"}, 1),
+        ({}, 1),
+    ],
+)
+def test_repo_assess_files_match(git_repo, params, expected):
+    """Test that glob patterns and size limits are checked on committed files."""
+    stdgit = StudentGit("", "", "")
+    for path, size in (
+        ("README.md", 10),
+        ("App.sln", 10),
+        ("src/lib/main.c", 10),
+        ("bin/Debug/App.dll", 1200),
+    ):
+        (git_repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (git_repo / path).write_text("x" * size)
+    (git_repo / "obj").mkdir()
+    (git_repo / "obj" / "untracked.o").write_text("x")
+    git_at(git_repo, "add", "README.md", "App.sln", "src", "bin")
+    git_at(git_repo, "commit", "-m", "Files")
+
+    assert assess_files_match(stdgit, str(git_repo), **params) == pytest.approx(
+        expected
+    )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"include": "*.sln"},
+        {"exclude": ["bin/", 3]},
+        {"max_size": "10mb"},
+        {"max_total_size": "1.5m"},
+    ],
+)
+def test_repo_assess_files_match_invalid(params):
+    """Test that invalid patterns and sizes are rejected when rules are compiled."""
+    rules = [
+        {
+            "repo": "r",
+            "weight": 1,
+            "assessments": [{"name": "files_match", "weight": 1, "params": params}],
+        }
+    ]
+
+    with pytest.raises(RulesError):
+        compile_rules(rules)
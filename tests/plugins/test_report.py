@@ -0,0 +1,55 @@
+"""Tests for reporting plugins."""
+
+import pytest
+
+from egrader.plugins.report import report_markdown, report_template
+from egrader.types import AssessedRepo, AssessedStudent, Assessment
+
+
+def _student(sid, grade):
+    """Create an assessed student with a single assessment."""
+    assessed_repo = AssessedRepo("r", 1)
+    assessed_repo.local_path = "/nonexistent"
+    assessed_repo.add_assessment(Assessment("a", "An assessment", {}, 1, grade))
+    assessed_student = AssessedStudent(sid)
+    assessed_student.add_assessed_repo(assessed_repo)
+    return assessed_student
+
+
+def test_report_markdown_files(tmp_path):
+    """Test that only reports whose contents changed are rewritten."""
+    students = [_student(f"s{i}", 1) for i in range(5)]
+
+    output = report_markdown(tmp_path, students, ["-f"])
+    assert output.count(" saved at ") == 5
+    assert "- Grade: 1.000" in (tmp_path / "reports_md" / "s3.md").read_text()
+
+    students[3] = _student("s3", 0.5)
+    output = report_markdown(tmp_path, students, ["-f"])
+    assert output.count(" saved at ") == 1
+    assert output.count(" unchanged at ") == 4
+    assert "- Grade: 0.500" in (tmp_path / "reports_md" / "s3.md").read_text()
+
+
+def test_report_markdown_single(tmp_path):
+    """Test that a single report contains the header and every student."""
+    output = report_markdown(tmp_path, [_student("s1", 1), _student("s2", 0)], [])
+
+    assert output.startswith("# Assessment report\n")
+    assert output.count("## Student ") == 2
+
+
+def test_report_template(tmp_path):
+    """Test that reports are rendered from templates, to a string or a file."""
+    pytest.importorskip("jinja2")
+    template_fp = tmp_path / "report.txt.j2"
+    template_fp.write_text(
+        "{% for s in students %}\n{{ s.sid }}={{ s.grade }}\n{% endfor %}\n"
+    )
+    students = [_student("s1", 1), _student("s2", 0.5)]
+
+    assert report_template(tmp_path, students, [str(template_fp)]) == "s1=1\ns2=0.5\n"
+
+    output_fp = tmp_path / "report.txt"
+    report_template(tmp_path, students, [str(template_fp), str(output_fp)])
+    assert output_fp.read_text() == "s1=1\ns2=0.5\n"
@@ -0,0 +1,213 @@
+"""Tests for assessment functions."""
+
+from typing import Any, Dict, List
+
+import pytest
+
+from egrader.assess import assess_inter_repos, assess_student
+from egrader.plugin import (
+    COST_CHEAP,
+    COST_EXPENSIVE,
+    COST_FREE,
+    map_reduce_plugin,
+    plugin_capabilities,
+)
+from egrader.rules import (
+    AssessmentPlan,
+    RepoPlan,
+    RulesError,
+    RulesPlan,
+    get_assessment_exec_order,
+)
+from egrader.types import AssessedRepo, AssessedStudent, Assessment, StudentGit
+
+
+@plugin_capabilities(COST_FREE, set(), parallel_safe=True)
+def _free(student, repo_path, grade=1):
+    """A free plug-in."""
+    return grade
+
+
+@plugin_capabilities(COST_CHEAP, set(), parallel_safe=True)
+def _cheap(student, repo_path, grade=1):
+    """A cheap plug-in."""
+    return grade
+
+
+@plugin_capabilities(COST_EXPENSIVE, set(), parallel_safe=True)
+def _expensive(student, repo_path, grade=1):
+    """An expensive plug-in."""
+    return grade
+
+
+_FUNCTIONS = {"free": _free, "cheap": _cheap, "expensive": _expensive}
+
+
+def _plan(assess_rules: List[Dict[str, Any]]) -> List[AssessmentPlan]:
+    """Create assessment plans using the test plug-ins."""
+    return [
+        AssessmentPlan(
+            ar["name"],
+            _FUNCTIONS[ar["name"]],
+            ar.get("params", {}),
+            ar.get("weight", 1),
+            ar.get("id"),
+            [ar["requires"]] if isinstance(ar.get("requires"), str) else [],
+            ar.get("stop_on_fail", False),
+        )
+        for ar in assess_rules
+    ]
+
+
+def _assess(assess_rules, repo_weight=1):
+    """Assess a student with a single repository and return that repository."""
+    student_git = StudentGit("s1", "s1@example.com", "")
+    student_git.add_repo("r", "/nonexistent")
+    rules = RulesPlan([RepoPlan("r", repo_weight, _plan(assess_rules), [])])
+    return assess_student(student_git, rules).assessed_repos[0]
+
+
+def test_exec_order_cheapest_first():
+    """Test that cheaper assessments are performed first."""
+    assess_rules = [{"name": "expensive"}, {"name": "cheap"}, {"name": "free"}]
+
+    assert get_assessment_exec_order(_plan(assess_rules)) == [2, 1, 0]
+
+
+def test_exec_order_requirements_and_stops():
+    """Test that requirements and stop on fail assessments are respected."""
+    assess_rules: List[Dict[str, Any]] = [
+        {"name": "cheap"},
+        {"name": "expensive", "id": "build", "stop_on_fail": True},
+        {"name": "free"},
+        {"name": "cheap", "requires": "x"},
+        {"name": "free", "id": "x"},
+    ]
+
+    assert get_assessment_exec_order(_plan(assess_rules)) == [0, 1, 2, 4, 3]
+
+
+@pytest.mark.parametrize(
+    "assess_rules",
+    [
+        [{"name": "free", "requires": "nope"}],
+        [{"name": "free", "id": "a"}, {"name": "free", "id": "a"}],
+        [
+            {"name": "free", "id": "a", "requires": "b"},
+            {"name": "free", "id": "b", "requires": "a"},
+        ],
+        [
+            {"name": "free", "id": "a", "stop_on_fail": True, "requires": "b"},
+            {"name": "free", "id": "b"},
+        ],
+    ],
+)
+def test_exec_order_invalid(assess_rules):
+    """Test that unknown, duplicate and circular requirements are detected."""
+    with pytest.raises(RulesError):
+        get_assessment_exec_order(_plan(assess_rules))
+
+
+def test_skip_zero_weights():
+    """Test that zero weight assessments and repositories are skipped."""
+    repo = _assess([{"name": "free", "weight": 0}, {"name": "cheap", "weight": 1}])
+    assert [a.skipped is not None for a in repo.assessments] == [True, False]
+    assert repo.assessment_count == 1
+    assert repo.skipped_count == 1
+
+    repo = _assess([{"name": "free", "weight": 1}], repo_weight=0)
+    assert repo.skipped_count == 1
+    assert repo.assessment_count == 0
+
+
+def test_skip_stop_on_fail():
+    """Test that failed gating assessments skip the following ones."""
+    repo = _assess(
+        [
+            {"name": "expensive", "weight": 1},
+            {
+                "name": "cheap",
+                "weight": 0,
+                "stop_on_fail": True,
+                "params": {"grade": 0},
+            },
+            {"name": "expensive", "weight": 1},
+            {"name": "free", "weight": 1},
+        ]
+    )
+
+    assert [a.skipped is None for a in repo.assessments] == [True, True, False, False]
+    assert repo.grade_raw == 1
+
+
+def test_skip_requires():
+    """Test that assessments whose requirements did not pass are skipped."""
+    repo = _assess(
+        [
+            {"name": "free", "id": "ok", "weight": 0},
+            {"name": "free", "id": "ko", "weight": 0, "params": {"grade": 0}},
+            {"name": "expensive", "weight": 0.5, "requires": "ok"},
+            {"name": "expensive", "weight": 0.5, "requires": "ko"},
+        ]
+    )
+
+    assert [a.skipped is None for a in repo.assessments] == [True, True, True, False]
+    assert repo.grade_raw == 0.5
+
+
+def test_reuse_previous_grades():
+    """Test that only assessments not performed before are performed again."""
+    previous_repo = AssessedRepo("r", 1)
+    previous_repo.add_assessment(Assessment("cheap", "", {"grade": 1}, 2, 0.25))
+    previous_repo.add_assessment(
+        Assessment("free", "", {}, 0, 0, "Assessment has zero weight")
+    )
+    previous = AssessedStudent("s1")
+    previous.add_assessed_repo(previous_repo)
+
+    student_git = StudentGit("s1", "s1@example.com", "")
+    student_git.add_repo("r", "/nonexistent")
+    assess_rules: List[Dict[str, Any]] = [
+        {"name": "cheap", "params": {"grade": 1}},
+        {"name": "free"},
+        {"name": "expensive", "params": {"grade": 0.5}},
+    ]
+    rules = RulesPlan([RepoPlan("r", 1, _plan(assess_rules), [])])
+    assessed_repo = assess_student(student_git, rules, None, previous).assessed_repos[0]
+
+    assert [a.grade_raw for a in assessed_repo.assessments] == [0.25, 1, 0.5]
+
+
+def test_inter_repos_map_reduce():
+    """Test that map/reduce features are extracted once per repository."""
+    extracted: List[str] = []
+
+    def _extract(repo_path):
+        extracted.append(repo_path)
+        return len(repo_path)
+
+    @plugin_capabilities(COST_CHEAP, set(), parallel_safe=True)
+    @map_reduce_plugin(_extract)
+    def _longest(lengths, bonus):
+        """Give a bonus to the longest repository path."""
+        return [bonus if length == max(lengths) else 0 for length in lengths]
+
+    inter_plans = [
+        AssessmentPlan("longest", _longest, {"bonus": bonus}, 1) for bonus in (1, 2)
+    ]
+    rules = RulesPlan([RepoPlan("r", 1, [], inter_plans)])
+    assessed_students = []
+    for sid, path in (("s1", "/a"), ("s2", "/bbb"), ("s3", None)):
+        assessed_repo = AssessedRepo("r", 1)
+        assessed_repo.local_path = path
+        assessed_student = AssessedStudent(sid)
+        assessed_student.add_assessed_repo(assessed_repo)
+        assessed_students.append(assessed_student)
+
+    assess_inter_repos(rules, assessed_students, jobs=2)
+
+    assert sorted(extracted) == ["/a", "/bbb"]
+    assert [
+        [a.grade_raw for a in s.assessed_repos[0].inter_assessments]
+        for s in assessed_students
+    ] == [[0, 0], [1, 2], []]
@@ -0,0 +1,105 @@
+"""Tests for the batch command."""
+
+from argparse import Namespace
+
+import pytest
+
+import egrader.fetch
+from egrader.batch import batch, load_batch_manifest
+from egrader.git import git, git_at, git_head
+from egrader.paths import get_student_repo_fp
+from egrader.results import load_assessed_students
+
+_RULES = """\
+- repo: repo
+  weight: 1
+  assessments:
+  - name: repo_exists
+    weight: 1
+"""
+
+
+@pytest.fixture()
+def manifest(tmp_path, monkeypatch):
+    """Create a manifest with two assessments of the same student repository."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    # Student repository with a single commit
+    origin_fp = tmp_path / "accounts" / "s1" / "repo"
+    git("init", origin_fp)
+    (origin_fp / "file.txt").write_text("Contents")
+    git_at(origin_fp, "add", "file.txt")
+    git_at(origin_fp, "commit", "-m", "Commit")
+
+    (tmp_path / "urls.tsv").write_text(
+        f"s1 s1@example.com {tmp_path / 'accounts' / 's1'}\n"
+    )
+    (tmp_path / "rules.yml").write_text(_RULES)
+
+    manifest_fp = tmp_path / "batch.yml"
+    manifest_fp.write_text(
+        "- {urls: urls.tsv, rules: rules.yml, folder: first}\n"
+        "- {urls: urls.tsv, rules: rules.yml, folder: second}\n"
+    )
+    return manifest_fp
+
+
+def test_batch(manifest, monkeypatch):
+    """Test that each assessment is performed, fetching the repository once."""
+    fetched = []
+    fetch_repo = egrader.fetch.fetch_repo
+
+    def counting_fetch_repo(assess_fp, *args, **kwargs):
+        fetched.append(assess_fp.name)
+        return fetch_repo(assess_fp, *args, **kwargs)
+
+    monkeypatch.setattr(egrader.fetch, "fetch_repo", counting_fetch_repo)
+    args = Namespace(
+        manifest=str(manifest),
+        existing="stop",
+        wait=0,
+        retries=0,
+        backoff=0,
+        skip_lfs=False,
+        blob_limit=None,
+        jobs=2,
+        build_cache_size=1024**3,
+    )
+    origin_fp = manifest.parent / "accounts" / "s1" / "repo"
+
+    batch(None, args, [])
+
+    for folder in ("first", "second"):
+        assess_fp = manifest.parent / folder
+        repo_fp = get_student_repo_fp(assess_fp, "s1", "repo")
+        assert git_head(repo_fp) == git_head(origin_fp)
+        assert str(git_at(repo_fp, "remote", "get-url", "origin")).strip() == str(
+            origin_fp
+        )
+        assessed_students = load_assessed_students(assess_fp)
+        assert len(assessed_students) == 1
+        assert assessed_students[0].grade == 1
+
+    # The second assessment copied the repository fetched by the first one
+    assert fetched == ["first"]
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "{urls: urls.tsv}",
+        "[]",
+        "- {urls: urls.tsv, rules: rules.yml, folder: out}\n"
+        "- {urls: urls.tsv, rules: rules.yml, folder: ./out}\n",
+    ],
+)
+def test_load_batch_manifest_invalid(tmp_path, contents):
+    """Test that invalid manifests are rejected."""
+    manifest_fp = tmp_path / "batch.yml"
+    manifest_fp.write_text(contents)
+
+    with pytest.raises(SyntaxError):
+        load_batch_manifest(manifest_fp)
@@ -0,0 +1,129 @@
+"""Tests for exporting and importing assessments as Git bundles."""
+
+from argparse import Namespace
+
+import pytest
+
+from egrader.bundle import export_bundles, import_bundles
+from egrader.fetch import load_students_git, save_students_git
+from egrader.git import git, git_at, git_head
+from egrader.paths import get_student_repo_fp, get_valid_students_git_fp
+from egrader.types import StudentGit
+
+
+@pytest.fixture()
+def assessment(tmp_path, monkeypatch):
+    """Create an assessment folder with a complete and a shallow repository."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    # Student repository with a few commits
+    accounts_fp = tmp_path / "accounts"
+    origin_fp = accounts_fp / "s1" / "repo"
+    git("init", origin_fp)
+    for i in range(3):
+        (origin_fp / "file.txt").write_text(f"Version {i}")
+        git_at(origin_fp, "add", "file.txt")
+        git_at(origin_fp, "commit", "-m", f"Commit {i}")
+
+    # Both students point to the same repository, but one is a shallow clone
+    assess_fp = tmp_path / "assess"
+    students_git = []
+    for sid, clone_args in (("s1", []), ("s2", ["--depth=1"])):
+        student_git = StudentGit(sid, f"{sid}@example.com", str(accounts_fp / "s1"))
+        repo_fp = get_student_repo_fp(assess_fp, sid, "repo")
+        git("clone", *clone_args, f"file://{origin_fp}", repo_fp)
+        student_git.add_repo("repo", str(repo_fp))
+        students_git.append(student_git)
+    save_students_git(get_valid_students_git_fp(assess_fp), students_git)
+
+    return assess_fp
+
+
+def test_export_import(tmp_path, assessment):
+    """Test that repositories are restored as they were, wherever imported."""
+    archive_fp = tmp_path / "archive"
+    imported_fp = tmp_path / "imported"
+    args = Namespace(archive=str(archive_fp), jobs=2)
+
+    export_bundles(assessment, args, [])
+    import_bundles(imported_fp, args, [])
+
+    assert (archive_fp / "bundles" / "s1" / "repo.bundle").exists()
+    assert (archive_fp / "bundles" / "s2" / "repo.tar").exists()
+
+    for student_git in load_students_git(get_valid_students_git_fp(imported_fp)):
+        repo_fp = get_student_repo_fp(imported_fp, student_git.sid, "repo")
+        assert student_git.repos["repo"] == str(repo_fp)
+        assert git_head(repo_fp) == git_head(
+            get_student_repo_fp(assessment, student_git.sid, "repo")
+        )
+        assert (repo_fp / "file.txt").read_text() == "Version 2"
+        assert (
+            str(git_at(repo_fp, "remote", "get-url", "origin")).strip().endswith("repo")
+        )
+        assert "bundle" not in str(git_at(repo_fp, "remote", "get-url", "origin"))
+
+
+def test_export_existing_archive(tmp_path, assessment):
+    """Test that an existing archive is not overwritten."""
+    archive_fp = tmp_path / "archive"
+    archive_fp.mkdir()
+
+    with pytest.raises(FileExistsError):
+        export_bundles(assessment, Namespace(archive=str(archive_fp), jobs=1), [])
+
+
+def test_import_tar_ignores_config_and_hooks(tmp_path, assessment):
+    """Test that only objects and references of archived .git folders are restored."""
+    archive_fp = tmp_path / "archive"
+    imported_fp = tmp_path / "imported"
+    args = Namespace(archive=str(archive_fp), jobs=1)
+
+    # The shallow repository, saved as a tar file, runs commands if trusted
+    pwned_fp = tmp_path / "pwned"
+    repo_fp = get_student_repo_fp(assessment, "s2", "repo")
+    git_at(repo_fp, "config", "core.fsmonitor", f"touch {pwned_fp}")
+    hook_fp = repo_fp / ".git" / "hooks" / "post-checkout"
+    hook_fp.write_text(f"#!/bin/sh\ntouch {pwned_fp}\n")
+    hook_fp.chmod(0o755)
+    export_bundles(assessment, args, [])
+    git_at(repo_fp, "config", "--unset", "core.fsmonitor")
+
+    import_bundles(imported_fp, args, [])
+
+    imported_repo_fp = get_student_repo_fp(imported_fp, "s2", "repo")
+    assert (imported_repo_fp / "file.txt").read_text() == "Version 2"
+    assert git_head(imported_repo_fp) == git_head(repo_fp)
+    assert not (imported_repo_fp / ".git" / "hooks" / "post-checkout").exists()
+    assert "fsmonitor" not in str(git_at(imported_repo_fp, "config", "--list"))
+    assert not pwned_fp.exists()
+
+    # The repository can still be updated from the student
+    git_at(imported_repo_fp, "pull")
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [
+        ("sid: s1", "sid: .."),
+        ("sid: s1", "sid: ../s1"),
+        ("repo_name: repo", "repo_name: a/../../b"),
+        ("file: bundles/s1/repo.bundle", "file: ../outside.bundle"),
+        ("file: bundles/s1/repo.bundle", "file: /tmp/outside.bundle"),
+        ("sid: s1", "sid: unknown"),
+    ],
+)
+def test_import_invalid_manifest(tmp_path, assessment, old, new):
+    """Test that paths outside the archive and unknown students are rejected."""
+    archive_fp = tmp_path / "archive"
+    args = Namespace(archive=str(archive_fp), jobs=1)
+    export_bundles(assessment, args, [])
+
+    manifest_fp = archive_fp / "bundles.yml"
+    manifest_fp.write_text(manifest_fp.read_text().replace(old, new, 1))
+
+    with pytest.raises(SyntaxError):
+        import_bundles(tmp_path / "imported", args, [])
@@ -0,0 +1,93 @@
+"""Tests for the repository feature cache."""
+
+import os
+from pathlib import Path
+from typing import Dict
+
+from egrader.cache import BuildCache, FeatureCache, cached_feature, feature_cache
+from egrader.git import git_at
+
+
+def _commit(repo_path):
+    """Make an empty commit in the specified repository."""
+    git_at(repo_path, "commit", "--allow-empty", "-m", "commit")
+
+
+def test_feature_cache(tmp_path, monkeypatch):
+    """Test that features are cached while the repository doesn't change."""
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "egrader")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "egrader@example.com")
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    git_at(repo_path, "init")
+    _commit(repo_path)
+    computed = []
+
+    def _count():
+        computed.append(1)
+        return len(computed)
+
+    # Without a cache in use, features are always computed
+    assert cached_feature(str(repo_path), "count", _count) == 1
+    assert cached_feature(str(repo_path), "count", _count) == 2
+
+    with feature_cache(tmp_path / "cache") as cache:
+        assert cached_feature(str(repo_path), "count", _count) == 3
+        assert cached_feature(str(repo_path), "count", _count) == 3
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Features are still cached in a new cache, but not once the repository changes
+    with feature_cache(tmp_path / "cache"):
+        assert cached_feature(str(repo_path), "count", _count) == 3
+    _commit(repo_path)
+    with feature_cache(tmp_path / "cache"):
+        assert cached_feature(str(repo_path), "count", _count) == 4
+
+    # Features are stored as JSON, and unreadable ones are computed again
+    feature_fps = sorted((tmp_path / "cache").glob("*.json"))
+    assert sorted(fp.read_text() for fp in feature_fps) == ["3", "4"]
+    for feature_fp in feature_fps:
+        feature_fp.write_bytes(b"\x80\x04garbage")
+    with feature_cache(tmp_path / "cache"):
+        assert cached_feature(str(repo_path), "count", _count) == 5
+    assert b"5" in [fp.read_bytes() for fp in feature_fps]
+
+
+def test_feature_cache_evict(tmp_path):
+    """Test that the least recently used features are evicted first."""
+    cache = FeatureCache(tmp_path, max_bytes=2500)
+    for i, mtime in enumerate((300, 100, 200)):
+        (tmp_path / f"{i}.json").write_bytes(bytes(1000))
+        os.utime(tmp_path / f"{i}.json", (mtime, mtime))
+
+    assert cache.evict() == 1
+    assert sorted(fp.name for fp in tmp_path.iterdir()) == ["0.json", "2.json"]
+
+
+def test_build_cache(tmp_path):
+    """Test that builds are reused, failed ones too, and old ones evicted first."""
+    repo_fp = tmp_path / "repo"
+    (repo_fp / "bin").mkdir(parents=True)
+    (repo_fp / "bin" / "app").write_bytes(bytes(1000))
+    cache = BuildCache(tmp_path / "cache", max_bytes=2500)
+    builds: Dict[str, Path] = {}
+    for key, mtime in (("a", 300), ("b", 100), ("c", 200)):
+        assert cache.get(key, repo_fp, lambda: ["bin/app"])
+        (builds[key],) = set((tmp_path / "cache").iterdir()) - set(builds.values())
+        os.utime(builds[key] / "build.json", (mtime, mtime))
+    assert not cache.get("failed", repo_fp, lambda: None)
+    assert not cache.get("failed", repo_fp, lambda: ["bin/app"])
+
+    # Cached outputs are copied back to the repository
+    (repo_fp / "bin" / "app").unlink()
+    assert cache.get("c", repo_fp, lambda: None)
+    assert (repo_fp / "bin" / "app").read_bytes() == bytes(1000)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    # The least recently used build, "b", no longer fits
+    assert cache.evict() == 1
+    assert not builds["b"].exists()
+    assert builds["a"].exists()
+    assert builds["c"].exists()
@@ -0,0 +1,48 @@
+"""Tests for comparing assessment results."""
+
+from egrader.diff import diff_assessed_students, print_student_deltas
+from egrader.types import AssessedRepo, AssessedStudent, Assessment
+
+
+def _student(sid, grades, repo_weight=10):
+    """Create an assessed student with a repository with the given grades."""
+    repo = AssessedRepo("r", repo_weight)
+    for name, grade in grades.items():
+        repo.add_assessment(Assessment(name, "", {"n": 1}, 0.5, grade))
+    student = AssessedStudent(sid)
+    student.add_assessed_repo(repo)
+    return student
+
+
+def test_diff_assessed_students(capsys):
+    """Test that changed, removed and added students and assessments are found."""
+    old = [
+        _student("a", {"x": 1, "y": 0}),
+        _student("b", {"x": 1}),
+        _student("c", {"x": 1}),
+    ]
+    new = [
+        _student("b", {"x": 1}),
+        _student("c", {"x": 0, "z": 1}),
+        _student("d", {"x": 1}),
+    ]
+
+    deltas = list(diff_assessed_students(old, new))
+
+    assert [(d.sid, d.changed) for d in deltas] == [
+        ("a", True),
+        ("b", False),
+        ("c", True),
+        ("d", True),
+    ]
+    assert deltas[2].delta == 0
+    assert [(a.label, a.old, a.new) for a in deltas[2].assessments] == [
+        ('r: x {"n": 1}', 5, 0),
+        ('r: z {"n": 1}', None, 5),
+    ]
+
+    print_student_deltas(deltas)
+    assert capsys.readouterr().out.splitlines()[-1] == (
+        "- Compared 4 students: 3 changed, of which 1 only in old results and 1 "
+        "only in new results."
+    )
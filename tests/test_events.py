@@ -0,0 +1,48 @@
+"""Tests for the structured event log."""
+
+import json
+from io import StringIO
+
+import pytest
+
+from egrader.events import EventLog, emit, event_log, timed
+
+
+def test_event_log_timed(tmp_path):
+    """Test that timed events, including failed ones, are logged and counted."""
+    stream = StringIO()
+    metrics_fp = tmp_path / "metrics.prom"
+    log = EventLog(stream, metrics_fp)
+
+    with log.timed("assessment", sid="s1") as event:
+        event["grade"] = 0.5
+    with pytest.raises(ValueError, match="oops"), log.timed("assessment", sid="s2"):
+        raise ValueError("oops")
+    log.write_metrics()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["sid"] for r in records] == ["s1", "s2"]
+    assert records[0]["ok"]
+    assert records[0]["grade"] == 0.5
+    assert not records[1]["ok"]
+    assert records[1]["error"] == "ValueError: oops"
+    assert all(r["event"] == "assessment" and r["duration"] >= 0 for r in records)
+
+    metrics = metrics_fp.read_text()
+    assert 'egrader_events_total{event="assessment"} 2' in metrics
+    assert 'egrader_event_failures_total{event="assessment"} 1' in metrics
+
+
+def test_event_log_current(tmp_path):
+    """Test that events only go to the event log while it is in use."""
+    events_fp = tmp_path / "events.jsonl"
+
+    emit("before")
+    with event_log(str(events_fp)):
+        emit("during", n=1)
+        with timed("timed"):
+            pass
+    emit("after")
+
+    events = [json.loads(line)["event"] for line in events_fp.read_text().splitlines()]
+    assert events == ["during", "timed"]
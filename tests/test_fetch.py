@@ -0,0 +1,203 @@
+"""Tests for functions which fetch code from student repositories."""
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+import egrader.fetch
+from egrader.fetch import (
+    FetchScheduler,
+    HostThrottle,
+    fetch_repo,
+    iter_fetch_repos,
+    iter_urls,
+)
+from egrader.git import git, git_at
+from egrader.plugin import NEEDS_LOG
+from egrader.plugins.helpers import fetch_large_files
+from egrader.types import StudentGit
+
+
+def test_iter_urls(tmp_path):
+    """Test that URLs are loaded in order, in batches, without repetitions."""
+    urls_fp = tmp_path / "urls.tsv"
+    lines = ["# A comment", ""] + [
+        f"s{i} s{i}@example.com https://example.com/s{i}" for i in range(10)
+    ]
+    urls_fp.write_text("\n".join(lines + lines[5:7]))
+
+    students_git = list(iter_urls(urls_fp, batch_size=3, n_threads=2))
+
+    assert [sg.sid for sg in students_git] == [f"s{i}" for i in range(10)]
+    assert all(sg.valid_url for sg in students_git)
+    assert students_git[4].repo_url("r") == "https://example.com/s4/r"
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["s1 s1@example.com https://example.com/s1", "s2 https://example.com/s2"],
+        [
+            "s1 s1@example.com https://example.com/s1",
+            "s1 s1@example.com https://example.com/other",
+        ],
+    ],
+)
+def test_iter_urls_invalid(tmp_path, lines):
+    """Test that malformed lines and conflicting students are syntax errors."""
+    urls_fp = tmp_path / "urls.tsv"
+    urls_fp.write_text("\n".join(lines))
+
+    with pytest.raises(SyntaxError, match="line 2"):
+        list(iter_urls(urls_fp))
+
+
+@pytest.fixture()
+def git_server(tmp_path, monkeypatch):
+    """Serve bare Git repositories over (dumb) HTTP, failing some requests.
+
+    Returns the server's base URL and a dictionary where the number of requests
+    which should fail with a 503 error, as a rate limited host would, is set.
+    """
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    # Throttle failing hosts only briefly
+    monkeypatch.setattr(egrader.fetch, "_THROTTLE_MIN_INTERVAL", 0.01)
+
+    # Create a repository for student s1 and publish it as a bare repository
+    work_fp = tmp_path / "work"
+    git("init", work_fp)
+    (work_fp / "file.txt").write_text("Some text")
+    git_at(work_fp, "add", "file.txt")
+    git_at(work_fp, "commit", "-m", "First commit")
+    served_fp = tmp_path / "served"
+    git("clone", "--bare", work_fp, served_fp / "s1" / "repo")
+    git_at(served_fp / "s1" / "repo", "update-server-info")
+
+    failures = {"pending": 0}
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(served_fp), **kwargs)
+
+        def do_GET(self):  # noqa: N802
+            if failures["pending"] > 0:
+                failures["pending"] -= 1
+                self.send_error(503)
+            else:
+                super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", failures
+    server.shutdown()
+    thread.join()
+
+
+def test_fetch_scheduler_retries(tmp_path, git_server):
+    """Test that transient errors are retried and missing repos aren't errors."""
+    base_url, failures = git_server
+    failures["pending"] = 2
+    assess_fp = tmp_path / "assess"
+    s1 = StudentGit("s1", "s1@example.com", f"{base_url}/s1")
+    s2 = StudentGit("s2", "s2@example.com", f"{base_url}/s2")
+    scheduler = FetchScheduler(retries=2, backoff=0)
+
+    assert scheduler.fetch(assess_fp, s1, "repo")
+    assert scheduler.fetch(assess_fp, s2, "repo")
+
+    assert "repo" in s1.repos
+    assert "repo" not in s2.repos
+    assert s1.fetch_errors == s2.fetch_errors == {}
+    assert scheduler.postponed == []
+
+
+def test_fetch_scheduler_circuit_breaker(tmp_path, git_server):
+    """Test that a failing host is postponed, and retried at the end."""
+    base_url, failures = git_server
+    failures["pending"] = 3
+    assess_fp = tmp_path / "assess"
+    students_git = [
+        StudentGit(sid, f"{sid}@example.com", f"{base_url}/s1") for sid in ("a", "b")
+    ]
+    scheduler = FetchScheduler(
+        retries=5, backoff=0, breaker_threshold=2, breaker_cooldown=0.5
+    )
+
+    fetched = list(
+        iter_fetch_repos(assess_fp, students_git, ["repo"], scheduler=scheduler)
+    )
+
+    # The first fetch opened the circuit, so both were postponed, then retried
+    assert [sg.sid for sg in fetched] == ["a", "b"]
+    assert all("repo" in sg.repos for sg in fetched)
+    assert all(sg.fetch_errors == {} for sg in fetched)
+    assert failures["pending"] == 0
+
+
+def test_host_throttle():
+    """Test that the interval between fetches adapts to the host's health."""
+    throttle = HostThrottle(burst=2)
+
+    # No limit while the host is healthy
+    assert throttle.acquire() == throttle.acquire() == throttle.acquire() == 0
+
+    # Overloaded host, so fetches are spaced out, increasingly
+    throttle.slow_down()
+    first_interval = throttle.interval
+    throttle.slow_down()
+    assert throttle.interval == 2 * first_interval > 0
+
+    # Healthy again, eventually without limit
+    for _ in range(20):
+        throttle.speed_up()
+    assert throttle.interval == 0
+
+
+def test_host_throttle_min_interval():
+    """Test that the interval never drops below the one configured."""
+    throttle = HostThrottle(0.5)
+
+    throttle.slow_down()
+    assert throttle.interval == 1
+
+    for _ in range(20):
+        throttle.speed_up()
+    assert throttle.interval == 0.5
+
+
+def test_fetch_repo_blob_limit(tmp_path, monkeypatch):
+    """Test that large blobs are left out, and downloaded only when needed."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    # Student repository with a small and a large file, which allows filtering
+    origin_fp = tmp_path / "accounts" / "s1" / "repo"
+    git("init", origin_fp)
+    git_at(origin_fp, "config", "uploadpack.allowFilter", "true")
+    (origin_fp / "small.txt").write_text("small")
+    (origin_fp / "large.bin").write_bytes(b"x" * 100_000)
+    git_at(origin_fp, "add", ".")
+    git_at(origin_fp, "commit", "-m", "Files")
+
+    # Fetch without working tree and large blobs
+    assess_fp = tmp_path / "assess"
+    student_git = StudentGit("s1", "s1@example.com", f"file://{origin_fp.parent}")
+    fetch_repo(assess_fp, student_git, "repo", {NEEDS_LOG}, blob_limit="10k")
+    repo_fp = student_git.repos["repo"]
+    missing = str(git_at(repo_fp, "rev-list", "--objects", "--missing=print", "HEAD"))
+    assert sum(line.startswith("?") for line in missing.splitlines()) == 1
+
+    # Large file downloaded on demand
+    fetch_large_files(repo_fp, ["large.bin"])
+    assert (tmp_path / repo_fp / "large.bin").stat().st_size == 100_000
@@ -0,0 +1,48 @@
+"""Tests for atomic writes and assessment folder locks."""
+
+import fcntl
+
+import pytest
+
+from egrader.files import LOCK_EXCLUSIVE, LOCK_SHARED, assessment_lock, atomic_writer
+from egrader.paths import get_lock_fp
+
+
+def test_atomic_writer(tmp_path):
+    """Test that files are only replaced if writing them succeeds."""
+    fp = tmp_path / "results.yml"
+    fp.write_text("old")
+
+    def _write_and_fail():
+        with atomic_writer(fp) as file:
+            file.write("partial")
+            raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        _write_and_fail()
+    assert fp.read_text() == "old"
+
+    with atomic_writer(fp) as file:
+        file.write("new")
+    assert fp.read_text() == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["results.yml"]
+
+
+@pytest.mark.parametrize(
+    ("held", "requested", "blocked"),
+    [
+        (LOCK_SHARED, fcntl.LOCK_SH, False),
+        (LOCK_SHARED, fcntl.LOCK_EX, True),
+        (LOCK_EXCLUSIVE, fcntl.LOCK_SH, True),
+    ],
+)
+def test_assessment_lock(tmp_path, held, requested, blocked):
+    """Test that readers share the lock, while writers have it on their own."""
+    assess_fp = tmp_path / "assess"
+
+    with assessment_lock(assess_fp, held), open(get_lock_fp(assess_fp)) as other:
+        if blocked:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, requested | fcntl.LOCK_NB)
+        else:
+            fcntl.flock(other, requested | fcntl.LOCK_NB)
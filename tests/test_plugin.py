@@ -0,0 +1,45 @@
+"""Tests for plug-in handling functionality."""
+
+import pytest
+
+from egrader.plugin import (
+    COST_CHEAP,
+    COST_EXPENSIVE,
+    NEEDS_ALL,
+    NEEDS_LOG,
+    get_plugin_capabilities,
+    plugin_capabilities,
+)
+
+
+def test_plugin_capabilities_declared():
+    """Test that declared plug-in capabilities are obtained."""
+
+    @plugin_capabilities(COST_CHEAP, {NEEDS_LOG}, parallel_safe=True)
+    def _plugin(student, repo_path):
+        return 1
+
+    caps = get_plugin_capabilities(_plugin)
+    assert caps.cost == COST_CHEAP
+    assert caps.needs == {NEEDS_LOG}
+    assert caps.parallel_safe
+
+
+def test_plugin_capabilities_undeclared():
+    """Test that plug-ins without declared capabilities are assumed the worst."""
+
+    def _plugin(student, repo_path):
+        return 1
+
+    caps = get_plugin_capabilities(_plugin)
+    assert caps.cost == COST_EXPENSIVE
+    assert caps.needs == NEEDS_ALL
+    assert not caps.parallel_safe
+
+
+def test_plugin_capabilities_invalid():
+    """Test that unknown costs and needs are rejected."""
+    with pytest.raises(ValueError, match="cost"):
+        plugin_capabilities("very_expensive")
+    with pytest.raises(ValueError, match="needs"):
+        plugin_capabilities(COST_CHEAP, {"network"})
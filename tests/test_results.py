@@ -0,0 +1,62 @@
+"""Tests for indexed storage of assessment results."""
+
+from egrader.paths import get_assessed_students_fp, get_assessed_students_index_fp
+from egrader.results import (
+    iter_assessed_students,
+    load_assessed_student,
+    load_assessed_students,
+    save_assessed_students,
+)
+from egrader.types import AssessedRepo, AssessedStudent
+
+
+def _students(n):
+    """Create assessed students with IDs of different lengths."""
+    students = []
+    for i in range(n):
+        student = AssessedStudent(f"s{i * 7 % n}" * (i % 3 + 1))
+        student.add_assessed_repo(AssessedRepo("r", i))
+        students.append(student)
+    return students
+
+
+def test_load_assessed_student(tmp_path):
+    """Test that each student is found through the index."""
+    students = _students(50)
+    save_assessed_students(tmp_path, students)
+
+    assert len(load_assessed_students(tmp_path)) == 50
+    for student in students:
+        loaded = load_assessed_student(tmp_path, student.sid)
+        assert loaded is not None
+        assert loaded.sid == student.sid
+        assert loaded.assessed_repos[0].weight == student.assessed_repos[0].weight
+    assert load_assessed_student(tmp_path, "s") is None
+    assert load_assessed_student(tmp_path, "s999999999") is None
+
+    save_assessed_students(tmp_path, [])
+    assert load_assessed_student(tmp_path, "s0") is None
+
+
+def test_load_assessed_student_stale_index(tmp_path):
+    """Test that students are still found if the index is outdated or missing."""
+    save_assessed_students(tmp_path, _students(5))
+    yaml_fp = get_assessed_students_fp(tmp_path)
+    yaml_fp.write_text(yaml_fp.read_text().replace("weight: 4", "weight: 40"))
+
+    for _ in range(2):
+        loaded = load_assessed_student(tmp_path, "s3s3")
+        assert loaded is not None
+        assert loaded.assessed_repos[0].weight == 40
+        get_assessed_students_index_fp(tmp_path).unlink(missing_ok=True)
+
+
+def test_iter_assessed_students(tmp_path):
+    """Test that students are iterated in ID order, with or without the index."""
+    students = _students(20)
+    save_assessed_students(tmp_path, students)
+    expected = sorted(s.sid for s in students)
+
+    assert [s.sid for s in iter_assessed_students(tmp_path)] == expected
+    get_assessed_students_index_fp(tmp_path).unlink()
+    assert [s.sid for s in iter_assessed_students(tmp_path)] == expected
@@ -0,0 +1,83 @@
+"""Tests for assessment rules compilation and validation."""
+
+import pytest
+
+from egrader.plugin import NEEDS_CHECKOUT, NEEDS_LOG
+from egrader.plugins.repo import assess_min_commits
+from egrader.rules import RulesError, compile_rules, load_rules
+
+_RULES_YAML = """
+- repo: a
+  weight: 1
+- repo: b
+  weight: 2.5
+  assessments:
+  - name: min_commits
+    id: commits
+    weight: 1
+    params:
+      minimum: 3
+  - name: files_exist
+    weight: 0
+    requires: commits
+    params:
+      filenames: [README.md]
+"""
+
+
+def test_load_rules(tmp_path):
+    """Test that valid rules are compiled into a plan."""
+    rules_fp = tmp_path / "rules.yml"
+    rules_fp.write_text(_RULES_YAML)
+
+    plan = load_rules(rules_fp)
+
+    assert plan.repo_names == ["a", "b"]
+    assert plan.repo_needs == {"a": set(), "b": {NEEDS_LOG, NEEDS_CHECKOUT}}
+    assert plan.repos[1].assessments[0].function is assess_min_commits
+    assert plan.repos[1].assessments[0].params == {"minimum": 3}
+    assert plan.repos[1].assessments[0].is_gate
+    assert plan.repos[1].assessments[1].requires == ["commits"]
+
+
+@pytest.mark.parametrize(
+    ("rules", "error"),
+    [
+        ([], "non-empty"),
+        ([{"repo": "a"}], "weight"),
+        ([{"repo": "a", "weight": 1, "asessments": []}], "Unknown keys"),
+        ([{"repo": "a", "weight": 1}, {"repo": "a", "weight": 1}], "unique"),
+        (
+            [{"repo": "a", "weight": 1, "assessments": [{"name": "min_commits"}]}],
+            "weight",
+        ),
+        (
+            [
+                {
+                    "repo": "a",
+                    "weight": 1,
+                    "assessments": [
+                        {"name": "min_commits", "weight": 1, "params": {"minmum": 1}}
+                    ],
+                }
+            ],
+            "Invalid parameters",
+        ),
+        (
+            [
+                {
+                    "repo": "a",
+                    "weight": 1,
+                    "assessments": [
+                        {"name": "repo_exists", "weight": 1, "requires": "x"}
+                    ],
+                }
+            ],
+            "Unknown required",
+        ),
+    ],
+)
+def test_compile_rules_invalid(rules, error):
+    """Test that invalid rules are detected before any assessment takes place."""
+    with pytest.raises(RulesError, match=error):
+        compile_rules(rules)
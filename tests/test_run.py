@@ -0,0 +1,135 @@
+"""Tests for the pipelined fetch and assessment."""
+
+import threading
+from argparse import Namespace
+
+import pytest
+
+import egrader.run
+from egrader.fetch import load_students_git
+from egrader.git import git, git_at
+from egrader.paths import get_valid_students_git_fp
+from egrader.results import load_assessed_students
+from egrader.run import run
+
+_RULES = """\
+- repo: repo
+  weight: 1
+  assessments:
+  - name: repo_exists
+    weight: 1
+"""
+
+_SIDS = ("s1", "s2", "s3", "s4", "s5")
+
+
+@pytest.fixture()
+def run_args(tmp_path, monkeypatch):
+    """Create students with a repository each, and arguments to run them."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    urls_fp = tmp_path / "urls.tsv"
+    for sid in _SIDS:
+        origin_fp = tmp_path / "accounts" / sid / "repo"
+        git("init", origin_fp)
+        git_at(origin_fp, "commit", "--allow-empty", "-m", "Commit")
+        with urls_fp.open("a") as urls_file:
+            urls_file.write(f"{sid} {sid}@example.com {origin_fp.parent}\n")
+    (tmp_path / "rules.yml").write_text(_RULES)
+
+    return Namespace(
+        urls_file=str(urls_fp),
+        rules_file=str(tmp_path / "rules.yml"),
+        existing="stop",
+        wait=0,
+        retries=0,
+        backoff=0,
+        skip_lfs=False,
+        blob_limit=None,
+        jobs=3,
+        queue_size=1,
+        build_cache_size=1024**3,
+    )
+
+
+def _pipeline_threads():
+    """Threads of pipeline stages which are still running."""
+    return [
+        thread
+        for thread in threading.enumerate()
+        if thread.name.endswith(("(_fetch_stage)", "(_assess_stage)"))
+    ]
+
+
+def _postpone_first(iter_fetch_repos):
+    """Wrap `iter_fetch_repos()` so that the first student is yielded last."""
+
+    def postponing_iter_fetch_repos(*args, **kwargs):
+        students_git = iter_fetch_repos(*args, **kwargs)
+        first = next(students_git)
+        yield from students_git
+        yield first
+
+    return postponing_iter_fetch_repos
+
+
+def test_run_order(tmp_path, run_args, monkeypatch):
+    """Test that students are saved in the order they were fetched."""
+    monkeypatch.setattr(
+        egrader.run, "iter_fetch_repos", _postpone_first(egrader.run.iter_fetch_repos)
+    )
+    assess_fp = tmp_path / "assessment"
+
+    run(assess_fp, run_args, [])
+
+    # Postponed students come last, both in the fetched and assessed students
+    expected = [*_SIDS[1:], _SIDS[0]]
+    students_git = load_students_git(get_valid_students_git_fp(assess_fp))
+    assert [sg.sid for sg in students_git] == expected
+    assessed_students = load_assessed_students(assess_fp)
+    assert [s.sid for s in assessed_students] == expected
+    assert all(s.grade == 1 for s in assessed_students)
+
+
+def test_run_fetch_error(tmp_path, run_args, monkeypatch):
+    """Test that errors in the fetch stage stop the pipeline and are raised."""
+    iter_fetch_repos = egrader.run.iter_fetch_repos
+
+    def failing_iter_fetch_repos(*args, **kwargs):
+        students_git = iter_fetch_repos(*args, **kwargs)
+        yield next(students_git)
+        raise RuntimeError("Fetch failed")
+
+    monkeypatch.setattr(egrader.run, "iter_fetch_repos", failing_iter_fetch_repos)
+
+    with pytest.raises(RuntimeError, match="Fetch failed"):
+        run(tmp_path / "assessment", run_args, [])
+
+    # Every stage finished, i.e., the assessment workers were told to stop
+    assert _pipeline_threads() == []
+
+
+@pytest.mark.parametrize("jobs", [1, 3, 8])
+def test_run_assess_error(tmp_path, run_args, monkeypatch, jobs):
+    """Test that errors in the assessment stage stop the pipeline and are raised."""
+    assess_student = egrader.run.assess_student
+    assessed = []
+
+    def failing_assess_student(student_git, *args, **kwargs):
+        assessed.append(student_git.sid)
+        if student_git.sid == _SIDS[1]:
+            raise RuntimeError("Assessment failed")
+        return assess_student(student_git, *args, **kwargs)
+
+    monkeypatch.setattr(egrader.run, "assess_student", failing_assess_student)
+    run_args.jobs = jobs
+
+    with pytest.raises(RuntimeError, match="Assessment failed"):
+        run(tmp_path / "assessment", run_args, [])
+
+    # Every stage finished, even with a full queue and more workers than students
+    assert _pipeline_threads() == []
+    assert _SIDS[1] in assessed
@@ -0,0 +1,86 @@
+"""Tests for watch mode."""
+
+from typing import Dict
+
+import egrader.watch
+from egrader.fetch import FetchScheduler, load_urls
+from egrader.git import git, git_at
+from egrader.paths import get_assessed_students_fp
+from egrader.results import load_assessed_students
+from egrader.rules import load_rules
+from egrader.types import AssessedStudent
+from egrader.watch import _watch_cycle
+
+_RULES = """\
+- repo: repo
+  weight: 1
+  assessments:
+  - name: min_commits
+    weight: 1
+    params:
+      minimum: 2
+"""
+
+
+def _commit(repo_fp, contents):
+    """Commit a file with the specified contents."""
+    (repo_fp / "file.txt").write_text(contents)
+    git_at(repo_fp, "add", "file.txt")
+    git_at(repo_fp, "commit", "-m", contents)
+
+
+def test_watch_cycle(tmp_path, monkeypatch):
+    """Test that only students whose repositories changed are reassessed."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "egrader")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "egrader@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "egrader")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "egrader@example.com")
+
+    # Two students, each with a repository with a single commit
+    urls_fp = tmp_path / "urls.tsv"
+    for sid in ("s1", "s2"):
+        origin_fp = tmp_path / "accounts" / sid / "repo"
+        git("init", origin_fp)
+        _commit(origin_fp, "first")
+        with urls_fp.open("a") as urls_file:
+            urls_file.write(f"{sid} {sid}@example.com {origin_fp.parent}\n")
+    (tmp_path / "rules.yml").write_text(_RULES)
+
+    reassessed = []
+    assess_student = egrader.watch.assess_student
+
+    def recording_assess_student(student_git, *args, **kwargs):
+        reassessed.append(student_git.sid)
+        return assess_student(student_git, *args, **kwargs)
+
+    monkeypatch.setattr(egrader.watch, "assess_student", recording_assess_student)
+    assess_fp = tmp_path / "assessment"
+    assess_fp.mkdir()
+    rules = load_rules(tmp_path / "rules.yml")
+    students_git = load_urls(urls_fp)
+    assessed_by_sid: Dict[str, AssessedStudent] = {}
+    scheduler = FetchScheduler(retries=0)
+
+    def _cycle():
+        return _watch_cycle(
+            assess_fp, rules, students_git, assessed_by_sid, scheduler, 1024**3
+        )
+
+    # Every student is assessed in the first cycle
+    assert _cycle() == 2
+    assert reassessed == ["s1", "s2"]
+    assert [s.grade for s in load_assessed_students(assess_fp)] == [0, 0]
+
+    # Only the student with a new commit is reassessed, and grades are updated
+    reassessed.clear()
+    _commit(tmp_path / "accounts" / "s2" / "repo", "second")
+    grades_mtime = get_assessed_students_fp(assess_fp).stat().st_mtime_ns
+    assert _cycle() == 1
+    assert reassessed == ["s2"]
+    assert get_assessed_students_fp(assess_fp).stat().st_mtime_ns != grades_mtime
+    assert [s.grade for s in load_assessed_students(assess_fp)] == [0, 1]
+
+    # Nothing changed, so nothing is reassessed, and grades are kept
+    reassessed.clear()
+    assert _cycle() == 0
+    assert reassessed == []
@@ -0,0 +1,37 @@
+"""Tests for YAML handling functionality."""
+
+import pytest
+
+from egrader.types import STUDENTS_GIT_SCHEMA, StudentGit
+from egrader.yaml import load_yaml_list, yaml_list_writer
+
+
+def test_yaml_list_round_trip(tmp_path):
+    """Test that records are saved and loaded back into the same objects."""
+    yaml_fp = tmp_path / "students.yml"
+    student_git = StudentGit("s1", "s1@example.com", str(tmp_path))
+    student_git.add_repo("r", "/some/path")
+
+    with yaml_list_writer(yaml_fp, STUDENTS_GIT_SCHEMA) as save:
+        save(student_git.to_dict())
+
+    loaded = load_yaml_list(yaml_fp, STUDENTS_GIT_SCHEMA, StudentGit.from_dict)
+    assert [repr(sg) for sg in loaded] == [repr(student_git)]
+
+
+@pytest.mark.parametrize(
+    ("contents", "error"),
+    [
+        ("- !!python/object/apply:os.system ['echo unsafe']\n", "Python objects"),
+        ("- sid: s1\n", "not in the"),
+        ("schema: egrader.students_git\nversion: 99\nitems: []\n", "newer"),
+        ("schema: egrader.students_git\nversion: 1\nitems:\n- sid: s1\n", "record 0"),
+    ],
+)
+def test_yaml_list_invalid(tmp_path, contents, error):
+    """Test that unsafe, unknown and invalid files are rejected."""
+    yaml_fp = tmp_path / "students.yml"
+    yaml_fp.write_text(contents)
+
+    with pytest.raises(SyntaxError, match=error):
+        load_yaml_list(yaml_fp, STUDENTS_GIT_SCHEMA, StudentGit.from_dict)